@@ -1,16 +1,33 @@
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, status
+from fastapi.datastructures import Default
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import (
+    JSONResponse,
+    ORJSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+)
+from pymongo.errors import PyMongoError
 
 from app import settings
 from app.routers.incidents import incidents
+from app.routers.profiles import profiles
 from app.routers.report import report
+from app.routers.report.rendering import warm_up
 from app.routers.transactions import transactions
+from app.utils import db, metrics, query_guard
+from app.utils.compression import CompressionMiddleware
+from app.utils.get_common import NEXT_CURSOR_HEADER
+from app.utils.indexes import ensure_indexes, verify_query_plans
+from app.utils.logger import logger
+from app.utils.profiling import PROFILE_ID_HEADER, ProfilingMiddleware
+from app.utils.token import token_cache
 
-# from app.utils.logger import logger
 # from app.utils.splunk_logger import splunk_logger
 
 
@@ -25,11 +42,31 @@ Expense Tracker API:
 """  # noqa: E501,W291
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    await db.connect()
+    if settings.ENSURE_INDEXES:
+        await ensure_indexes(db.expenses_db)
+    if settings.VERIFY_QUERY_PLANS:
+        await verify_query_plans(db.expenses_db)
+    report.pdf_pool.start(
+        settings.PDF_WORKERS, settings.PDF_QUEUE_SIZE, initializer=warm_up
+    )
+    yield
+    report.pdf_pool.shutdown()
+    await db.close()
+
+
 app = FastAPI(
     title="Expense Tracker APIs",
     description=description,
     version=settings.VERSION,
     root_path=settings.SCRIPT_NAME,
+    lifespan=lifespan,
+    # as a default, routes with a response model keep FastAPI's own serializer
+    # (straight to bytes through pydantic, no jsonable_encoder), orjson only
+    # renders what routes without one return
+    default_response_class=Default(ORJSONResponse),
 )
 
 origins = [
@@ -46,8 +83,27 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_ID_HEADER],
+)
+
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.GZIP_LEVEL,
+    brotli_quality=settings.BROTLI_QUALITY,
 )
 
+if settings.PROFILING:
+    app.add_middleware(ProfilingMiddleware)
+
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.register_stats("pdf_cache", report.pdf_cache.stats)
+metrics.register_stats("pdf_pool", report.pdf_pool.stats)
+metrics.register_stats("token_cache", token_cache.stats)
+metrics.register_stats("query_guard", query_guard.stats)
+metrics.register_stats("mongo_pool", db.pool_stats.stats)
+
 # app.include_router(auth.router, prefix="/v1/auth", tags=["auth"])
 
 app.include_router(
@@ -63,6 +119,12 @@ app.include_router(
     # dependencies=[Depends(validate_access_token)],
 )
 
+app.include_router(
+    transactions.router_v2,
+    prefix="/v2/transactions",
+    tags=["transactions"],
+)
+
 app.include_router(
     incidents.router,
     prefix="/v1/incidents",
@@ -70,6 +132,12 @@ app.include_router(
     # dependencies=[Depends(validate_access_token)],
 )
 
+app.include_router(
+    profiles.router,
+    prefix="/v1/profiles",
+    tags=["profiles"],
+)
+
 
 @app.get("/")
 async def docs() -> RedirectResponse:
@@ -77,3 +145,38 @@ async def docs() -> RedirectResponse:
     API Documentation
     """
     return RedirectResponse(settings.root_path + "/docs")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics() -> PlainTextResponse:
+    """
+    Prometheus metrics
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/health", include_in_schema=False)
+async def health() -> JSONResponse:
+    """
+    Mongo ping latency and connection pool, 503 when the ping fails. The
+    error is only logged, it names the Mongo hosts and topology.
+    """
+    try:
+        seconds = await db.ping()
+    except (PyMongoError, RuntimeError) as error:
+        logger.warning("Health check ping failed: %s", error)
+        return JSONResponse(
+            {
+                "status": "unavailable",
+                "error": "Mongo ping failed",
+                "pool": db.pool_stats.stats(),
+            },
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+    return JSONResponse(
+        {
+            "status": "ok",
+            "ping_ms": round(seconds * 1000, 2),
+            "pool": db.pool_stats.stats(),
+        }
+    )
@@ -1,70 +1,67 @@
-from pydantic import TypeAdapter
+from typing import Any
 
 from app.utils.db import expenses_db
 from app.utils.get_common import (
     CommonMongoGetQueryParams,
     get_records,
+    read_models,
 )
 
 from .models import IncidentData
 
 
-def query_incidents(
+async def query_incident_documents(
     mongo_params: CommonMongoGetQueryParams,
-) -> list[IncidentData]:
+) -> list[dict[str, Any]]:
     """
     Query the Incidents DB by a given filter and projection
     """
     mongo_params.filter = mongo_params.filter or {}
     mongo_params.filter["removed"] = {"$exists": False}
-    results = get_records(expenses_db, "Incidents", mongo_params, True)
-    incident_list_adapter = TypeAdapter(list[IncidentData])
-    return incident_list_adapter.validate_python(results)
+    return await get_records(expenses_db, "Incidents", mongo_params, True)
 
 
-def simple_incident_query(query_filter: dict) -> list[IncidentData]:
+async def simple_incident_query(query_filter: dict) -> list[IncidentData]:
     """
     Simple query for incidents without pagination
     """
-    results = list(expenses_db.Incidents.find(query_filter, {"_id": 0}))
-    incident_list_adapter = TypeAdapter(list[IncidentData])
-    return incident_list_adapter.validate_python(results)
+    results = await expenses_db.Incidents.find(query_filter, {"_id": 0}).to_list()
+    return read_models(IncidentData, results)
 
 
-def add_incident(incident_data: IncidentData) -> None:
+async def add_incident(incident_data: IncidentData) -> None:
     """
     Add a new incident to the database
     """
-    expenses_db.Incidents.insert_one(incident_data.model_dump())
+    await expenses_db.Incidents.insert_one(incident_data.model_dump())
 
 
-def update_incident_db(query: dict, update: dict) -> int:
+async def update_incident_db(query: dict, update: dict) -> int:
     """
     Update an incident in the database
     Returns the number of modified documents
     """
-    result = expenses_db.Incidents.update_one(query, {"$set": update})
+    result = await expenses_db.Incidents.update_one(query, {"$set": update})
     return result.modified_count
 
 
-def delete_incident_db(query: dict) -> int:
+async def delete_incident_db(query: dict) -> int:
     """
     Mark incident as removed (soft delete)
     Returns the number of modified documents
     """
-    result = expenses_db.Incidents.update_one(query, {"$set": {"removed": True}})
+    result = await expenses_db.Incidents.update_one(query, {"$set": {"removed": True}})
     return result.modified_count
 
 
-def get_incident_by_id(incident_id: str, group: str) -> IncidentData | None:
+async def get_incident_by_id(incident_id: str, group: str) -> IncidentData | None:
     """
     Get a single incident by ID and group
     """
-    result = expenses_db.Incidents.find_one(
+    result = await expenses_db.Incidents.find_one(
         {"incident_id": incident_id, "group": group, "removed": {"$exists": False}},
         {"_id": 0},
     )
     if result:
-        incident_adapter = TypeAdapter(IncidentData)
-        return incident_adapter.validate_python(result)
+        return IncidentData.model_validate(result)
     return None
@@ -1,9 +1,14 @@
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.security import HTTPBearer
 
-from app.utils.get_common import CommonMongoGetQueryParams
+from app.utils.get_common import (
+    CommonMongoGetQueryParams,
+    next_cursor_headers,
+    projected_response,
+    read_models,
+)
 from app.utils.logger import logger
 from app.utils.token import OwnerObject, validate_access_token
 
@@ -11,7 +16,7 @@ from .common_functions import (
     add_incident,
     delete_incident_db,
     get_incident_by_id,
-    query_incidents,
+    query_incident_documents,
     update_incident_db,
 )
 from .enums import IncidentStatus
@@ -44,14 +49,17 @@ def validate_scope(
 
 @router.get("", response_model=list[IncidentData])
 async def get_incidents(
+    response: Response,
     group_id: str,
     user_id: str | None = None,
     mongo_params: CommonMongoGetQueryParams = Depends(CommonMongoGetQueryParams),
     access_token_details: OwnerObject = Depends(validate_access_token),
-) -> list[IncidentData]:
+) -> list[IncidentData] | Response:
     """
     Get incidents from the database based on group and optionally user.
     Only admin users can access this endpoint.
+    With a projection only the projected fields are returned.
+    Full pages carry an X-Next-Cursor header to pass as `cursor`.
     """
     validate_scope(group_id, access_token_details, admin=True)
 
@@ -67,9 +75,15 @@ async def get_incidents(
         mongo_params.filter = filter_dict
 
     try:
-        incidents = query_incidents(mongo_params)
+        incidents = await query_incident_documents(mongo_params)
         logger.info("Retrieved %d incidents for group %s", len(incidents), group_id)
-        return incidents
+        headers = next_cursor_headers(mongo_params)
+        if mongo_params.projection:
+            return projected_response(
+                IncidentData, mongo_params.projection, incidents, headers
+            )
+        response.headers.update(headers)
+        return read_models(IncidentData, incidents)
     except Exception as e:
         logger.error("Error retrieving incidents: %s", str(e))
         raise HTTPException(status_code=500, detail="Error retrieving incidents") from e
@@ -95,7 +109,7 @@ async def create_incident(
             group_id=payload.group_id,
             solved_by="",  # Default value
         )
-        add_incident(incident)
+        await add_incident(incident)
         logger.info(
             "Created incident %s for group %s", incident.incident_id, payload.group_id
         )
@@ -119,7 +133,7 @@ async def update_incident(
     validate_scope(group_id, access_token_details, admin=True)
 
     # Check if incident exists
-    existing_incident = get_incident_by_id(incident_id, group_id)
+    existing_incident = await get_incident_by_id(incident_id, group_id)
     if not existing_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
@@ -137,7 +151,7 @@ async def update_incident(
 
     try:
         query = {"incident_id": incident_id, "group": group_id}
-        modified_count = update_incident_db(query, update_dict)
+        modified_count = await update_incident_db(query, update_dict)
 
         if modified_count == 0:
             raise HTTPException(
@@ -169,13 +183,13 @@ async def delete_incident(
     validate_scope(group_id, access_token_details, admin=True)
 
     # Check if incident exists
-    existing_incident = get_incident_by_id(incident_id, group_id)
+    existing_incident = await get_incident_by_id(incident_id, group_id)
     if not existing_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
     try:
         query = {"incident_id": incident_id, "group": group_id}
-        modified_count = delete_incident_db(query)
+        modified_count = await delete_incident_db(query)
 
         if modified_count == 0:
             raise HTTPException(status_code=404, detail="Incident not found")
@@ -206,14 +220,14 @@ async def update_incident_status(
     validate_scope(group_id, access_token_details, admin=True)
 
     # Check if incident exists
-    existing_incident = get_incident_by_id(incident_id, group_id)
+    existing_incident = await get_incident_by_id(incident_id, group_id)
     if not existing_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
     try:
         query = {"incident_id": incident_id, "group": group_id}
         update_dict = {"incident_status": payload.incident_status.value}
-        modified_count = update_incident_db(query, update_dict)
+        modified_count = await update_incident_db(query, update_dict)
 
         if modified_count == 0:
             raise HTTPException(status_code=404, detail="Incident not found")
@@ -252,7 +266,7 @@ async def solve_incident(
     validate_scope(group_id, access_token_details, admin=True)
 
     # Check if incident exists
-    existing_incident = get_incident_by_id(incident_id, group_id)
+    existing_incident = await get_incident_by_id(incident_id, group_id)
     if not existing_incident:
         raise HTTPException(status_code=404, detail="Incident not found")
 
@@ -269,7 +283,7 @@ async def solve_incident(
             "solved_by": payload.solved_by,
             "incident_status": IncidentStatus.RESOLVED.value,
         }
-        modified_count = update_incident_db(query, update_dict)
+        modified_count = await update_incident_db(query, update_dict)
 
         if modified_count == 0:
             raise HTTPException(status_code=404, detail="Incident not found")
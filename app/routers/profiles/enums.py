@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class ProfileFormat(str, Enum):
+    text = "text"  # cProfile call tree
+    pstats = "pstats"  # cProfile dump, for snakeviz / pstats
+    collapsed = "collapsed"  # sampled stacks, for flamegraph.pl / speedscope
+    memory = "memory"  # tracemalloc top allocations
@@ -0,0 +1,13 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class ProfileSummary(BaseModel):
+    profile_id: str
+    method: str
+    path: str
+    status: int
+    modes: list[str]
+    created_at: datetime
+    seconds: float
@@ -0,0 +1,89 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from app.utils.profiling import Profile, collapsed_stacks, profiles
+from app.utils.token import OwnerObject, TokenType, validate_access_token
+
+from .enums import ProfileFormat
+from .models import ProfileSummary
+
+router = APIRouter()
+
+
+def validate_admin(
+    access_token_details: OwnerObject = Depends(validate_access_token),
+) -> OwnerObject:
+    """
+    Only admin tokens can read profiles, and only the ones they requested
+    """
+    if access_token_details.token_type != TokenType.admin:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return access_token_details
+
+
+def summary(profile: Profile) -> ProfileSummary:
+    return ProfileSummary(
+        profile_id=profile.profile_id,
+        method=profile.method,
+        path=profile.path,
+        status=profile.status,
+        modes=profile.modes,
+        created_at=profile.created_at,
+        seconds=profile.seconds,
+    )
+
+
+@router.get("", response_model=list[ProfileSummary])
+async def get_profiles(
+    owner: OwnerObject = Depends(validate_admin),
+) -> list[ProfileSummary]:
+    """
+    Profiles still kept for the token owner, most recent first.
+    Requests are profiled when sent with an `X-Profile: cpu,sample,memory`
+    header (any subset, or `all`), the answer carries an `X-Profile-Id`.
+    """
+    owned = [
+        profile
+        for _, profile in profiles.items()
+        if profile.token_owner == owner.token_owner
+    ]
+    owned.sort(key=lambda profile: profile.created_at, reverse=True)
+    return [summary(profile) for profile in owned]
+
+
+@router.get("/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    profile_format: ProfileFormat = Query(ProfileFormat.text, alias="format"),
+    owner: OwnerObject = Depends(validate_admin),
+) -> Response:
+    """
+    A stored profile: the cProfile call tree (`text`) or dump (`pstats`),
+    the sampled stacks in collapsed format (`collapsed`) or the largest
+    live allocations (`memory`)
+    """
+    found, profile = profiles.get(profile_id)
+    if not found or profile is None or profile.token_owner != owner.token_owner:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    if profile_format == ProfileFormat.text and profile.call_tree is not None:
+        return PlainTextResponse(profile.call_tree)
+    if profile_format == ProfileFormat.pstats and profile.cpu is not None:
+        return Response(
+            profile.cpu,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f"attachment; filename={profile_id}.prof"},
+        )
+    if profile_format == ProfileFormat.collapsed and profile.stacks is not None:
+        return PlainTextResponse(
+            collapsed_stacks(profile),
+            headers={
+                "Content-Disposition": f"attachment; filename={profile_id}.folded"
+            },
+        )
+    if profile_format == ProfileFormat.memory and profile.memory is not None:
+        return PlainTextResponse("\n".join(profile.memory) + "\n")
+    raise HTTPException(
+        status_code=404,
+        detail=f"Profile {profile_id} was not recorded with {profile_format} data",
+    )
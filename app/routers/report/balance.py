@@ -0,0 +1,88 @@
+"""
+Balance engine for /download/balance.
+
+`compute_balance` produces both the cumulative totals and the selected
+month's figures from a single read of the group's movements, with the
+same results the two `get_parsed_data` calls used to give.
+"""
+
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any
+
+from app.routers.transactions.models import GroupDetails, ParsedData
+from app.routers.transactions.operations import (
+    DEFAULT_CREATED_AT,
+    INCOME_CATEGORIES,
+    get_months,
+    month_key,
+    parse_group_details,
+    parse_totals,
+    transaction_detail,
+)
+
+from .models import BalanceData
+
+
+def compute_balance(
+    documents: Sequence[dict[str, Any]],
+    group_details: GroupDetails,
+    year: str,
+    month: str,
+    totals: tuple[ParsedData, list[str]] | None = None,
+) -> BalanceData:
+    """
+    Cumulative totals, monthly income/expense and the month's expenses by
+    category from the raw Movements documents. The cumulative totals are
+    `parse_totals` of the documents unless `totals` brings them, e.g. from
+    GroupMonthlySummary.
+
+    As before, a movement counts towards the month when its `date` is in
+    it, and only if its `created_at` falls within the group months.
+    """
+    parsed_data, users_with_debt = totals or parse_totals(documents, group_details)
+    group_details = parse_group_details(group_details, parsed_data, users_with_debt)
+    selected = month_key(datetime.strptime(f"{year}-{month}", "%Y-%m"))
+    months = get_months(group_details.created_at)
+    month_index = {key: position for position, key in enumerate(months)}
+    # (month position, row) of the selected month, ordered like parse_data
+    monthly_income: list[tuple[int, dict[str, Any]]] = []
+    monthly_expense: list[tuple[int, dict[str, Any]]] = []
+
+    for row in documents:
+        date = row.get("date")
+        if date is None or month_key(date) != selected:
+            continue
+        is_income = row.get("category") in INCOME_CATEGORIES
+        is_expense = row["movement_type"] == "expense"
+        if not (is_income or is_expense):
+            continue
+        created_at = row.get("created_at") or DEFAULT_CREATED_AT
+        position = month_index.get(month_key(created_at))
+        if position is not None:
+            if is_income:
+                monthly_income.append((position, row))
+            if is_expense:
+                monthly_expense.append((position, row))
+
+    monthly_income.sort(key=lambda item: item[0])
+    monthly_expense.sort(key=lambda item: item[0])
+    categories: dict[str, list[dict[str, Any]]] = {}
+    for _, row in monthly_expense:
+        categories.setdefault(row["category"], []).append(transaction_detail(row))
+
+    return BalanceData.model_validate(
+        {
+            "group": group_details.group,
+            "year": year,
+            "month": month,
+            "group_details": group_details,
+            "users_with_debt": group_details.users_with_debt,
+            "monthly_income": sum(row["amount"] for _, row in monthly_income),
+            "monthly_expense": sum(row["amount"] for _, row in monthly_expense),
+            "categories": [
+                {"name": name, "expenses": details}
+                for name, details in categories.items()
+            ],
+        }
+    )
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
 
+from app.routers.transactions.models import GroupDetails, TransactionDetail
+
 
 class ReceiptsRequest(BaseModel):
     start_at: int
@@ -11,3 +13,21 @@ class BalanceRequest(BaseModel):
     year: str
     month: str
     group: str
+
+
+class BalanceCategory(BaseModel):
+    name: str
+    expenses: list[TransactionDetail]
+
+
+class BalanceData(BaseModel):
+    group: str
+    year: str
+    month: str
+    # cumulative totals since the group was created
+    group_details: GroupDetails
+    users_with_debt: list[str]
+    # movements whose `date` falls in the requested month
+    monthly_income: float
+    monthly_expense: float
+    categories: list[BalanceCategory]
@@ -0,0 +1,214 @@
+"""
+Incremental PDF writer for the receipts document.
+
+FPDF only produces a document once every page exists. This writer lays the
+receipts out with the same page geometry (A4, 10mm margins, Helvetica 10,
+6mm lines, bordered cells) and returns the bytes of each page as soon as it
+is full, so a download can stream while the receipts are still being read.
+Only the object offsets and page numbers are kept until the end.
+"""
+
+import zlib
+
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+
+K = 72 / 25.4  # points per mm
+PAGE_WIDTH = 210.0
+PAGE_HEIGHT = 297.0
+MARGIN = 10.0
+CELL_MARGIN = 1.0
+LINE_HEIGHT = 6.0
+RECEIPT_SPACING = 5.0
+FONT_SIZE = 10.0
+TEXT_WIDTH = PAGE_WIDTH - 2 * MARGIN - 2 * CELL_MARGIN
+# the font declares /WinAnsiEncoding, text is written as cp1252 bytes and
+# the core font widths are indexed by those bytes
+ENCODING = "cp1252"
+CHAR_WIDTHS = {
+    bytes([code]).decode(ENCODING, errors="ignore") or chr(code): (
+        CORE_FONTS_CHARWIDTHS["helvetica"][chr(code)]
+    )
+    for code in range(256)
+}
+# characters without a cp1252 byte are written as "?"
+REPLACEMENT_WIDTH = CHAR_WIDTHS["?"]
+
+PAGES_OBJECT = 1
+CATALOG_OBJECT = 2
+FONT_OBJECT = 3
+RESOURCES_OBJECT = 4
+PAGE_PREAMBLE = b"2 J\n0.57 w\nBT /F1 %.2f Tf ET\n" % FONT_SIZE
+
+
+def string_width(text: str) -> float:
+    """
+    Width in mm of `text` in Helvetica at FONT_SIZE
+    """
+    return (
+        sum(CHAR_WIDTHS.get(char, REPLACEMENT_WIDTH) for char in text)
+        * FONT_SIZE
+        / 1000
+        / K
+    )
+
+
+def wrap_text(text: str) -> list[str]:
+    """
+    Break `text` into lines that fit the cell, on spaces when possible
+    """
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if string_width(candidate) <= TEXT_WIDTH:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+            line = ""
+            for char in word:
+                if line and string_width(line + char) > TEXT_WIDTH:
+                    lines.append(line)
+                    line = ""
+                line += char
+        lines.append(line)
+    return lines
+
+
+def escape(text: str) -> bytes:
+    encoded = text.encode(ENCODING, errors="replace")
+    return encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+class ReceiptsPDFStream:
+    """
+    start() -> add(receipt)* -> finish(); every call returns the bytes to send
+    next, add() returns b"" until a page is complete
+    """
+
+    def __init__(self, receipts_per_page: int = 3):
+        self.receipts_per_page = receipts_per_page
+        self.offset = 0
+        self.offsets: dict[int, int] = {}
+        self.next_object = RESOURCES_OBJECT + 1
+        self.page_objects: list[int] = []
+        self.content: list[bytes] = []
+        self.receipts_on_page = 0
+        self.y = MARGIN
+
+    def write(self, data: bytes) -> bytes:
+        self.offset += len(data)
+        return data
+
+    def write_object(self, number: int, body: bytes) -> bytes:
+        self.offsets[number] = self.offset
+        return self.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+
+    def start(self) -> bytes:
+        return self.write(b"%PDF-1.3\n%\xe9\xeb\xf1\xbf\n")
+
+    def flush_page(self) -> bytes:
+        """
+        Write the current page, even when empty, and start a new one
+        """
+        content = zlib.compress(b"".join(self.content))
+        page_number, content_number = self.next_object, self.next_object + 1
+        self.next_object += 2
+        self.page_objects.append(page_number)
+        chunk = self.write_object(
+            page_number,
+            b"<<\n/Contents %d 0 R\n/Parent %d 0 R\n/Resources %d 0 R\n/Type /Page\n>>"
+            % (content_number, PAGES_OBJECT, RESOURCES_OBJECT),
+        )
+        chunk += self.write_object(
+            content_number,
+            b"<<\n/Filter /FlateDecode\n/Length %d\n>>\nstream\n%s\nendstream"
+            % (len(content), content),
+        )
+        self.content = [PAGE_PREAMBLE]
+        self.receipts_on_page = 0
+        self.y = MARGIN
+        return chunk
+
+    def add(self, receipt: str) -> bytes:
+        chunk = b""
+        if not self.content:
+            self.content = [PAGE_PREAMBLE]
+        lines = wrap_text(receipt)
+        bottom = PAGE_HEIGHT - MARGIN
+        if self.receipts_on_page and (
+            self.receipts_on_page == self.receipts_per_page
+            or self.y + len(lines) * LINE_HEIGHT > bottom
+        ):
+            chunk += self.flush_page()
+        while lines:
+            fitting = max(1, int((bottom - self.y) // LINE_HEIGHT))
+            self.draw_cell(lines[:fitting])
+            lines = lines[fitting:]
+            if lines:
+                chunk += self.flush_page()
+        self.y += RECEIPT_SPACING
+        self.receipts_on_page += 1
+        return chunk
+
+    def draw_cell(self, lines: list[str]) -> None:
+        height = len(lines) * LINE_HEIGHT
+        self.content.append(
+            b"%.2f %.2f %.2f %.2f re S\n"
+            % (
+                MARGIN * K,
+                (PAGE_HEIGHT - self.y - height) * K,
+                (PAGE_WIDTH - 2 * MARGIN) * K,
+                height * K,
+            )
+        )
+        baseline = LINE_HEIGHT / 2 + 0.3 * FONT_SIZE / K
+        for line in lines:
+            if line:
+                self.content.append(
+                    b"BT %.2f %.2f Td (%s) Tj ET\n"
+                    % (
+                        (MARGIN + CELL_MARGIN) * K,
+                        (PAGE_HEIGHT - self.y - baseline) * K,
+                        escape(line),
+                    )
+                )
+            self.y += LINE_HEIGHT
+
+    def finish(self) -> bytes:
+        chunk = b""
+        if self.content or not self.page_objects:
+            chunk += self.flush_page()
+        kids = b" ".join(b"%d 0 R" % number for number in self.page_objects)
+        chunk += self.write_object(
+            PAGES_OBJECT,
+            b"<<\n/Count %d\n/Kids [%s]\n/MediaBox [0 0 %.2f %.2f]\n/Type /Pages\n>>"
+            % (len(self.page_objects), kids, PAGE_WIDTH * K, PAGE_HEIGHT * K),
+        )
+        chunk += self.write_object(
+            CATALOG_OBJECT,
+            b"<<\n/PageLayout /OneColumn\n/Pages %d 0 R\n/Type /Catalog\n>>"
+            % PAGES_OBJECT,
+        )
+        chunk += self.write_object(
+            FONT_OBJECT,
+            b"<<\n/BaseFont /Helvetica\n/Encoding /WinAnsiEncoding\n"
+            b"/Subtype /Type1\n/Type /Font\n>>",
+        )
+        chunk += self.write_object(
+            RESOURCES_OBJECT,
+            b"<<\n/Font <</F1 %d 0 R>>\n/ProcSet [/PDF /Text]\n>>" % FONT_OBJECT,
+        )
+        xref_offset = self.offset
+        size = self.next_object
+        xref = [b"xref\n0 %d\n0000000000 65535 f \n" % size]
+        xref += [
+            b"%010d 00000 n \n" % self.offsets[number] for number in range(1, size)
+        ]
+        chunk += self.write(b"".join(xref))
+        chunk += self.write(
+            b"trailer\n<<\n/Size %d\n/Root %d 0 R\n>>\nstartxref\n%d\n%%%%EOF\n"
+            % (size, CATALOG_OBJECT, xref_offset)
+        )
+        return chunk
@@ -0,0 +1,126 @@
+"""
+PDF rendering for the report router.
+
+Nothing here touches the database, so the module is what the PDF worker
+processes import: templates are compiled and FPDF fonts loaded once per
+worker by `warm_up`.
+"""
+
+import hashlib
+
+import jinja2
+from fpdf import FPDF
+
+from .pdf_stream import ReceiptsPDFStream
+
+TEMPLATE = """
+RECIBO DE PAGO DE CUOTA DE MANTENIMIENTO {{ group }}
+FOLIO: {{ transaction_id }}
+
+Recibí de {{ user }} la cantidad de $ {{ amount }} por concepto de cuota de mantenimiento correspondiente a: {{ concept }}
+
+Fecha: {{ created_at }}
+
+Atentamente,
+Administración {{ group }}
+"""  # noqa: E501
+
+BALANCE_TEMPLATE = """
+ESTADO DE CUENTA - {{ group }}
+{{ year }}-{{ month }}
+_________________________________________________________________________________
+        Ingresos totales
+            {{ group_details['total_income'] }}
+        Gastos totales
+            {{ group_details['total_expense'] }}
+        Cuotas por cobrar
+            {{ group_details['total_debt'] }}
+        Balance
+            {{ group_details['balance'] }}
+        Ingresos correspondientes al mes en curso:
+            {{ monthly_income }}
+        Gastos del mes en curso:
+            {{ monthly_expense }}
+        _____________________________________________
+        Disponible
+            {{ group_details['total_available'] }}
+
+
+----------- Detalles de gastos del mes ----------{% for category in categories %}
+--------------- {{ category['name'] }}{% for expense in category['expenses'] %}
+    Monto: {{ expense['amount'] }} \t\t - {{ expense['name'] }}{% endfor %}{% endfor %}
+
+--------------- Deptos con adeudo:
+    {{ users_with_debt | join('') | replace('DEPTO', '') }}
+
+Atte. Administración {{ group }}
+"""  # noqa: E501
+
+# compiled once, rendering is the only per-request work
+RECEIPT_TEMPLATE = jinja2.Template(TEMPLATE)
+BALANCE = jinja2.Template(BALANCE_TEMPLATE)
+# part of the cached PDF keys, changes whenever a template does
+TEMPLATE_VERSION = hashlib.sha256((TEMPLATE + BALANCE_TEMPLATE).encode()).hexdigest()
+
+
+def parse_receipts(transactions: list) -> dict:
+    amount = 0
+    concept = ""
+    for transaction in transactions:
+        amount += transaction["amount"]
+        concept += transaction["name"] + ", "
+    return {
+        "transaction_id": transactions[0]["transaction_id"],
+        "group": transactions[0]["group"],
+        "user": transactions[0]["user"],
+        "created_at": transactions[0]["created_at"],
+        "amount": amount,
+        "concept": concept,
+    }
+
+
+def create_pdf_file(receipts: list) -> bytes:
+    """
+    Render the receipts in a PDF file with three receipts per page.
+    """
+    pdf = ReceiptsPDFStream()
+    chunks = [pdf.start()]
+    chunks += [pdf.add(receipt) for receipt in receipts]
+    chunks.append(pdf.finish())
+    return b"".join(chunks)
+
+
+def create_pdf_balance(content: str) -> bytes:
+    """
+    Render the balance in a PDF file.
+    """
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=10)
+    pdf.set_font("Courier", size=8)
+    pdf.add_page()
+
+    pdf.multi_cell(0, 6, content, border=0, align="L")
+
+    return bytes(pdf.output(dest="S"))
+
+
+def render_receipt_pages(
+    pdf: ReceiptsPDFStream, folios: list[list[dict]]
+) -> tuple[ReceiptsPDFStream, bytes]:
+    """
+    Add the receipts of `folios` to the stream. The writer state travels
+    with the call, so consecutive batches can run in different workers.
+    """
+    chunks = [
+        pdf.add(RECEIPT_TEMPLATE.render(parse_receipts(transactions)))
+        for transactions in folios
+    ]
+    return pdf, b"".join(chunks)
+
+
+def warm_up() -> None:
+    """
+    Pool initializer, renders a throwaway document of each kind
+    """
+    create_pdf_file(["warm up"])
+    create_pdf_balance("warm up")
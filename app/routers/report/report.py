@@ -1,133 +1,175 @@
+from collections.abc import AsyncIterator
+from datetime import datetime, timedelta
 from io import BytesIO
 
-import jinja2
 from fastapi import APIRouter, Depends, HTTPException, Security
 from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from fpdf import FPDF
-
-from app.routers.transactions.transactions import get_parsed_data, validate_scope
+from starlette.types import Receive, Scope, Send
+
+from app import settings
+from app.routers.transactions.common_functions import (
+    get_group_definition,
+    movement_documents,
+)
+from app.routers.transactions.data_version import get_data_version
+from app.routers.transactions.operations import parse_summary_data
+from app.routers.transactions.summary import get_group_summary
+from app.routers.transactions.transactions import validate_scope
+from app.utils.cache import ArtifactCache, artifact_key
 from app.utils.db import expenses_db
-from app.utils.token import OwnerObject, validate_access_token
+from app.utils.process_pool import PoolSaturatedError, PoolSlot, ProcessPool
+from app.utils.token import OwnerObject, TokenType, validate_access_token
 
+from .balance import compute_balance
 from .models import BalanceRequest, ReceiptsRequest
+from .pdf_stream import ReceiptsPDFStream
+from .rendering import (
+    BALANCE,
+    RECEIPT_TEMPLATE,
+    TEMPLATE_VERSION,
+    create_pdf_balance,
+    parse_receipts,
+    render_receipt_pages,
+)
 
 router = APIRouter()
 security = HTTPBearer()
+# started by the app lifespan, renders inline until then
+pdf_pool = ProcessPool("pdf")
+# folios sent to a worker at once while streaming receipts
+FOLIOS_PER_TASK = 60
+pdf_cache = ArtifactCache(settings.PDF_CACHE_BYTES, settings.PDF_CACHE_MAX_ENTRY_BYTES)
 
-TEMPLATE = """
-RECIBO DE PAGO DE CUOTA DE MANTENIMIENTO {{ group }}
-FOLIO: {{ transaction_id }}
-
-Recibí de {{ user }} la cantidad de $ {{ amount }} por concepto de cuota de mantenimiento correspondiente a: {{ concept }}
-
-Fecha: {{ created_at }}
-
-Atentamente,
-Administración {{ group }}
-"""  # noqa: E501
-
-BALANCE_TEMPLATE = """
-ESTADO DE CUENTA - {{ group }}
-{{ year }}-{{ month }}
-_________________________________________________________________________________
-        Ingresos totales
-            {{ group_details['total_income'] }}
-        Gastos totales
-            {{ group_details['total_expense'] }}
-        Cuotas por cobrar
-            {{ group_details['total_debt'] }}
-        Balance
-            {{ group_details['balance'] }}
-        Ingresos correspondientes al mes en curso:
-            {{ monthly_income }}
-        Gastos del mes en curso:
-            {{ monthly_expense }}
-        _____________________________________________
-        Disponible
-            {{ group_details['total_available'] }}
-
-
------------ Detalles de gastos del mes ----------{% for category in categories %}
---------------- {{ category['name'] }}{% for expense in category['expenses'] %}
-    Monto: {{ expense['amount'] }} \t\t - {{ expense['name'] }}{% endfor %}{% endfor %}
-
---------------- Deptos con adeudo:
-    {{ users_with_debt }}
-
-Atte. Administración {{ group }}
-"""  # noqa: E501
-
-
-def get_receipts(transaction_id: str, group: str) -> list[dict]:
-    return list(
-        expenses_db.Movements.find(
-            {"transaction_id": transaction_id, "group": group}, {"_id": 0}
-        )
-    )
 
-
-def parse_receipts(transactions: list) -> dict:
-    amount = 0
-    concept = ""
-    for transaction in transactions:
-        amount += transaction["amount"]
-        concept += transaction["name"] + ", "
-    return {
-        "transaction_id": transactions[0]["transaction_id"],
-        "group": transactions[0]["group"],
-        "user": transactions[0]["user"],
-        "created_at": transactions[0]["created_at"],
-        "amount": amount,
-        "concept": concept,
-    }
+def acquire_pdf_slot() -> PoolSlot:
+    try:
+        return pdf_pool.acquire()
+    except PoolSaturatedError as error:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many PDF downloads in progress, try again shortly",
+            headers={"Retry-After": "1"},
+        ) from error
 
 
-def render_receipts(transaction_id_list: list, group: str) -> list:
-    receipts_in_text = []
-    for transaction_id in transaction_id_list:
-        transactions = get_receipts(transaction_id, group)
-        parsed_receipts = parse_receipts(transactions)
-        template = jinja2.Template(TEMPLATE)
-        receipts_in_text.append(template.render(parsed_receipts))
-    return receipts_in_text
+async def pdf_cache_key(kind: str, group: str, period: str) -> str:
+    """
+    Content address of a report PDF. The data version is read before
+    rendering, so a write that lands mid-render leaves the new entry under an
+    already outdated key instead of serving stale data.
+    """
+    data_version = await get_data_version(group)
+    return artifact_key(
+        kind, group, period, settings.VERSION, TEMPLATE_VERSION, data_version
+    )
 
 
-def create_pdf_file(receipts: list) -> bytes:
+class PDFResponse(StreamingResponse):
     """
-    Render the receipts in a PDF file with three receipts per page.
+    Releases the pool slot of the request once the response is done, also
+    when the body was never iterated (the client left before it started)
     """
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=10)
-    pdf.set_font("Arial", size=10)
-    pdf.add_page()
 
-    receipt_per_page = 3
-    count = 0
+    def __init__(self, content: AsyncIterator[bytes] | BytesIO, slot: PoolSlot | None):
+        super().__init__(
+            content,
+            media_type="application/pdf",
+            headers={"Content-Disposition": "attachment; filename=receipts.pdf"},
+        )
+        self.slot = slot
 
-    for receipt in receipts:
-        if count and count % receipt_per_page == 0:
-            pdf.add_page()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.slot is not None:
+                self.slot.release()
 
-        pdf.multi_cell(0, 6, receipt, border=1, align="L")
-        pdf.ln(5)  # Adds some space between receipts
-        count += 1
 
-    return bytes(pdf.output(dest="S"))
+def pdf_response(
+    content: bytes | AsyncIterator[bytes], slot: PoolSlot | None = None
+) -> StreamingResponse:
+    return PDFResponse(
+        BytesIO(content) if isinstance(content, bytes) else content, slot
+    )
 
 
-def create_pdf_balance(content: str) -> bytes:
+async def iter_receipts(
+    start_at: int, end_at: int, group: str
+) -> AsyncIterator[list[dict]]:
+    """
+    Movements of every folio between start_at and end_at (inclusive), one
+    folio at a time in folio order. A single range query is streamed, so only
+    the folio being yielded is held in memory.
     """
-    Render the balance in a PDF file.
+    cursor = expenses_db.Movements.find(
+        {"group": group, "transaction_id": {"$gte": start_at, "$lte": end_at}},
+        {"_id": 0},
+        sort=[("transaction_id", 1), ("_id", 1)],
+        batch_size=settings.RECEIPTS_BATCH_SIZE,
+    )
+    transactions: list[dict] = []
+    async for movement in cursor:
+        if (
+            transactions
+            and movement["transaction_id"] != transactions[0]["transaction_id"]
+        ):
+            yield transactions
+            transactions = []
+        transactions.append(movement)
+    if transactions:
+        yield transactions
+
+
+async def render_receipts(start_at: int, end_at: int, group: str) -> list:
     """
-    pdf = FPDF()
-    pdf.set_auto_page_break(auto=True, margin=10)
-    pdf.set_font("Courier", size=8)
-    pdf.add_page()
+    Render the receipts of the folio range, folios without movements are skipped
+    """
+    return [
+        RECEIPT_TEMPLATE.render(parse_receipts(transactions))
+        async for transactions in iter_receipts(start_at, end_at, group)
+    ]
 
-    pdf.multi_cell(0, 6, content, border=0, align="L")
 
-    return bytes(pdf.output(dest="S"))
+async def stream_receipts_pdf(
+    start_at: int, end_at: int, group: str, cache_key: str, slot: PoolSlot
+) -> AsyncIterator[bytes]:
+    """
+    Receipts PDF of the folio range, yielded page by page as the folios are
+    read. Pages are laid out in the PDF pool; releases the slot taken by the
+    caller as soon as the last page is out (PDFResponse releases it when the
+    body is never iterated). Documents small enough for the cache are kept
+    there.
+    """
+    chunks: list[bytes] = []
+    size = 0
+
+    def tee(chunk: bytes) -> bytes:
+        nonlocal size
+        size += len(chunk)
+        if size <= pdf_cache.max_entry_bytes:
+            chunks.append(chunk)
+        else:
+            chunks.clear()
+        return chunk
+
+    try:
+        pdf = ReceiptsPDFStream()
+        yield tee(pdf.start())
+        folios: list[list[dict]] = []
+        async for transactions in iter_receipts(start_at, end_at, group):
+            folios.append(transactions)
+            if len(folios) == FOLIOS_PER_TASK:
+                pdf, chunk = await pdf_pool.run(render_receipt_pages, pdf, folios)
+                folios = []
+                yield tee(chunk)
+        pdf, chunk = await pdf_pool.run(render_receipt_pages, pdf, folios)
+        yield tee(chunk + pdf.finish())
+        if chunks:
+            pdf_cache.set(cache_key, b"".join(chunks))
+    finally:
+        slot.release()
 
 
 @router.post("/download/receipts")
@@ -140,47 +182,68 @@ async def download_receipt(
     Download the receipts
     """
     validate_scope(request.group, access_token_details)
-    receipts_list = render_receipts(
-        list(range(int(request.start_at), int(request.end_at) + 1)),
-        request.group,
+    if request.end_at < request.start_at:
+        raise HTTPException(
+            status_code=422, detail="end_at must not be before start_at"
+        )
+    if request.end_at - request.start_at + 1 > settings.RECEIPTS_MAX_RANGE:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.RECEIPTS_MAX_RANGE} folios per request",
+        )
+    cache_key = await pdf_cache_key(
+        "receipts", request.group, f"{request.start_at}-{request.end_at}"
     )
-    pdf_file = create_pdf_file(receipts_list)
-    return StreamingResponse(
-        BytesIO(pdf_file),
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=receipts.pdf"},
+    cached = pdf_cache.get(cache_key)
+    if cached is not None:
+        return pdf_response(cached)
+    slot = acquire_pdf_slot()
+    return pdf_response(
+        stream_receipts_pdf(
+            request.start_at, request.end_at, request.group, cache_key, slot
+        ),
+        slot,
     )
 
 
-def get_categories_with_expenses(expenses: list) -> list[dict]:
-    category_map: dict[str, list[dict]] = {}
-    for expense in expenses:
-        for expense_detail in expense["expense_detail"]:
-            category = expense_detail["category"]
-            if category not in category_map:
-                category_map[category] = []
-            category_map[category].append(expense_detail)
-
-    return [
-        {"name": category, "expenses": details}
-        for category, details in category_map.items()
-    ]
-
-
-def estimate_monthly_income(income: list) -> float:
-    total = 0
-    for inc in income:
-        for income_detail in inc["income_source"]:
-            total += income_detail["amount"]
-    return total
-
+async def render_balance(request: BalanceRequest) -> str:
+    """
+    Balance document from a single read of the group's movements, to be laid
+    out by `create_pdf_balance`. With GROUP_SUMMARY_READS the cumulative
+    totals come from GroupMonthlySummary and only the requested month is
+    read from Movements.
+    """
+    group_details = await get_group_definition({"group": request.group})
+    if group_details is None:
+        raise HTTPException(status_code=400, detail="group not found")
+    try:
+        start_date = datetime.strptime(f"{request.year}-{request.month}", "%Y-%m")
+    except ValueError as error:
+        raise HTTPException(status_code=422, detail="Invalid year or month") from error
+
+    if settings.GROUP_SUMMARY_READS:
+        summaries = await get_group_summary(request.group)
+        if not summaries:
+            raise HTTPException(status_code=404, detail="Data not found")
+        end_date = (start_date + timedelta(days=32)).replace(day=1)
+        documents = await movement_documents(
+            {"group": request.group, "date": {"$gte": start_date, "$lt": end_date}}
+        )
+        balance = compute_balance(
+            documents,
+            group_details,
+            request.year,
+            request.month,
+            totals=parse_summary_data(summaries, group_details),
+        )
+    else:
+        documents = await movement_documents({"group": request.group})
+        if not documents:
+            raise HTTPException(status_code=404, detail="Data not found")
+        balance = compute_balance(documents, group_details, request.year, request.month)
 
-def estimate_monthly_expense(expense: list) -> float:
-    total = 0
-    for exp in expense:
-        for expense_detail in exp["expense_detail"]:
-            total += expense_detail["amount"]
-    return total
+    content: str = BALANCE.render(dict(balance))
+    return content
 
 
 @router.post("/download/balance")
@@ -193,49 +256,28 @@ async def download_balance(
     Download the receipts
     """
     validate_scope(request.group, access_token_details)
-    data_per_month = {}
-    try:
-        data_per_month = await get_parsed_data(
-            group_id=request.group,
-            user_id=None,
-            date=request.year + "-" + request.month,
-            access_token=access_token,
-            access_token_details=access_token_details,
-        )
-        parsed_expenses = data_per_month["parsed_data"].dict()["expense"]
-        parsed_income = data_per_month["parsed_data"].dict()["income"]
-    except HTTPException:
-        parsed_expenses = []
-        parsed_income = []
-
-    monthly_income = estimate_monthly_income(parsed_income)
-    monthly_expense = estimate_monthly_expense(parsed_expenses)
-    general_data = await get_parsed_data(
-        group_id=request.group,
-        user_id=None,
-        date=None,
-        access_token=access_token,
-        access_token_details=access_token_details,
-    )
-    user_with_debt = ""
-    for user in general_data["group_details"].users_with_debt or []:
-        user_with_debt += user.replace("DEPTO", "")
-
-    data = {
-        "group": request.group,
-        "group_details": general_data["group_details"],
-        "users_with_debt": user_with_debt,
-        "year": request.year,
-        "month": request.month,
-        "categories": get_categories_with_expenses(parsed_expenses),
-        "monthly_income": monthly_income,
-        "monthly_expense": monthly_expense,
-    }
-    template = jinja2.Template(BALANCE_TEMPLATE)
-    content = template.render(data)
-    pdf_file = create_pdf_balance(content)
-    return StreamingResponse(
-        BytesIO(pdf_file),
-        media_type="application/pdf",
-        headers={"Content-Disposition": "attachment; filename=receipts.pdf"},
+    cache_key = await pdf_cache_key(
+        "balance", request.group, f"{request.year}-{request.month}"
     )
+    cached = pdf_cache.get(cache_key)
+    if cached is not None:
+        return pdf_response(cached)
+    content = await render_balance(request)
+    # the slot only covers the layout, not the reads before it
+    with acquire_pdf_slot():
+        pdf_file = await pdf_pool.run(create_pdf_balance, content)
+    pdf_cache.set(cache_key, pdf_file)
+    return pdf_response(pdf_file)
+
+
+@router.get("/cache")
+async def get_cache_stats(
+    access_token: HTTPAuthorizationCredentials = Security(security),
+    access_token_details: OwnerObject = Depends(validate_access_token),
+) -> dict[str, dict[str, int]]:
+    """
+    PDF cache and render pool counters. Only admin users can access this endpoint.
+    """
+    if access_token_details.token_type != TokenType.admin:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return {"pdf_cache": pdf_cache.stats(), "pdf_pool": pdf_pool.stats()}
@@ -1,108 +1,260 @@
+from collections.abc import AsyncIterator
 from datetime import datetime
+from typing import Any
 
-from pydantic import TypeAdapter
+from pymongo.errors import BulkWriteError
 
 from app.utils.db import expenses_db
 from app.utils.get_common import (
     CommonMongoGetQueryParams,
     get_records,
+    iter_records,
+    read_models,
 )
 
+from .counters import (
+    PENDING_TRANSACTION_ID,
+    next_transaction_id,
+    reserve_transaction_ids,
+)
+from .data_version import bump_data_version, movement_groups
 from .models import GroupDetails, TransactionData
+from .operations import DEBT_CATEGORY, DEFAULT_CREATED_AT, INCOME_CATEGORIES
+from .summary import record_movement_change, record_movements_added
 
 
-def query_actions(
+async def query_action_documents(
     mongo_params: CommonMongoGetQueryParams,
-) -> list[TransactionData]:
+) -> list[dict[str, Any]]:
     """
     Query the Overwatching Actions DB by a given filter and projection
     """
     mongo_params.filter = mongo_params.filter or {}
     mongo_params.filter["removed"] = {"$exists": False}
-    results = get_records(expenses_db, "Movements", mongo_params, True)
-    transaction_list_adapter = TypeAdapter(list[TransactionData])
-    return transaction_list_adapter.validate_python(results)
+    return await get_records(expenses_db, "Movements", mongo_params, True)
+
+
+async def export_movements(
+    mongo_params: CommonMongoGetQueryParams, batch_size: int
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Stream every Movement matching the params as raw documents, for exports
+    """
+    mongo_params.filter = mongo_params.filter or {}
+    mongo_params.filter["removed"] = {"$exists": False}
+    return await iter_records(expenses_db, "Movements", mongo_params, batch_size)
 
 
-def get_group_definition(group_filter: dict) -> GroupDetails | None:
-    result = expenses_db.Groups.find_one(group_filter, {"_id": 0})
+async def get_group_definition(group_filter: dict) -> GroupDetails | None:
+    result = await expenses_db.Groups.find_one(group_filter, {"_id": 0})
     if result is not None:
-        # Validate result using GroupDetails TypeAdapter
-        group_adapter = TypeAdapter(GroupDetails)
-        return group_adapter.validate_python(result)
+        return GroupDetails.model_validate(result)
     return None
 
 
-def simple_query(query_filter: dict) -> list[TransactionData]:
-    results = list(expenses_db.Movements.find(query_filter, {"_id": 0}))
-    transaction_list_adapter = TypeAdapter(list[TransactionData])
-    return transaction_list_adapter.validate_python(results)
+async def simple_query(query_filter: dict) -> list[TransactionData]:
+    results = await expenses_db.Movements.find(query_filter, {"_id": 0}).to_list()
+    return read_models(TransactionData, results)
+
 
+PARSE_PROJECTION = {
+    "_id": 0,
+    "transaction_id": 1,
+    "user": 1,
+    "name": 1,
+    "amount": 1,
+    "comments": 1,
+    "category": 1,
+    "movement_type": 1,
+    "created_at": 1,
+    "date": 1,
+}
+# the fields `parse_totals` needs, without the transaction details
+TOTALS_PROJECTION = {
+    "_id": 0,
+    "user": 1,
+    "amount": 1,
+    "category": 1,
+    "movement_type": 1,
+    "created_at": 1,
+    "date": 1,
+}
 
-def add_movement(movement_data: TransactionData) -> None:
-    expenses_db.Movements.insert_one(movement_data.model_dump())
 
+async def movement_documents(
+    query_filter: dict, projection: dict[str, Any] = PARSE_PROJECTION
+) -> list[dict[str, Any]]:
+    """
+    Trusted read: the raw Movements documents with only the fields
+    `parse_data` uses, without building a TransactionData per row
+    """
+    cursor = expenses_db.Movements.find(query_filter, projection)
+    documents: list[dict[str, Any]] = await cursor.to_list()
+    return documents
 
-def update_db(query: dict, update: dict) -> None:
-    expenses_db.Movements.update_one(query, update)
+
+def month_facet(match: dict[str, Any], date: Any) -> list[dict[str, Any]]:
+    """
+    Facet stages that total a kind of movement per "%Y-%m" of `date`
+    """
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m", "date": date}},
+                "total": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+            }
+        },
+    ]
+
+
+async def aggregate_parsed_data(query_filter: dict) -> dict[str, list[dict[str, Any]]]:
+    """
+    Compute the per-month income, expense and debt totals of the matching
+    Movements in Mongo. Each facet entry has the month as `_id`, `total`
+    and `count`; debt entries also carry their `users`. `matched` holds the
+    overall count. Transaction details are not aggregated: the facets are
+    a single document and pushing every movement into it would go over
+    the 16MB document limit on large groups.
+    """
+    debt_facet = month_facet(
+        {"category": DEBT_CATEGORY, "date": {"$type": "date"}}, "$date"
+    )
+    debt_facet[1]["$group"]["users"] = {"$addToSet": "$user"}
+    # bucketed like the python engine buckets documents without created_at
+    created_at = {"$ifNull": ["$created_at", DEFAULT_CREATED_AT]}
+    pipeline: list[dict[str, Any]] = [
+        {"$match": query_filter},
+        {
+            "$facet": {
+                "income": month_facet(
+                    {"category": {"$in": sorted(INCOME_CATEGORIES)}}, created_at
+                ),
+                "expense": month_facet({"movement_type": "expense"}, created_at),
+                "debt": debt_facet,
+                "matched": [{"$count": "rows"}],
+            }
+        },
+    ]
+    cursor = await expenses_db.Movements.aggregate(pipeline)
+    result: dict[str, list[dict[str, Any]]] = await anext(cursor, {})
+    return result
 
 
-def delete_db(query: dict) -> None:
-    expenses_db.Movements.delete_one(query)
+async def add_movement(movement_data: TransactionData) -> None:
+    movement = movement_data.model_dump()
+    await expenses_db.Movements.insert_one(movement)
+    await record_movement_change(None, movement)
+    await bump_data_version(movement_groups(movement))
 
 
-def get_last_transaction_id(
-    user_id: str,
-    group: str,
-    movement_type: str,  # 'income' or 'expense'
-) -> int:
+async def assign_transaction_ids(movements: list[TransactionData]) -> None:
     """
-    Returns the last valid transaction_id for a user and group,
-    considering the following rules:
+    Give every movement that is not a pending receipt its own folio, from
+    one reserved block per (group, movement_type)
+    """
+    batches: dict[tuple[str, str], list[TransactionData]] = {}
+    for movement in movements:
+        if movement.transaction_id != PENDING_TRANSACTION_ID and movement.group:
+            key = (movement.group, movement.movement_type.value)
+            batches.setdefault(key, []).append(movement)
+    for (group, movement_type), batch in batches.items():
+        folios = await reserve_transaction_ids(group, movement_type, len(batch))
+        for movement, folio in zip(batch, folios, strict=True):
+            movement.transaction_id = folio
+
 
-    - Pending (transaction_id == 9999) are ignored.
-    - Incomes have ID < 10000.
-    - Expenses have ID > 10000.
-    - 'DEPTO 0' (management) can now have both incomes and expenses.
-    - For 'DEPTO 0' incomes, we look for IDs < 10000 as usual.
+async def add_movements(movements: list[TransactionData]) -> dict[int, str]:
+    """
+    Insert the movements with a single unordered insert_many, assigning
+    the folios of those that are not pending receipts first.
+    Returns the error of every movement that was not inserted, by position.
     """
+    await assign_transaction_ids(movements)
+    documents = [movement.model_dump() for movement in movements]
+    errors: dict[int, str] = {}
+    try:
+        await expenses_db.Movements.insert_many(documents, ordered=False)
+    except BulkWriteError as exc:
+        errors = {
+            error["index"]: error.get("errmsg", "write error")
+            for error in exc.details.get("writeErrors", [])
+        }
+    inserted = [
+        document for index, document in enumerate(documents) if index not in errors
+    ]
+    await record_movements_added(inserted)
+    await bump_data_version(movement_groups(*inserted))
+    return errors
 
-    # Define query range based on movement type
-    if movement_type == "income":
-        id_query = {"$lt": 10000, "$nin": [9999]}
-    elif movement_type == "expense":
-        id_query = {"$gt": 10000, "$nin": [9999]}
-    else:
-        raise ValueError("movement_type must be either 'income' or 'expense'")
 
-    # Fetch last transaction for this group and user type
-    last_tx = expenses_db.Movements.find_one(
-        {"transaction_id": id_query, "group": group},
-        sort=[("transaction_id", -1)],
+async def paid_members(
+    group: str, members: list[str], date: datetime, category: str | None
+) -> set[str]:
+    """
+    Members of a group with an income of `category` already recorded for `date`
+    """
+    cursor = expenses_db.Movements.find(
+        {
+            "group": group,
+            "user": {"$in": members},
+            "date": date,
+            "movement_type": "income",
+            "category": category,
+        },
+        {"_id": 0, "user": 1},
     )
+    return {document["user"] async for document in cursor}
 
-    # Default values when nothing found
-    if not last_tx:
-        return 10000 if movement_type == "expense" else 0
 
-    last_id: int = last_tx["transaction_id"]
+def apply_set(document: dict[str, Any], fields: dict[str, Any]) -> dict[str, Any]:
+    """
+    The document as a `$set` of `fields` leaves it, dotted paths included,
+    without modifying `document`
+    """
+    after = dict(document)
+    for path, value in fields.items():
+        *parents, leaf = path.split(".")
+        target = after
+        for parent in parents:
+            child = target.get(parent)
+            target[parent] = dict(child) if isinstance(child, dict) else {}
+            target = target[parent]
+        target[leaf] = value
+    return after
 
-    # For non-management users, ensure continuity (avoid overlaps)
-    if user_id == last_tx.get("user") and user_id != "DEPTO 0":
-        return last_id - 1
 
-    return last_id
+async def update_db(query: dict, update: dict) -> None:
+    """
+    Apply a `$set` update to the first matching Movement. The after image
+    for the summary is derived from the atomic before image, so it costs
+    no second read and cannot see a concurrent write.
+    """
+    if set(update) != {"$set"}:
+        raise ValueError("update_db only supports $set updates")
+    before = await expenses_db.Movements.find_one_and_update(query, update)
+    if before is not None:
+        after = apply_set(before, update["$set"])
+        await record_movement_change(before, after)
+        await bump_data_version(movement_groups(before, after))
+
 
+async def delete_db(query: dict) -> None:
+    before = await expenses_db.Movements.find_one_and_delete(query)
+    await record_movement_change(before, None)
+    await bump_data_version(movement_groups(before))
 
-def update_movement(query_filter: dict) -> None:
-    expenses_db.Movements.update_one(
+
+async def update_movement(query_filter: dict) -> None:
+    transaction_id = await next_transaction_id(
+        query_filter["user"], query_filter["group"], movement_type="income"
+    )
+    await update_db(
         query_filter,
         {
             "$set": {
-                "transaction_id": get_last_transaction_id(
-                    query_filter["user"], query_filter["group"], movement_type="income"
-                )
-                + 1,
+                "transaction_id": transaction_id,
                 "created_at": datetime.now(),
                 "category": "MONTHLY_INCOME",
             }
@@ -0,0 +1,208 @@
+"""
+Atomic transaction_id (folio) allocation.
+
+One Counters document per (group, movement_type) holds the last folio
+handed out and the user it was given to:
+
+    {"group": "G", "movement_type": "income", "value": 41, "last_user": "DEPTO 3"}
+
+Incomes use 1..9998 (9999 marks pending receipts), expenses start at 10001.
+Batches reserve a block of folios with one update. A counter is seeded
+from the Movements maxima the first time it is used; seed every group up
+front with:
+
+    uv run python -m app.routers.transactions.counters seed
+"""
+
+import argparse
+import asyncio
+from typing import Any
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.utils.db import expenses_db, run_connected
+from app.utils.indexes import INDEXES
+from app.utils.logger import logger
+
+COUNTERS_COLLECTION = "Counters"
+PENDING_TRANSACTION_ID = 9999
+MANAGEMENT_USER = "DEPTO 0"
+# movement_type -> (value before the first folio, exclusive upper bound)
+ID_RANGES: dict[str, tuple[int, int | None]] = {
+    "income": (0, PENDING_TRANSACTION_ID),
+    "expense": (10000, None),
+}
+counter_index_ready = False
+
+
+def id_range(movement_type: str) -> tuple[int, int | None]:
+    if movement_type not in ID_RANGES:
+        raise ValueError("movement_type must be either 'income' or 'expense'")
+    return ID_RANGES[movement_type]
+
+
+async def last_movement(group: str, movement_type: str) -> dict[str, Any] | None:
+    """
+    Movement with the highest transaction_id of the movement_type range
+    """
+    if movement_type == "income":
+        id_query = {"$lt": 10000, "$nin": [PENDING_TRANSACTION_ID]}
+    else:
+        id_query = {"$gt": 10000, "$nin": [PENDING_TRANSACTION_ID]}
+    movement: dict[str, Any] | None = await expenses_db.Movements.find_one(
+        {"transaction_id": id_query, "group": group},
+        {"_id": 0, "transaction_id": 1, "user": 1},
+        sort=[("transaction_id", -1)],
+    )
+    return movement
+
+
+async def ensure_counter_index() -> None:
+    """
+    Create the unique (group, movement_type) index the seeding upsert relies
+    on, once per process, so it holds without ENSURE_INDEXES or
+    `cmd.sh indexes`
+    """
+    global counter_index_ready
+    if not counter_index_ready:
+        await expenses_db[COUNTERS_COLLECTION].create_indexes(
+            INDEXES[COUNTERS_COLLECTION]
+        )
+        counter_index_ready = True
+
+
+async def seed_counter(group: str, movement_type: str) -> None:
+    """
+    Create the counter from the current maximum in Movements. `$max` keeps
+    an existing counter from moving backwards. When a concurrent seed wins
+    the upsert the unique index rejects ours and the `$max` is applied to
+    the counter it created.
+    """
+    await ensure_counter_index()
+    base, _ = id_range(movement_type)
+    movement = await last_movement(group, movement_type)
+    value = movement["transaction_id"] if movement else base
+    query = {"group": group, "movement_type": movement_type}
+    update = {
+        "$max": {"value": value},
+        "$setOnInsert": {"last_user": movement["user"] if movement else None},
+    }
+    try:
+        await expenses_db[COUNTERS_COLLECTION].update_one(query, update, upsert=True)
+    except DuplicateKeyError:
+        await expenses_db[COUNTERS_COLLECTION].update_one(query, update)
+
+
+async def increment_counter(
+    group: str,
+    movement_type: str,
+    update: list[dict[str, Any]] | dict[str, Any],
+    guard: dict[str, Any],
+) -> int | None:
+    """
+    Apply `update` atomically to the counter if it matches `guard`, seeding
+    it first if missing. Returns the new value, or None when the counter
+    exists but does not match `guard`.
+    """
+    query = {"group": group, "movement_type": movement_type, **guard}
+    counters = expenses_db[COUNTERS_COLLECTION]
+    counter = await counters.find_one_and_update(
+        query, update, return_document=ReturnDocument.AFTER
+    )
+    if counter is None:
+        await seed_counter(group, movement_type)
+        counter = await counters.find_one_and_update(
+            query, update, return_document=ReturnDocument.AFTER
+        )
+        if counter is None:
+            return None
+    value: int = counter["value"]
+    return value
+
+
+async def next_transaction_id(user_id: str, group: str, movement_type: str) -> int:
+    """
+    Allocate the transaction_id for a new movement of `user_id`.
+
+    Consecutive movements of the same user share the folio, so they end up
+    in a single receipt, except for management ('DEPTO 0'). The range is
+    checked in the update filter, a full range raises ValueError without
+    advancing the counter.
+    """
+    _, upper = id_range(movement_type)
+    guard: dict[str, Any] = {}
+    if upper is not None:
+        room: list[dict[str, Any]] = [{"value": {"$lt": upper - 1}}]
+        if user_id != MANAGEMENT_USER:
+            # the same user keeps the current folio, which is in range
+            room.append({"last_user": user_id})
+        guard = {"$or": room}
+    user = {"$literal": user_id}
+    same_user = {
+        "$and": [{"$eq": ["$last_user", user]}, {"$ne": [user, MANAGEMENT_USER]}]
+    }
+    transaction_id = await increment_counter(
+        group,
+        movement_type,
+        [
+            {
+                "$set": {
+                    "value": {"$cond": [same_user, "$value", {"$add": ["$value", 1]}]},
+                    "last_user": user,
+                }
+            }
+        ],
+        guard,
+    )
+    if transaction_id is None:
+        raise ValueError(f"No {movement_type} transaction_id left below {upper}")
+    return transaction_id
+
+
+async def reserve_transaction_ids(group: str, movement_type: str, count: int) -> range:
+    """
+    Reserve `count` consecutive transaction_ids in a single round trip.
+    The block is never shared with the next movement of a user. A block
+    that does not fit below the range limit raises ValueError without
+    advancing the counter.
+    """
+    if count <= 0:
+        return range(0)
+    _, upper = id_range(movement_type)
+    guard = {} if upper is None else {"value": {"$lt": upper - count}}
+    last_id = await increment_counter(
+        group,
+        movement_type,
+        {"$inc": {"value": count}, "$set": {"last_user": None}},
+        guard,
+    )
+    if last_id is None:
+        raise ValueError(
+            f"No {count} {movement_type} transaction_ids left below {upper}"
+        )
+    return range(last_id - count + 1, last_id + 1)
+
+
+async def seed_all_counters() -> int:
+    """
+    Seed the counters of every group with Movements. Returns how many
+    counters were seeded.
+    """
+    seeded = 0
+    for group in await expenses_db.Movements.distinct("group"):
+        if group is None:
+            continue
+        for movement_type in ID_RANGES:
+            await seed_counter(group, movement_type)
+            seeded += 1
+    logger.info("Seeded %d transaction counters", seeded)
+    return seeded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("seed", help="Seed counters from Movements maxima")
+    parser.parse_args()
+    asyncio.run(run_connected(seed_all_counters))
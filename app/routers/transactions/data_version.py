@@ -0,0 +1,45 @@
+"""
+Per-group data version.
+
+Every write to Movements bumps the version of the groups it touched:
+
+    {"group": "G", "version": 42}
+
+Anything derived from a group's movements (e.g. the cached report PDFs) can
+use the version as part of its key and never be served stale.
+"""
+
+from collections.abc import Iterable
+from typing import Any
+
+from pymongo import UpdateOne
+
+from app.utils.db import expenses_db
+
+DATA_VERSIONS_COLLECTION = "DataVersions"
+
+
+def movement_groups(*movements: dict[str, Any] | None) -> set[str]:
+    return {
+        movement["group"]
+        for movement in movements
+        if movement and movement.get("group") is not None
+    }
+
+
+async def bump_data_version(groups: Iterable[str]) -> None:
+    operations = [
+        UpdateOne({"group": group}, {"$inc": {"version": 1}}, upsert=True)
+        for group in groups
+    ]
+    if operations:
+        await expenses_db[DATA_VERSIONS_COLLECTION].bulk_write(
+            operations, ordered=False
+        )
+
+
+async def get_data_version(group: str) -> int:
+    document = await expenses_db[DATA_VERSIONS_COLLECTION].find_one(
+        {"group": group}, {"_id": 0, "version": 1}
+    )
+    return document["version"] if document else 0
@@ -18,3 +18,20 @@ class GenResponseCode(str, Enum):
 class IncomeCategory(str, Enum):
     monthly = "MONTHLY_INCOME"
     extraordinary = "EXTRAORDINARY_INCOME"
+
+
+class ParsedDataEngine(str, Enum):
+    python = "python"
+    aggregation = "aggregation"
+    summary = "summary"
+
+
+class ParsedDataDetail(str, Enum):
+    none = "none"
+    months = "months"
+    full = "full"
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
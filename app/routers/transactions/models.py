@@ -2,7 +2,7 @@ from datetime import datetime
 
 from pydantic import BaseModel, Field, field_validator
 
-from .enums import IncomeCategory, MovementType
+from .enums import GenResponseCode, IncomeCategory, MovementType
 
 
 class TransactionData(BaseModel):
@@ -71,6 +71,14 @@ class CreateNewBatchTransaction(BaseModel):
     comments: str | None = None
 
 
+class ReceiptBatchResult(BaseModel):
+    status: GenResponseCode
+    created: list[str] = []
+    already_paid: list[str] = []
+    # member -> reason the receipt could not be written
+    errors: dict[str, str] = {}
+
+
 class CreateNewTransaction(BaseModel):
     group_id: str
     user_id: str
@@ -1,18 +1,28 @@
+from collections.abc import Iterable
 from datetime import datetime
 from typing import Any
 
 from dateutil.relativedelta import relativedelta
-from pydantic import TypeAdapter
 
 from .models import (
-    DebtDataMonth,
-    ExpenseDataMonth,
     GroupDetails,
-    IncomeDataMonth,
     ParsedData,
     TransactionData,
 )
 
+INCOME_CATEGORIES = frozenset({"MONTHLY_INCOME", "EXTRAORDINARY_INCOME"})
+DEBT_CATEGORY = "VENCIDO"
+# what a TransactionData gets for a document stored without created_at, raw
+# documents (trusted reads) are bucketed with it too so both reads agree
+DEFAULT_CREATED_AT: datetime = TransactionData.model_fields["created_at"].default
+
+
+def month_key(value: datetime) -> str:
+    """
+    Same key as `value.strftime("%Y-%m")` without the format parsing cost
+    """
+    return f"{value.year:04d}-{value.month:02d}"
+
 
 def get_months(initial_date: datetime) -> list[str]:
     now = datetime.now()
@@ -21,136 +31,190 @@ def get_months(initial_date: datetime) -> list[str]:
     # Start at the initial date and increment by one month on each iteration
     month = initial_date
     while month <= now:
-        months.append(month.strftime("%Y-%m"))
+        months.append(month_key(month))
         month += relativedelta(months=1)
     return months
 
 
-def parse_data(data: list[TransactionData], group_details: GroupDetails) -> ParsedData:
-    return ParsedData(
-        income=parse_income_data(data, group_details),
-        expense=parse_expense_data(data, group_details),
-        debt=parse_debt_data(data, group_details),
-    )
+def transaction_detail(row: dict[str, Any]) -> dict[str, Any]:
+    return {
+        "transaction_id": row["transaction_id"],
+        "user": row["user"],
+        "name": row["name"],
+        "amount": row["amount"],
+        "comments": row.get("comments"),
+        "category": row.get("category"),
+    }
 
 
-def parse_income_data(
-    data: list[TransactionData], group_details: GroupDetails
-) -> list[IncomeDataMonth]:
-    result_list: list[dict[str, Any]] = []
-    months = get_months(group_details.created_at)
-    for month in months:
-        result_list.append(
+def empty_buckets(months: list[str]) -> dict[str, list[dict[str, Any]]]:
+    return {
+        "income": [
             {
                 "datetime": month,
                 "total_income": 0.0,
                 "total_contributions": 0,
                 "income_source": [],
             }
-        )
-    for transaction in data:
-        if transaction.category in [
-            "MONTHLY_INCOME",
-            "EXTRAORDINARY_INCOME",
-        ]:
-            transaction_date = transaction.created_at.strftime("%Y-%m")
-            for result in result_list:
-                if result["datetime"] == transaction_date:
-                    result["total_income"] = (
-                        float(result["total_income"]) + transaction.amount
-                    )
-                    income_source: list = result["income_source"]  # type: ignore
-                    income_source.append(
-                        {
-                            "transaction_id": transaction.transaction_id,
-                            "user": transaction.user,
-                            "name": transaction.name,
-                            "amount": transaction.amount,
-                            "comments": transaction.comments,
-                            "category": transaction.category,
-                        }
-                    )
-                    result["total_contributions"] = len(income_source)
-    return TypeAdapter(list[IncomeDataMonth]).validate_python(result_list)
-
-
-def parse_expense_data(
-    data: list[TransactionData], group_details: GroupDetails
-) -> list[ExpenseDataMonth]:
-    result_list: list[dict[str, Any]] = []
-    months = get_months(group_details.created_at)
-    for month in months:
-        result_list.append(
+            for month in months
+        ],
+        "expense": [
             {
                 "datetime": month,
                 "total_expense": 0.0,
                 "total_expenses": 0,
                 "expense_detail": [],
             }
-        )
-    for transaction in data:
-        if transaction.movement_type in ["expense"]:
-            transaction_date = transaction.created_at.strftime("%Y-%m")
-            for result in result_list:
-                if result["datetime"] == transaction_date:
-                    result["total_expense"] = (
-                        float(result["total_expense"]) + transaction.amount
-                    )
-                    expense_detail: list = result["expense_detail"]  # type: ignore
-                    expense_detail.append(
-                        {
-                            "transaction_id": transaction.transaction_id,
-                            "user": transaction.user,
-                            "name": transaction.name,
-                            "amount": transaction.amount,
-                            "comments": transaction.comments,
-                            "category": transaction.category,
-                        }
-                    )
-                    result["total_expenses"] = len(expense_detail)
-    return TypeAdapter(list[ExpenseDataMonth]).validate_python(result_list)
-
-
-def parse_debt_data(
-    data: list[TransactionData], group_details: GroupDetails
-) -> list[DebtDataMonth]:
-    result_list: list[dict[str, Any]] = []
-    months = get_months(group_details.created_at)
-    for month in months:
-        result_list.append(
+            for month in months
+        ],
+        "debt": [
             {
                 "datetime": month,
                 "total_debt": 0.0,
                 "total_contributions_in_debt": 0,
                 "debt_detail": [],
             }
-        )
+            for month in months
+        ],
+    }
+
+
+def bucket_transactions(
+    data: Iterable[TransactionData | dict[str, Any]],
+    group_details: GroupDetails,
+    include_details: bool = True,
+) -> tuple[dict[str, list[dict[str, Any]]], list[str]]:
+    """
+    Classify every transaction once into income, expense and debt and
+    accumulate it into its month, looked up by key instead of scanning
+    the month list. Transactions outside the group months are ignored.
+    Rows can be models or raw Movements documents (trusted reads), raw
+    documents without created_at count as DEFAULT_CREATED_AT like models do.
+    Without `include_details` only the totals are kept. Returns the
+    buckets and the users with debt.
+    """
+    months = get_months(group_details.created_at)
+    month_index = {month: position for position, month in enumerate(months)}
+    buckets = empty_buckets(months)
+    income, expense, debt = buckets["income"], buckets["expense"], buckets["debt"]
+    users_with_debt: dict[str, None] = {}
+
     for transaction in data:
-        if transaction.category in ["VENCIDO"]:
-            if transaction.date is not None:
-                transaction_date = transaction.date.strftime("%Y-%m")
-                for result in result_list:
-                    if result["datetime"] == transaction_date:
-                        result["total_debt"] = (
-                            float(result["total_debt"]) + transaction.amount
-                        )
-                        debt_detail: list = result["debt_detail"]  # type: ignore
-                        debt_detail.append(
-                            {
-                                "transaction_id": transaction.transaction_id,
-                                "user": transaction.user,
-                                "name": transaction.name,
-                                "amount": transaction.amount,
-                                "comments": transaction.comments,
-                                "category": transaction.category,
-                            }
-                        )
-                        result["total_contributions_in_debt"] = len(debt_detail)
-    return TypeAdapter(list[DebtDataMonth]).validate_python(result_list)
+        row = transaction if isinstance(transaction, dict) else transaction.__dict__
+        category = row.get("category")
+        is_income = category in INCOME_CATEGORIES
+        is_expense = row["movement_type"] == "expense"
+        if is_income or is_expense:
+            created_at = row.get("created_at") or DEFAULT_CREATED_AT
+            position = month_index.get(month_key(created_at))
+            if position is not None:
+                if is_income:
+                    month_income = income[position]
+                    month_income["total_income"] += row["amount"]
+                    if include_details:
+                        month_income["income_source"].append(transaction_detail(row))
+                    month_income["total_contributions"] += 1
+                if is_expense:
+                    month_expense = expense[position]
+                    month_expense["total_expense"] += row["amount"]
+                    if include_details:
+                        month_expense["expense_detail"].append(transaction_detail(row))
+                    month_expense["total_expenses"] += 1
+        date = row.get("date")
+        if category == DEBT_CATEGORY and date is not None:
+            position = month_index.get(month_key(date))
+            if position is not None:
+                month_debt = debt[position]
+                month_debt["total_debt"] += row["amount"]
+                if include_details:
+                    month_debt["debt_detail"].append(transaction_detail(row))
+                month_debt["total_contributions_in_debt"] += 1
+                users_with_debt[row["user"]] = None
+
+    return buckets, sorted(users_with_debt)
+
+
+def parse_data(
+    data: Iterable[TransactionData | dict[str, Any]], group_details: GroupDetails
+) -> ParsedData:
+    buckets, _ = bucket_transactions(data, group_details)
+    return ParsedData.model_validate(buckets)
+
+
+def parse_totals(
+    data: Iterable[TransactionData | dict[str, Any]], group_details: GroupDetails
+) -> tuple[ParsedData, list[str]]:
+    """
+    The per-month totals of `parse_data` without the transaction details,
+    and the users with debt for `parse_group_details`
+    """
+    buckets, users_with_debt = bucket_transactions(
+        data, group_details, include_details=False
+    )
+    return ParsedData.model_validate(buckets), users_with_debt
+
+
+def parse_aggregated_data(
+    aggregated: dict[str, list[dict[str, Any]]], group_details: GroupDetails
+) -> tuple[ParsedData, list[str]]:
+    """
+    Lay the per-month facets of `aggregate_parsed_data` over the group
+    months, without transaction details. Returns the parsed data and the
+    users with debt, which `parse_group_details` needs instead.
+    """
+    months = get_months(group_details.created_at)
+    month_index = {month: position for position, month in enumerate(months)}
+    buckets = empty_buckets(months)
+    fields = {
+        "income": ("total_income", "total_contributions"),
+        "expense": ("total_expense", "total_expenses"),
+        "debt": ("total_debt", "total_contributions_in_debt"),
+    }
+    users_with_debt: set[str] = set()
+    for kind, (total_field, count_field) in fields.items():
+        for month in aggregated.get(kind, []):
+            position = month_index.get(month["_id"])
+            if position is None:
+                continue
+            bucket = buckets[kind][position]
+            bucket[total_field] = float(month["total"])
+            bucket[count_field] = month["count"]
+            users_with_debt.update(month.get("users", []))
+    return ParsedData.model_validate(buckets), sorted(users_with_debt)
+
+
+def parse_summary_data(
+    summaries: list[dict[str, Any]], group_details: GroupDetails
+) -> tuple[ParsedData, list[str]]:
+    """
+    Per-month totals from the GroupMonthlySummary documents of a group,
+    without transaction details
+    """
+    aggregated: dict[str, list[dict[str, Any]]] = {
+        "income": [],
+        "expense": [],
+        "debt": [],
+    }
+    for summary in summaries:
+        for kind, month_list in aggregated.items():
+            totals = summary.get(kind) or {}
+            if not totals.get("count"):
+                continue
+            month = {"_id": summary["month"], **totals}
+            if kind == "debt":
+                month["users"] = [
+                    user
+                    for user, count in (summary.get("debt_users") or {}).items()
+                    if count > 0
+                ]
+            month_list.append(month)
+    return parse_aggregated_data(aggregated, group_details)
 
 
 def parse_group_details(
-    group_details: GroupDetails, parsed_data: ParsedData
+    group_details: GroupDetails,
+    parsed_data: ParsedData,
+    users_with_debt: list[str] | None = None,
 ) -> GroupDetails:
     group_details.total_income = sum(
         [month.total_income for month in parsed_data.income]
@@ -180,14 +244,12 @@ def parse_group_details(
         group_details.total_income - group_details.total_expense
     )
 
-    user_with_debt = []
-    for month in parsed_data.debt:
-        for debt in month.debt_detail:
-            if debt.user not in user_with_debt:
-                user_with_debt.append(debt.user)
-    user_with_debt = sorted(user_with_debt)
-    group_details.users_with_debt = user_with_debt
-
-    # Validate the result using TypeAdapter
-    group_details_adapter = TypeAdapter(GroupDetails)
-    return group_details_adapter.validate_python(group_details)
+    if users_with_debt is None:
+        users_with_debt = []
+        for month in parsed_data.debt:
+            for debt in month.debt_detail:
+                if debt.user not in users_with_debt:
+                    users_with_debt.append(debt.user)
+    group_details.users_with_debt = sorted(users_with_debt)
+
+    return group_details
@@ -0,0 +1,187 @@
+"""
+GroupMonthlySummary read model.
+
+One document per group and month holding the income, expense and debt
+totals/counts plus how many VENCIDO receipts each user has in that month:
+
+    {
+        "group": "G", "month": "2024-03",
+        "income": {"total": 1200.0, "count": 10},
+        "expense": {"total": 300.0, "count": 2},
+        "debt": {"total": 240.0, "count": 2},
+        "debt_users": {"DEPTO 1": 1, "DEPTO 2": 1},
+    }
+
+User names are escaped as `debt_users` keys (`user_key`), since a "." or
+a leading "$" would break the `$inc` path; `get_group_summary` returns
+them unescaped. Summaries written before the escaping are fixed by a
+rebuild.
+
+Writes to Movements keep it up to date with `$inc` deltas. Backfill with:
+
+    uv run python -m app.routers.transactions.summary rebuild [--group G]
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict
+from datetime import datetime
+from typing import Any
+from urllib.parse import unquote
+
+from pymongo import UpdateOne
+
+from app.utils.db import expenses_db, run_connected
+from app.utils.logger import logger
+
+from .operations import (
+    DEBT_CATEGORY,
+    DEFAULT_CREATED_AT,
+    INCOME_CATEGORIES,
+    month_key,
+)
+
+SUMMARY_COLLECTION = "GroupMonthlySummary"
+
+SummaryDeltas = dict[tuple[str, str], dict[str, float]]
+# "%" first, so escaped sequences are not escaped twice
+KEY_ESCAPES = (("%", "%25"), (".", "%2E"), ("$", "%24"))
+
+
+def user_key(user: str) -> str:
+    """
+    `user` as a field name that is safe in a `$inc` path
+    """
+    for char, escaped in KEY_ESCAPES:
+        user = user.replace(char, escaped)
+    return user
+
+
+def user_from_key(key: str) -> str:
+    return unquote(key)
+
+
+def summary_deltas(movement: dict[str, Any] | None, sign: int = 1) -> SummaryDeltas:
+    """
+    Contribution of a single Movement document to the summary, keyed by
+    (group, month). Income and expense are bucketed by `created_at`, debt
+    by `date`, the same way `parse_data` does, documents without
+    `created_at` count as DEFAULT_CREATED_AT.
+    """
+    deltas: SummaryDeltas = defaultdict(lambda: defaultdict(float))
+    if not movement or movement.get("group") is None:
+        return deltas
+    group = movement["group"]
+    amount = float(movement.get("amount") or 0) * sign
+    category = movement.get("category")
+    is_income = category in INCOME_CATEGORIES
+    is_expense = movement.get("movement_type") == "expense"
+    if is_income or is_expense:
+        created_at = movement.get("created_at") or DEFAULT_CREATED_AT
+        month = deltas[(group, month_key(created_at))]
+        if is_income:
+            month["income.total"] += amount
+            month["income.count"] += sign
+        if is_expense:
+            month["expense.total"] += amount
+            month["expense.count"] += sign
+    date = movement.get("date")
+    if category == DEBT_CATEGORY and isinstance(date, datetime):
+        month = deltas[(group, month_key(date))]
+        month["debt.total"] += amount
+        month["debt.count"] += sign
+        month[f"debt_users.{user_key(str(movement.get('user')))}"] += sign
+    return deltas
+
+
+def add_deltas(target: SummaryDeltas, deltas: SummaryDeltas) -> SummaryDeltas:
+    for key, fields in deltas.items():
+        for field, value in fields.items():
+            target[key][field] += value
+    return target
+
+
+async def apply_summary_deltas(deltas: SummaryDeltas) -> None:
+    """
+    Apply the deltas with a single bulk write of `$inc` upserts
+    """
+    operations = []
+    for (group, month), fields in deltas.items():
+        # counts are kept as integers, only totals are floats
+        inc = {
+            field: value if field.endswith(".total") else int(value)
+            for field, value in fields.items()
+            if value
+        }
+        if inc:
+            operations.append(
+                UpdateOne({"group": group, "month": month}, {"$inc": inc}, upsert=True)
+            )
+    if operations:
+        await expenses_db[SUMMARY_COLLECTION].bulk_write(operations, ordered=False)
+
+
+async def record_movement_change(
+    before: dict[str, Any] | None, after: dict[str, Any] | None
+) -> None:
+    """
+    Move a Movement contribution from its `before` to its `after` state,
+    either of them may be None for inserts and deletes
+    """
+    await apply_summary_deltas(
+        add_deltas(summary_deltas(before, -1), summary_deltas(after))
+    )
+
+
+async def record_movements_added(movements: list[dict[str, Any]]) -> None:
+    deltas: SummaryDeltas = defaultdict(lambda: defaultdict(float))
+    for movement in movements:
+        add_deltas(deltas, summary_deltas(movement))
+    await apply_summary_deltas(deltas)
+
+
+async def get_group_summary(group: str) -> list[dict[str, Any]]:
+    cursor = expenses_db[SUMMARY_COLLECTION].find({"group": group}, {"_id": 0})
+    summaries: list[dict[str, Any]] = await cursor.to_list()
+    for summary in summaries:
+        if summary.get("debt_users"):
+            summary["debt_users"] = {
+                user_from_key(key): count
+                for key, count in summary["debt_users"].items()
+            }
+    return summaries
+
+
+async def rebuild_group_summary(group: str | None = None) -> int:
+    """
+    Recompute the summary from Movements, for one group or all of them.
+    Returns the number of summary documents written.
+    """
+    query_filter = {"group": group} if group else {}
+    deltas: SummaryDeltas = defaultdict(lambda: defaultdict(float))
+    projection = {
+        "_id": 0,
+        "group": 1,
+        "user": 1,
+        "amount": 1,
+        "category": 1,
+        "movement_type": 1,
+        "created_at": 1,
+        "date": 1,
+    }
+    async for movement in expenses_db.Movements.find(query_filter, projection):
+        add_deltas(deltas, summary_deltas(movement))
+
+    await expenses_db[SUMMARY_COLLECTION].delete_many(query_filter)
+    await apply_summary_deltas(deltas)
+    logger.info("Rebuilt %d monthly summaries", len(deltas))
+    return len(deltas)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild = subparsers.add_parser("rebuild", help="Backfill from Movements")
+    rebuild.add_argument("--group", help="Only rebuild this group")
+    args = parser.parse_args()
+    asyncio.run(run_connected(rebuild_group_summary, args.group))
@@ -2,40 +2,72 @@
 from datetime import datetime, timedelta
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, Security
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, Security
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app import settings
+from app.utils.export import csv_chunks, export_columns, ndjson_chunks
 from app.utils.get_common import (  # CommonMongoSingleGetQueryParams,
     CommonMongoGetQueryParams,
+    next_cursor_headers,
+    projected_response,
+    read_models,
 )
 from app.utils.logger import logger
 from app.utils.token import OwnerObject, validate_access_token
 
 from .common_functions import (
+    PARSE_PROJECTION,
+    TOTALS_PROJECTION,
     add_movement,
+    add_movements,
+    aggregate_parsed_data,
     delete_db,
+    export_movements,
     get_group_definition,
-    get_last_transaction_id,
-    query_actions,
+    movement_documents,
+    paid_members,
+    query_action_documents,
     simple_query,
     update_db,
     update_movement,
 )
-from .enums import GenResponseCode, IncomeCategory, MovementType
+from .counters import next_transaction_id
+from .enums import (
+    ExportFormat,
+    GenResponseCode,
+    IncomeCategory,
+    MovementType,
+    ParsedDataDetail,
+    ParsedDataEngine,
+)
 from .models import (
     CreateNewBatchTransaction,
     CreateNewTransaction,
+    GroupDetails,
     MarkReceiptAsPaid,
+    ParsedData,
+    ReceiptBatchResult,
     TransactionData,
     UpdateTransaction,
 )
-from .operations import parse_data, parse_group_details
+from .operations import (
+    parse_aggregated_data,
+    parse_data,
+    parse_group_details,
+    parse_summary_data,
+    parse_totals,
+)
+from .summary import get_group_summary
 
 # from app.utils.token import validate_access_token
 # from .models import BugQuery, BugResponse
 
 
 router = APIRouter()
+# routes whose response changed shape, served under /v2/transactions
+router_v2 = APIRouter()
 security = HTTPBearer()
 
 
@@ -55,20 +87,46 @@ def validate_scope(
     return True
 
 
+def parsed_data_response(
+    group_details: GroupDetails,
+    parsed_data: ParsedData,
+    detail: ParsedDataDetail,
+    users_with_debt: list[str] | None = None,
+) -> dict[str, Any]:
+    response: dict[str, Any] = {
+        "group_details": parse_group_details(
+            group_details, parsed_data, users_with_debt
+        )
+    }
+    if detail != ParsedDataDetail.none:
+        response["parsed_data"] = parsed_data
+    return response
+
+
 @router.get("/parsed-data", response_model=Any)
 async def get_parsed_data(
     group_id: str,
     user_id: str | None = None,
     date: str | None = "",
+    engine: ParsedDataEngine | None = None,
+    detail: ParsedDataDetail = ParsedDataDetail.full,
     access_token: HTTPAuthorizationCredentials = Security(security),
     access_token_details: OwnerObject = Depends(validate_access_token),
 ) -> Any:
     """
-    For a given group or user, get the parsed data
+    For a given group or user, get the parsed data.
+    `engine` picks where the totals are computed, defaults to
+    the PARSED_DATA_ENGINE setting. The summary engine returns
+    per-month totals without details and only covers whole groups.
+    The summary and aggregation engines only compute totals, `full` detail
+    is always parsed by the python engine.
+    `detail` trims the answer: `none` returns only the group_details
+    totals, `months` adds the per-month totals without the transaction
+    details and `full` includes them.
     """
     validate_scope(group_id, access_token_details)
     filter_group: dict[str, Any] = {"group": group_id}
-    group_details = get_group_definition(filter_group)
+    group_details = await get_group_definition(filter_group)
     if group_details is None:
         raise HTTPException(status_code=400, detail="group not found")
     if user_id:
@@ -79,82 +137,182 @@ async def get_parsed_data(
         end_date = end_date.replace(day=1)
         filter_group["date"] = {"$gte": start_date, "$lt": end_date}
 
-    data = simple_query(filter_group)
+    engine = engine or ParsedDataEngine(settings.PARSED_DATA_ENGINE)
+    include_details = detail == ParsedDataDetail.full
+    if engine == ParsedDataEngine.summary and not (user_id or date or include_details):
+        summaries = await get_group_summary(group_id)
+        if not summaries:
+            raise HTTPException(status_code=404, detail="Data not found")
+        parsed_data, users_with_debt = parse_summary_data(summaries, group_details)
+        return parsed_data_response(group_details, parsed_data, detail, users_with_debt)
+    if engine != ParsedDataEngine.python and not include_details:
+        # summaries are kept per group, filtered requests are aggregated instead
+        aggregated = await aggregate_parsed_data(filter_group)
+        if not sum(row["rows"] for row in aggregated.get("matched", [])):
+            raise HTTPException(status_code=404, detail="Data not found")
+        parsed_data, users_with_debt = parse_aggregated_data(aggregated, group_details)
+        return parsed_data_response(group_details, parsed_data, detail, users_with_debt)
+
+    projection = PARSE_PROJECTION if include_details else TOTALS_PROJECTION
+    data: list[TransactionData] | list[dict[str, Any]] = (
+        await movement_documents(filter_group, projection)
+        if settings.TRUSTED_READS
+        else await simple_query(filter_group)
+    )
     if not data:
         raise HTTPException(status_code=404, detail="Data not found")
-    parsed_data = parse_data(data, group_details)
-
-    return {
-        "group_details": parse_group_details(group_details, parsed_data),
-        "parsed_data": parsed_data,
-    }
+    if include_details:
+        return parsed_data_response(
+            group_details, parse_data(data, group_details), detail
+        )
+    parsed_data, users_with_debt = parse_totals(data, group_details)
+    return parsed_data_response(group_details, parsed_data, detail, users_with_debt)
 
 
 @router.get("", response_model=list[TransactionData])
 async def get_transaction(
+    response: Response,
     mongo_params: CommonMongoGetQueryParams = Depends(CommonMongoGetQueryParams),
     access_token: HTTPAuthorizationCredentials = Security(security),
     access_token_details: OwnerObject = Depends(validate_access_token),
-) -> list[TransactionData]:
+) -> list[TransactionData] | Response:
     """
     Get items from the database (Mongo).
-    Supports query and projection through CommonMongoGetQueryParams.
+    Supports query and projection through CommonMongoGetQueryParams,
+    with a projection only the projected fields are returned.
+    Full pages carry an X-Next-Cursor header to pass as `cursor`.
     """
-    results = query_actions(mongo_params=mongo_params)
+    results = await query_action_documents(mongo_params=mongo_params)
     if not results:
         raise HTTPException(status_code=404, detail="Actions not found")
-    return results
+    headers = next_cursor_headers(mongo_params)
+    if mongo_params.projection:
+        return projected_response(
+            TransactionData, mongo_params.projection, results, headers
+        )
+    response.headers.update(headers)
+    return read_models(TransactionData, results)
 
 
-@router.post("/create-receipt-batch", response_model=GenResponseCode)
-async def create_receipt_batch(
-    payload: CreateNewBatchTransaction,
+@router.get("/export")
+async def export_transactions(
+    group_id: str,
+    export_format: ExportFormat = Query(ExportFormat.ndjson, alias="format"),
+    mongo_params: CommonMongoGetQueryParams = Depends(CommonMongoGetQueryParams),
     access_token: HTTPAuthorizationCredentials = Security(security),
     access_token_details: OwnerObject = Depends(validate_access_token),
-) -> str:
+) -> StreamingResponse:
     """
-    Get items from database actions
-    Allow: Mongo Query and Projection
+    Export every movement of a group as NDJSON or CSV, streamed as it is
+    read. Uses the filter, projection and sort of CommonMongoGetQueryParams,
+    without limit or skip.
     """
+    validate_scope(group_id, access_token_details)
+    mongo_params.filter = {**(mongo_params.filter or {}), "group": group_id}
+    records = await export_movements(mongo_params, settings.EXPORT_BATCH_SIZE)
+    if export_format == ExportFormat.csv:
+        columns = export_columns(
+            mongo_params.projection, list(TransactionData.model_fields)
+        )
+        return StreamingResponse(
+            csv_chunks(records, columns, settings.EXPORT_BATCH_SIZE),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=movements.csv"},
+        )
+    return StreamingResponse(
+        ndjson_chunks(records, settings.EXPORT_BATCH_SIZE),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": "attachment; filename=movements.ndjson"},
+    )
 
+
+async def create_receipts(
+    payload: CreateNewBatchTransaction, access_token_details: OwnerObject
+) -> ReceiptBatchResult:
+    """
+    Create the VENCIDO receipt of every group member that has not paid the
+    given month yet, reporting which members got one
+    """
     validate_scope(payload.group_id, access_token_details, admin=True)
     filter_group = {"group": payload.group_id}
-    group_details = get_group_definition(filter_group)
+    group_details = await get_group_definition(filter_group)
     if not group_details:
         raise HTTPException(status_code=400, detail="group not found")
 
     date = datetime.strptime(f"{payload.year}-{payload.month}-01", "%Y-%m-%d")
+    members = group_details.group_members
+    paid = await paid_members(payload.group_id, members, date, payload.category)
+    for member in paid:
+        logger.info(f"Receipt already paid for {member}")
+
+    name = f"APORTACION {payload.month} {payload.year}"
+    if payload.category == IncomeCategory.extraordinary:
+        name = name + " EXTRAORDINARIA"
+    created_at = datetime.now()
+    transactions = [
+        TransactionData(
+            transaction_id=9999,
+            user=member,
+            group=payload.group_id,
+            amount=payload.amount,
+            name=name,
+            created_at=created_at,
+            date=date,
+            comments=payload.comments,
+            movement_type=MovementType.income,
+            category="VENCIDO",
+        )
+        for member in members
+        if member not in paid
+    ]
+    write_errors = await add_movements(transactions) if transactions else {}
+    errors = {transactions[index].user: error for index, error in write_errors.items()}
+    if not errors:
+        status = GenResponseCode.created
+    elif len(errors) < len(transactions):
+        status = GenResponseCode.partial_success
+    else:
+        status = GenResponseCode.failed
+    return ReceiptBatchResult(
+        status=status,
+        created=[
+            transaction.user
+            for transaction in transactions
+            if transaction.user not in errors
+        ],
+        already_paid=[member for member in members if member in paid],
+        errors=errors,
+    )
+
+
+@router.post("/create-receipt-batch", response_model=GenResponseCode)
+async def create_receipt_batch(
+    payload: CreateNewBatchTransaction,
+    access_token: HTTPAuthorizationCredentials = Security(security),
+    access_token_details: OwnerObject = Depends(validate_access_token),
+) -> GenResponseCode:
+    """
+    Create the VENCIDO receipt of every group member that has not paid the
+    given month yet. The status is CREATED_WITH_ERRORS when some receipts
+    could not be written, /v2/transactions/create-receipt-batch also lists
+    which members got one.
+    """
+    result = await create_receipts(payload, access_token_details)
+    return result.status
 
-    if len(group_details.group_members) > 0:
-        for member in group_details.group_members:
-            if simple_query(
-                {
-                    "group": payload.group_id,
-                    "user": member,
-                    "date": date,
-                    "movement_type": MovementType.income,
-                    "category": payload.category,
-                }
-            ):
-                logger.info(f"Receipt already paid for {member}")
-                continue
-            name = f"APORTACION {payload.month} {payload.year}"
-            if payload.category == IncomeCategory.extraordinary:
-                name = name + " EXTRAORDINARIA"
-            transaction = TransactionData(
-                transaction_id=9999,
-                user=member,
-                group=payload.group_id,
-                amount=payload.amount,
-                name=name,
-                created_at=datetime.now(),
-                date=date,
-                comments=payload.comments,
-                movement_type=MovementType.income,
-                category="VENCIDO",
-            )
-            add_movement(transaction)
-    return GenResponseCode.created
+
+@router_v2.post("/create-receipt-batch", response_model=ReceiptBatchResult)
+async def create_receipt_batch_v2(
+    payload: CreateNewBatchTransaction,
+    access_token: HTTPAuthorizationCredentials = Security(security),
+    access_token_details: OwnerObject = Depends(validate_access_token),
+) -> ReceiptBatchResult:
+    """
+    Create the VENCIDO receipt of every group member that has not paid the
+    given month yet. Lists the members whose receipt was created, who had
+    already paid and the error of every receipt that could not be written.
+    """
+    return await create_receipts(payload, access_token_details)
 
 
 @router.post("/mark-receipt-as-paid")
@@ -181,10 +339,10 @@ async def mark_receipt_as_paid(
         raise HTTPException(
             status_code=400, detail="Month and year or name are required"
         )
-    event = simple_query(query)
+    event = await simple_query(query)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
-    update_movement(query)
+    await update_movement(query)
     return GenResponseCode.edited
 
 
@@ -204,16 +362,15 @@ async def create_new_transaction(
     }
     if payload.name:
         query["name"] = payload.name
-    if simple_query(query):
+    if await simple_query(query):
         raise HTTPException(status_code=400, detail="Transaction already exists")
     name = payload.name
     if not name:
         name = f"APORTACION {payload.month} {payload.year}"
     transaction = TransactionData(
-        transaction_id=get_last_transaction_id(
-            payload.user_id, payload.group_id, movement_type=payload.movement_type
-        )
-        + 1,
+        transaction_id=await next_transaction_id(
+            payload.user_id, payload.group_id, movement_type=payload.movement_type.value
+        ),
         user=payload.user_id,
         group=payload.group_id,
         amount=payload.amount,
@@ -224,7 +381,7 @@ async def create_new_transaction(
         movement_type=payload.movement_type,
         category=payload.category,
     )
-    add_movement(transaction)
+    await add_movement(transaction)
     return transaction
 
 
@@ -244,7 +401,7 @@ async def update_transaction(
     }
     if name:
         query["name"] = name
-    event = simple_query(query)
+    event = await simple_query(query)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     if len(event) > 1:
@@ -254,7 +411,7 @@ async def update_transaction(
         )
     dumped_payload: dict = payload.model_dump(exclude_unset=True)
     update = {"$set": dumped_payload}
-    update_db(query, update)
+    await update_db(query, update)
     return {"status": GenResponseCode.edited}
 
 
@@ -276,7 +433,7 @@ async def delete_transaction(
     }
     if name:
         query["name"] = name
-    event = simple_query(query)
+    event = await simple_query(query)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     if len(event) > 1:
@@ -285,6 +442,6 @@ async def delete_transaction(
             detail="Multiple events found, use name to get a unique event",
         )
     logger.info("Deleting the transaction")
-    delete_db(query)
+    await delete_db(query)
 
     return {"status": "deleted"}
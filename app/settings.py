@@ -14,6 +14,63 @@ else:
 
 
 SCRIPT_NAME = config("SCRIPT_NAME", default=root_path)
+# Mongo connection pool size, and the server selection, connect and socket
+# timeouts (ms); the socket one stays above QUERY_MAX_TIME_MS so the server's
+# limit answers first. MONGO_MIN_POOL_SIZE connections are opened at startup
+MONGO_MAX_POOL_SIZE = config("MONGO_MAX_POOL_SIZE", cast=int, default=50)
+MONGO_MIN_POOL_SIZE = config("MONGO_MIN_POOL_SIZE", cast=int, default=5)
+MONGO_SERVER_SELECTION_TIMEOUT_MS = config(
+    "MONGO_SERVER_SELECTION_TIMEOUT_MS", cast=int, default=5000
+)
+MONGO_CONNECT_TIMEOUT_MS = config("MONGO_CONNECT_TIMEOUT_MS", cast=int, default=5000)
+MONGO_SOCKET_TIMEOUT_MS = config("MONGO_SOCKET_TIMEOUT_MS", cast=int, default=30000)
+# Default engine for /v1/transactions/parsed-data: python, aggregation or summary
+PARSED_DATA_ENGINE = config("PARSED_DATA_ENGINE", default="python")
+# Parse /parsed-data straight from our own Mongo documents, skipping per-row models
+TRUSTED_READS = config("TRUSTED_READS", cast=bool, default=True)
+# Create the registered indexes / fail on COLLSCAN query shapes at startup
+ENSURE_INDEXES = config("ENSURE_INDEXES", cast=bool, default=False)
+VERIFY_QUERY_PLANS = config("VERIFY_QUERY_PLANS", cast=bool, default=False)
+# Access token resolution cache, TTLs in seconds (and the staleness bound
+# for Owners edited in Mongo without invalidate_token / invalidate_owner)
+TOKEN_CACHE_SIZE = config("TOKEN_CACHE_SIZE", cast=int, default=1024)
+TOKEN_CACHE_TTL = config("TOKEN_CACHE_TTL", cast=float, default=60)
+TOKEN_CACHE_NEGATIVE_TTL = config("TOKEN_CACHE_NEGATIVE_TTL", cast=float, default=10)
+# Read the cumulative balance from GroupMonthlySummary (needs a rebuild first)
+GROUP_SUMMARY_READS = config("GROUP_SUMMARY_READS", cast=bool, default=False)
+# Largest folio range a single /download/receipts request may ask for
+RECEIPTS_MAX_RANGE = config("RECEIPTS_MAX_RANGE", cast=int, default=5000)
+# Movements fetched per cursor round trip while streaming receipts
+RECEIPTS_BATCH_SIZE = config("RECEIPTS_BATCH_SIZE", cast=int, default=500)
+# Movements per cursor batch and per streamed chunk of /v1/transactions/export
+EXPORT_BATCH_SIZE = config("EXPORT_BATCH_SIZE", cast=int, default=1000)
+# Query guard: server-side time limits for listings and exports (ms) and what
+# to do with client filters that need a collection scan: off, reject or throttle
+QUERY_MAX_TIME_MS = config("QUERY_MAX_TIME_MS", cast=int, default=5000)
+EXPORT_MAX_TIME_MS = config("EXPORT_MAX_TIME_MS", cast=int, default=120000)
+QUERY_PLAN_CHECK = config("QUERY_PLAN_CHECK", default="off")
+QUERY_COLLSCAN_LIMIT = config("QUERY_COLLSCAN_LIMIT", cast=int, default=2)
+# Responses smaller than this (bytes) are sent uncompressed, and the
+# gzip level / brotli quality used for the rest
+COMPRESSION_MINIMUM_SIZE = config("COMPRESSION_MINIMUM_SIZE", cast=int, default=1024)
+GZIP_LEVEL = config("GZIP_LEVEL", cast=int, default=6)
+BROTLI_QUALITY = config("BROTLI_QUALITY", cast=int, default=4)
+# Request profiling through the X-Profile header (admin tokens only, off
+# unless enabled): profiles kept, for how long (seconds) and the stack
+# sampling interval (seconds)
+PROFILING = config("PROFILING", cast=bool, default=False)
+PROFILE_STORE_SIZE = config("PROFILE_STORE_SIZE", cast=int, default=20)
+PROFILE_TTL = config("PROFILE_TTL", cast=float, default=3600)
+PROFILE_SAMPLE_INTERVAL = config("PROFILE_SAMPLE_INTERVAL", cast=float, default=0.005)
+# PDF rendering processes (0 renders in the event loop) and how many more
+# downloads may wait for one before answering 429
+PDF_WORKERS = config("PDF_WORKERS", cast=int, default=2)
+PDF_QUEUE_SIZE = config("PDF_QUEUE_SIZE", cast=int, default=8)
+# In-memory cache of generated PDFs, in bytes (0 disables it)
+PDF_CACHE_BYTES = config("PDF_CACHE_BYTES", cast=int, default=64 * 1024 * 1024)
+PDF_CACHE_MAX_ENTRY_BYTES = config(
+    "PDF_CACHE_MAX_ENTRY_BYTES", cast=int, default=8 * 1024 * 1024
+)
 path = pathlib.Path(__file__).parent.absolute()
 
 with open(f"{path}/version.txt") as f:
@@ -0,0 +1,121 @@
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    Bounded in-process LRU cache whose entries expire after a TTL.
+    Entries can carry their own TTL, e.g. shorter ones for negative results.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: K) -> tuple[bool, V | None]:
+        """
+        Returns (found, value) so cached `None` values can be told apart
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        self.misses += 1
+        return False, None
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def items(self) -> list[tuple[K, V]]:
+        return [(key, value) for key, (_, value) in self._entries.items()]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"size": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+class ArtifactCache:
+    """
+    In-process LRU of generated files (e.g. PDFs) bounded by their total
+    size. Keys are content addresses built with `artifact_key`, so entries
+    never need invalidating, outdated ones just age out.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int | None = None):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_bytes if max_entry_bytes is None else max_entry_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        data = self._entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def set(self, key: str, data: bytes) -> None:
+        if len(data) > self.max_entry_bytes or len(data) > self.max_bytes:
+            return
+        self.pop(key)
+        self._entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self.size -= len(data)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def artifact_key(*parts: object) -> str:
+    """
+    Content address of an artifact built from everything its content depends on
+    """
+    return hashlib.sha256("\x1f".join(map(str, parts)).encode()).hexdigest()
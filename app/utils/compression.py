@@ -0,0 +1,90 @@
+"""
+Response compression: Starlette's GZipMiddleware, plus brotli for clients
+that accept it when the optional `brotli` extra is installed.
+
+PDFs are sent as they are on top of Starlette's excluded content types
+(images, archives, event streams), they barely compress.
+"""
+
+from typing import Any
+
+import anyio.to_thread
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import (
+    DEFAULT_EXCLUDED_CONTENT_TYPES,
+    GZipMiddleware,
+    IdentityResponder,
+)
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    import brotli  # type: ignore[import-not-found]
+except ImportError:
+    brotli = None
+
+EXCLUDED_CONTENT_TYPES = (*DEFAULT_EXCLUDED_CONTENT_TYPES, "application/pdf")
+
+
+def accepts_brotli(accept_encoding: str) -> bool:
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        if name.strip() == "br":
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(
+        self, app: ASGIApp, minimum_size: int, quality: int, thread_minimum_size: int
+    ) -> None:
+        super().__init__(
+            app, minimum_size, exclude_content_types=EXCLUDED_CONTENT_TYPES
+        )
+        self.compressor: Any = brotli.Compressor(quality=quality)
+        self.thread_minimum_size = thread_minimum_size
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if len(body) >= self.thread_minimum_size:
+            return await anyio.to_thread.run_sync(self.compress, body, more_body)
+        return self.compress(body, more_body)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        data: bytes = self.compressor.process(body)
+        # a flush per chunk keeps streamed responses arriving as produced
+        tail: bytes = self.compressor.flush() if more_body else self.compressor.finish()
+        return data + tail
+
+
+class CompressionMiddleware(GZipMiddleware):
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ) -> None:
+        super().__init__(
+            app,
+            minimum_size,
+            gzip_level,
+            exclude_content_types=EXCLUDED_CONTENT_TYPES,
+        )
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            brotli is not None
+            and scope["type"] == "http"
+            and accepts_brotli(Headers(scope=scope).get("accept-encoding", ""))
+        ):
+            responder = BrotliResponder(
+                self.app,
+                self.minimum_size,
+                self.brotli_quality,
+                self.thread_minimum_size,
+            )
+            await responder(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
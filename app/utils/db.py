@@ -1,12 +1,201 @@
+"""
+Mongo client of the app.
+
+The app's lifespan opens the client with `connect` and closes it with
+`close`; command-line tasks wrap themselves in `run_connected`. Modules
+import `expenses_db` once at import time, so it is a `BoundDatabase` that
+resolves every collection on the database of the open client. Nothing
+connects, or needs ATLAS_DB_URI / ATLAS_DB, until `connect` runs.
+
+`pool_stats` follows the connection pool through pymongo's CMAP events and
+`ping` measures a server round trip, both reported by /health.
+"""
+
+import asyncio
 import os
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any, TypeVar
+
+from pymongo import AsyncMongoClient, monitoring
+from pymongo.asynchronous.database import AsyncDatabase
+from pymongo.errors import PyMongoError
+
+from app import settings
+from app.utils.logger import logger
+from app.utils.metrics import MongoCommandListener
+
+T = TypeVar("T")
+
+
+class BoundDatabase:
+    """
+    Stands in for the database of the open client, `bind` sets which one
+    """
+
+    def __init__(self) -> None:
+        self.database: Any = None
+
+    def bind(self, database: Any) -> None:
+        self.database = database
+
+    @property
+    def bound(self) -> bool:
+        return self.database is not None
+
+    def __getattr__(self, name: str) -> Any:
+        if self.database is None:
+            raise RuntimeError("Mongo client is not connected")
+        return getattr(self.database, name)
+
+    def __getitem__(self, name: str) -> Any:
+        if self.database is None:
+            raise RuntimeError("Mongo client is not connected")
+        return self.database[name]
+
+
+class PoolStats(monitoring.ConnectionPoolListener):
+    """
+    Connections of every server's pool, from the pool events
+    """
+
+    def __init__(self) -> None:
+        self.open = 0
+        self.checked_out = 0
+        self.created = 0
+        self.closed = 0
+        self.checkout_failures = 0
+        self.clears = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "open": self.open,
+            "checked_out": self.checked_out,
+            "idle": self.open - self.checked_out,
+            "created": self.created,
+            "closed": self.closed,
+            "checkout_failures": self.checkout_failures,
+            "clears": self.clears,
+            "max_size": settings.MONGO_MAX_POOL_SIZE,
+            "min_size": settings.MONGO_MIN_POOL_SIZE,
+        }
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        self.clears += 1
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        self.open += 1
+        self.created += 1
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        self.open -= 1
+        self.closed += 1
+
+    def connection_check_out_started(
+        self, event: monitoring.ConnectionCheckOutStartedEvent
+    ) -> None:
+        pass
+
+    def connection_check_out_failed(
+        self, event: monitoring.ConnectionCheckOutFailedEvent
+    ) -> None:
+        self.checkout_failures += 1
+
+    def connection_checked_out(
+        self, event: monitoring.ConnectionCheckedOutEvent
+    ) -> None:
+        self.checked_out += 1
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        self.checked_out -= 1
+
+
+pool_stats = PoolStats()
+expenses_client: AsyncMongoClient | None = None
+bound_db = BoundDatabase()
+# typed as the database it stands in for
+expenses_db: AsyncDatabase = bound_db  # type: ignore[assignment]
+
+
+async def connect() -> None:
+    """
+    Open the client and warm its pool up. A database bound beforehand (the
+    benchmarks' stand-in) is kept and no client is opened.
+    """
+    global expenses_client
+    if bound_db.bound:
+        return
+    uri, name = os.getenv("ATLAS_DB_URI"), os.getenv("ATLAS_DB")
+    if not uri or not name:
+        raise ValueError("Database configuration is not set properly.")
+    expenses_client = AsyncMongoClient(
+        uri,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.MONGO_CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.MONGO_SOCKET_TIMEOUT_MS,
+        event_listeners=[MongoCommandListener(), pool_stats],
+    )
+    bound_db.bind(expenses_client[name])
+    await warm_up(settings.MONGO_MIN_POOL_SIZE)
+
+
+async def warm_up(connections: int) -> None:
+    """
+    Open `connections` pooled connections with concurrent pings, so the
+    first requests do not pay for the handshakes. The app still starts
+    when the server is unreachable, /health reports it.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(ping() for _ in range(max(connections, 1))))
+    except PyMongoError as error:
+        logger.warning("Mongo warm-up failed: %s", error)
+        return
+    logger.info(
+        "Mongo pool warmed up: %d connections in %.0f ms",
+        pool_stats.open,
+        (time.perf_counter() - start) * 1000,
+    )
+
+
+async def close() -> None:
+    global expenses_client
+    if expenses_client is None:
+        return
+    await expenses_client.close()
+    expenses_client = None
+    bound_db.bind(None)
 
-from pymongo import MongoClient
 
-ATLAS_DB = os.getenv("ATLAS_DB")
-ATLAS_DB_URI = os.getenv("ATLAS_DB_URI")
+async def ping() -> float:
+    """
+    Seconds for a ping round trip, raises PyMongoError when it fails
+    """
+    start = time.perf_counter()
+    await expenses_db.command("ping")
+    return time.perf_counter() - start
 
-if ATLAS_DB_URI is None or ATLAS_DB is None:
-    raise ValueError("Database configuration is not set properly.")
 
-expenses_client: MongoClient = MongoClient(ATLAS_DB_URI)
-expenses_db = expenses_client[ATLAS_DB]
+async def run_connected(task: Callable[..., Awaitable[T]], *args: Any) -> T:
+    """
+    Await `task(*args)` with the client open, for command-line entry points
+    """
+    await connect()
+    try:
+        return await task(*args)
+    finally:
+        await close()
@@ -0,0 +1,77 @@
+"""
+Streaming serializers for exports: records in, text chunks out.
+Only `rows_per_chunk` rows are buffered at a time.
+"""
+
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import date
+from typing import Any
+
+from bson import ObjectId
+
+
+def json_default(value: Any) -> Any:
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def csv_value(value: Any) -> Any:
+    if isinstance(value, dict | list):
+        return json.dumps(value, default=json_default, ensure_ascii=False)
+    if value is None or isinstance(value, str | int | float):
+        return value
+    return json_default(value)
+
+
+async def ndjson_chunks(
+    records: AsyncIterator[dict[str, Any]], rows_per_chunk: int
+) -> AsyncIterator[str]:
+    lines = []
+    async for record in records:
+        lines.append(json.dumps(record, default=json_default, ensure_ascii=False))
+        if len(lines) >= rows_per_chunk:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def csv_chunks(
+    records: AsyncIterator[dict[str, Any]], columns: list[str], rows_per_chunk: int
+) -> AsyncIterator[str]:
+    """
+    CSV with a header row, fields outside `columns` are left out
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    async for record in records:
+        writer.writerow({column: csv_value(record.get(column)) for column in columns})
+        rows += 1
+        if rows >= rows_per_chunk:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def export_columns(
+    projection: dict[str, Any] | None, default_columns: list[str]
+) -> list[str]:
+    """
+    CSV columns for a projection, `_id` is never exported
+    """
+    if not projection:
+        return default_columns
+    included = [key for key, value in projection.items() if value and key != "_id"]
+    if included:
+        return included
+    return [column for column in default_columns if column not in projection]
@@ -1,13 +1,26 @@
+import base64
+import binascii
 import json
+from collections.abc import AsyncIterator
+from functools import cache
 from json import JSONDecodeError
-from typing import Any
+from typing import Any, TypeVar
 
+import bson
 import pymongo
+from bson.errors import BSONError
 from bson.json_util import loads as bson_loads
-from fastapi import HTTPException, Query
-from pymongo.database import Database
+from fastapi import HTTPException, Query, Response
+from pydantic import BaseModel, TypeAdapter, create_model
+from pymongo.asynchronous.database import AsyncDatabase
+
+from app import settings
 
 from .logger import logger
+from .query_guard import admit_query, check_filter, guarded_query, release_query
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 
 class CommonMongoGetQueryParams:
@@ -25,15 +38,29 @@ class CommonMongoGetQueryParams:
             200, gt=0, le=2000, description="Number of items to return"
         ),
         skip: int | None = Query(0, ge=0, description="Number of items to skip"),
-        sort_key: str | None = Query(None, description="Field to sort on"),
+        sort_key: str | None = Query(
+            None, description="Field to sort on, `_id` ascending when not set"
+        ),
         sort_ascending: bool | None = Query(False, description="Sort direction"),
+        cursor: str | None = Query(
+            None,
+            description="X-Next-Cursor header of the previous page, "
+            "pages by sort key instead of skipping, not combinable with skip",
+        ),
     ):
+        if cursor and skip:
+            raise HTTPException(
+                status_code=422, detail="skip cannot be combined with cursor"
+            )
         self.filter = self.validate_filter(filter)
         self.projection = self.validate_projection(projection)
         self.limit = limit
         self.skip = skip
         self.sort_key = sort_key
         self.sort_ascending = sort_ascending
+        self.cursor = cursor
+        # set by get_records when there may be more results
+        self.next_cursor: str | None = None
 
     @staticmethod
     def validate_filter(value: str | None) -> dict[str, Any] | None:
@@ -47,6 +74,7 @@ class CommonMongoGetQueryParams:
                     status_code=422,
                     detail="The provided filter is not valid BSON/JSON format",
                 ) from exc
+            check_filter(query_filter)
 
         return query_filter
 
@@ -100,6 +128,7 @@ class CommonMongoSingleGetQueryParams:
                     status_code=422,
                     detail="The provided filter is not valid BSON/JSON format",
                 ) from exc
+            check_filter(query_filter)
 
         return query_filter
 
@@ -113,8 +142,110 @@ class CommonMongoSingleGetQueryParams:
         return None
 
 
-def get_records(
-    db_instance: Database,
+def next_cursor_headers(mongo_params: CommonMongoGetQueryParams) -> dict[str, str]:
+    if mongo_params.next_cursor:
+        return {NEXT_CURSOR_HEADER: mongo_params.next_cursor}
+    return {}
+
+
+def field_value(document: dict[str, Any], path: str) -> Any:
+    value: Any = document
+    for part in path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def encode_cursor(sort_key: str, ascending: bool, value: Any, last_id: Any) -> str:
+    """
+    Opaque continuation token: the sort and the position of the last record
+    """
+    document = {"k": sort_key, "a": ascending, "v": value, "i": last_id}
+    return base64.urlsafe_b64encode(bson.encode(document)).decode().rstrip("=")
+
+
+def decode_cursor(token: str, sort_key: str, ascending: bool) -> tuple[Any, Any]:
+    try:
+        document = bson.decode(
+            base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        )
+    except (BSONError, binascii.Error, ValueError) as exc:
+        raise HTTPException(status_code=422, detail="Invalid cursor") from exc
+    if document.get("k") != sort_key or document.get("a") != ascending:
+        raise HTTPException(
+            status_code=422, detail="The cursor belongs to a different sort"
+        )
+    return document.get("v"), document.get("i")
+
+
+def keyset_filter(sort_key: str, ascending: bool, value: Any, last_id: Any) -> dict:
+    """
+    Records after (value, last_id) in the (sort_key, _id) order
+    """
+    after = "$gt" if ascending else "$lt"
+    if sort_key == "_id":
+        return {"_id": {after: last_id}}
+    same_value = {sort_key: value, "_id": {after: last_id}}
+    # missing/null sort before every value and range operators never match them
+    if value is None:
+        return (
+            {"$or": [{sort_key: {"$ne": None}}, same_value]}
+            if ascending
+            else same_value
+        )
+    after_value: list[dict[str, Any]] = [{sort_key: {after: value}}, same_value]
+    if not ascending:
+        after_value.append({sort_key: None})
+    return {"$or": after_value}
+
+
+def keyset_projection(
+    projection: dict[str, Any] | None, sort_key: str
+) -> tuple[dict[str, Any] | None, list[str]]:
+    """
+    Make sure the projection returns what the cursor is built from.
+    Returns the projection and the fields to drop from the results.
+    """
+    if not projection:
+        return projection, []
+    projection = dict(projection)
+    added = []
+    inclusive = any(value for key, value in projection.items() if key != "_id")
+    for field in dict.fromkeys([sort_key, "_id"]):
+        if inclusive:
+            included = (
+                projection.get("_id", 1)
+                if field == "_id"
+                else any(
+                    value and (field == key or field.startswith(f"{key}."))
+                    for key, value in projection.items()
+                )
+            )
+            if not included:
+                projection[field] = 1
+                added.append(field)
+        elif field in projection:
+            del projection[field]
+            added.append(field)
+    return projection, added
+
+
+def sort_options(
+    mongo_params: CommonMongoGetQueryParams,
+) -> tuple[str, bool, list[tuple[str, int]]]:
+    """
+    (sort key, ascending, sort) of a listing, `_id` breaks ties
+    """
+    sort_key = mongo_params.sort_key or "_id"
+    ascending = bool(mongo_params.sort_ascending) or not mongo_params.sort_key
+    sort_direction = pymongo.ASCENDING if ascending else pymongo.DESCENDING
+    sort_option = [(sort_key, sort_direction)]
+    if sort_key != "_id":
+        sort_option.append(("_id", sort_direction))
+    return sort_key, ascending, sort_option
+
+
+async def get_records(
+    db_instance: AsyncDatabase,
     collection_name: str,
     mongo_params: CommonMongoGetQueryParams,
     exclude_id: bool = True,
@@ -122,32 +253,86 @@ def get_records(
     """
     Get records from a mongo db using the common collection
     level options and removing the `_id` ObjectId from the
-    records
+    records.
+
+    Records are sorted by `sort_key` and then `_id`. Without a sort_key
+    they are sorted by `_id` ascending, roughly insertion order, where they
+    used to come in natural (unspecified) order. A full page sets
+    `mongo_params.next_cursor`, and passing it back as `cursor` continues
+    right after the last record with an index range instead of skipping;
+    `skip` is rejected together with a cursor.
     """
-    sort_direction = (
-        pymongo.ASCENDING if mongo_params.sort_ascending else pymongo.DESCENDING
-    )
-    sort_option = (
-        [(mongo_params.sort_key, sort_direction)] if mongo_params.sort_key else None
-    )
+    sort_key, ascending, sort_option = sort_options(mongo_params)
+    query_filter = mongo_params.filter or {}
+    if mongo_params.cursor:
+        value, last_id = decode_cursor(mongo_params.cursor, sort_key, ascending)
+        after = keyset_filter(sort_key, ascending, value, last_id)
+        query_filter = {"$and": [query_filter, after]} if query_filter else after
+    projection, added = keyset_projection(mongo_params.projection, sort_key)
+
+    drop = [*added, "_id"] if exclude_id else added
     results = []
-    for entry in db_instance[collection_name].find(
-        filter=mongo_params.filter,
-        projection=mongo_params.projection,
-        limit=mongo_params.limit,
-        skip=mongo_params.skip,
-        sort=sort_option,
-    ):
-        if entry:
-            if exclude_id:
-                del entry["_id"]
-            results.append(entry)
+    last = None
+    collection = db_instance[collection_name]
+    async with guarded_query(collection, query_filter, sort_option):
+        async for entry in collection.find(
+            filter=query_filter,
+            projection=projection,
+            limit=mongo_params.limit,
+            skip=mongo_params.skip,
+            sort=sort_option,
+            max_time_ms=settings.QUERY_MAX_TIME_MS,
+        ):
+            if entry:
+                last = (field_value(entry, sort_key), entry["_id"])
+                for field in drop:
+                    entry.pop(field, None)
+                results.append(entry)
 
+    mongo_params.next_cursor = None
+    if last is not None and len(results) == mongo_params.limit:
+        mongo_params.next_cursor = encode_cursor(sort_key, ascending, *last)
     return results
 
 
-def get_record(
-    db_instance: Database,
+async def iter_records(
+    db_instance: AsyncDatabase,
+    collection_name: str,
+    mongo_params: CommonMongoGetQueryParams,
+    batch_size: int,
+    exclude_id: bool = True,
+) -> AsyncIterator[dict[str, Any]]:
+    """
+    Every record matching the filter, projection and sort of `mongo_params`,
+    streamed from the server cursor `batch_size` documents at a time.
+    limit, skip and cursor are ignored. The query is admitted by the query
+    guard before this returns, so refusals happen before streaming starts.
+    """
+    _, _, sort_option = sort_options(mongo_params)
+    query_filter = mongo_params.filter or {}
+    collection = db_instance[collection_name]
+    collection_scan_slot = await admit_query(collection, query_filter, sort_option)
+
+    async def records() -> AsyncIterator[dict[str, Any]]:
+        try:
+            async for entry in collection.find(
+                filter=query_filter,
+                projection=mongo_params.projection,
+                sort=sort_option,
+                batch_size=batch_size,
+                max_time_ms=settings.EXPORT_MAX_TIME_MS,
+            ):
+                if exclude_id:
+                    entry.pop("_id", None)
+                yield entry
+        finally:
+            release_query(collection_scan_slot)
+
+    return records()
+
+
+async def get_record(
+    db_instance: AsyncDatabase,
     collection_name: str,
     mongo_params: CommonMongoSingleGetQueryParams,
     exclude_id: bool = True,
@@ -157,11 +342,72 @@ def get_record(
     level options and removing the `_id` ObjectId from the
     record
     """
-    result = db_instance[collection_name].find_one(
-        filter=mongo_params.filter,
-        projection=mongo_params.projection,
-    )
+    collection = db_instance[collection_name]
+    async with guarded_query(collection, mongo_params.filter, None):
+        result = await collection.find_one(
+            filter=mongo_params.filter,
+            projection=mongo_params.projection,
+            max_time_ms=settings.QUERY_MAX_TIME_MS,
+        )
     if result and exclude_id:
         del result["_id"]
 
     return result
+
+
+@cache
+def list_adapter(model: type[ModelT]) -> TypeAdapter[list[ModelT]]:
+    """
+    TypeAdapter for a list of `model`, built once per model
+    """
+    return TypeAdapter(list[model])  # type: ignore[valid-type]
+
+
+def read_models(model: type[ModelT], documents: list[dict[str, Any]]) -> list[ModelT]:
+    return list_adapter(model).validate_python(documents)
+
+
+def projected_fields(
+    model: type[BaseModel], projection: dict[str, Any]
+) -> tuple[str, ...]:
+    """
+    Fields of `model` a Mongo projection returns, in model order
+    """
+    included = {key for key, value in projection.items() if value and key != "_id"}
+    return tuple(
+        name
+        for name in model.model_fields
+        if (name in included if included else name not in projection)
+    )
+
+
+@cache
+def partial_model(model: type[BaseModel], fields: tuple[str, ...]) -> type[BaseModel]:
+    """
+    `model` restricted to `fields`, all of them optional. Built once per
+    model and projection.
+    """
+    definitions: dict[str, Any] = {}
+    for name, field in model.model_fields.items():
+        if name in fields:
+            annotation: Any = field.annotation
+            definitions[name] = (annotation | None, None)
+    return create_model(f"Partial{model.__name__}", **definitions)
+
+
+def projected_response(
+    model: type[BaseModel],
+    projection: dict[str, Any],
+    documents: list[dict[str, Any]],
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """
+    JSON response of projected documents: only the projected fields are
+    validated and serialized, fields missing from a document are left out
+    """
+    adapter = list_adapter(partial_model(model, projected_fields(model, projection)))
+    return Response(
+        adapter.dump_json(adapter.validate_python(documents), exclude_unset=True),
+        media_type="application/json",
+        headers=headers,
+    )
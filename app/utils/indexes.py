@@ -0,0 +1,252 @@
+"""
+Index registry.
+
+`INDEXES` declares the indexes every collection needs and `QUERY_SHAPES`
+the queries the routers run. `ensure_indexes` creates the indexes and
+`verify_query_plans` explains every shape and fails if one would scan the
+whole collection. Both run at startup when ENSURE_INDEXES / VERIFY_QUERY_PLANS
+are set, or from the command line:
+
+    uv run python -m app.utils.indexes ensure
+    uv run python -m app.utils.indexes verify
+"""
+
+import argparse
+import asyncio
+from datetime import datetime
+from typing import Any, NamedTuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.asynchronous.database import AsyncDatabase
+
+from app.utils.db import expenses_db, run_connected
+from app.utils.logger import logger
+
+INDEXES: dict[str, list[IndexModel]] = {
+    "Movements": [
+        # receipts by folio, last folio of a group, updates and deletes,
+        # `_id` keeps cursor pages sorted by transaction_id on the index
+        IndexModel(
+            [("group", ASCENDING), ("transaction_id", DESCENDING), ("_id", DESCENDING)],
+            name="group_transaction_id_id",
+        ),
+        # /parsed-data for a month and existence checks per member
+        IndexModel(
+            [("group", ASCENDING), ("user", ASCENDING), ("date", ASCENDING)],
+            name="group_user_date",
+        ),
+        IndexModel([("group", ASCENDING), ("date", ASCENDING)], name="group_date"),
+    ],
+    "Owners": [
+        IndexModel(
+            [("access_token", ASCENDING)],
+            name="access_token",
+            unique=True,
+            partialFilterExpression={"access_token": {"$type": "string"}},
+        ),
+    ],
+    "Groups": [IndexModel([("group", ASCENDING)], name="group", unique=True)],
+    "Incidents": [
+        IndexModel(
+            [("group_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+            name="group_id_created_at_id",
+        ),
+        IndexModel([("incident_id", ASCENDING)], name="incident_id"),
+    ],
+    "GroupMonthlySummary": [
+        IndexModel(
+            [("group", ASCENDING), ("month", ASCENDING)],
+            name="group_month",
+            unique=True,
+        ),
+    ],
+    "Counters": [
+        IndexModel(
+            [("group", ASCENDING), ("movement_type", ASCENDING)],
+            name="group_movement_type",
+            unique=True,
+        ),
+    ],
+    "DataVersions": [IndexModel([("group", ASCENDING)], name="group", unique=True)],
+}
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict[str, Any]
+    sort: dict[str, int] | None = None
+
+
+SAMPLE_DATE = datetime(2024, 1, 1)
+SAMPLE_ID = ObjectId("000000000000000000000000")
+QUERY_SHAPES: list[QueryShape] = [
+    QueryShape("parsed_data_group", "Movements", {"group": "G"}),
+    QueryShape(
+        "parsed_data_month",
+        "Movements",
+        {"group": "G", "date": {"$gte": SAMPLE_DATE, "$lt": datetime(2024, 2, 1)}},
+    ),
+    QueryShape("parsed_data_user", "Movements", {"group": "G", "user": "DEPTO 1"}),
+    QueryShape(
+        "existing_transaction",
+        "Movements",
+        {
+            "group": "G",
+            "user": "DEPTO 1",
+            "date": SAMPLE_DATE,
+            "movement_type": "income",
+            "category": "MONTHLY_INCOME",
+        },
+    ),
+    QueryShape(
+        "paid_members",
+        "Movements",
+        {
+            "group": "G",
+            "user": {"$in": ["DEPTO 1", "DEPTO 2"]},
+            "date": SAMPLE_DATE,
+            "movement_type": "income",
+            "category": "MONTHLY_INCOME",
+        },
+    ),
+    QueryShape(
+        "pending_receipt",
+        "Movements",
+        {
+            "transaction_id": 9999,
+            "group": "G",
+            "user": "DEPTO 1",
+            "movement_type": "income",
+            "category": "VENCIDO",
+        },
+    ),
+    QueryShape("receipt_folio", "Movements", {"transaction_id": 1, "group": "G"}),
+    QueryShape(
+        "receipt_folio_range",
+        "Movements",
+        {"group": "G", "transaction_id": {"$gte": 1, "$lte": 100}},
+        {"transaction_id": 1},
+    ),
+    QueryShape(
+        "last_transaction_id",
+        "Movements",
+        {"transaction_id": {"$lt": 10000, "$nin": [9999]}, "group": "G"},
+        {"transaction_id": -1},
+    ),
+    QueryShape(
+        "transactions_page",
+        "Movements",
+        {
+            "$and": [
+                {"group": "G", "removed": {"$exists": False}},
+                {
+                    "$or": [
+                        {"transaction_id": {"$lt": 50}},
+                        {"transaction_id": 50, "_id": {"$lt": SAMPLE_ID}},
+                    ]
+                },
+            ]
+        },
+        {"transaction_id": -1, "_id": -1},
+    ),
+    QueryShape("owner_by_token", "Owners", {"access_token": "token"}),
+    QueryShape("group_definition", "Groups", {"group": "G"}),
+    QueryShape(
+        "incidents_by_group",
+        "Incidents",
+        {"group_id": "G", "removed": {"$exists": False}},
+    ),
+    QueryShape(
+        "incidents_page",
+        "Incidents",
+        {
+            "$and": [
+                {"group_id": "G", "removed": {"$exists": False}},
+                {
+                    "$or": [
+                        {"created_at": {"$lt": SAMPLE_DATE}},
+                        {"created_at": SAMPLE_DATE, "_id": {"$lt": SAMPLE_ID}},
+                    ]
+                },
+            ]
+        },
+        {"created_at": -1, "_id": -1},
+    ),
+    QueryShape(
+        "incident_by_id",
+        "Incidents",
+        {"incident_id": "id", "group": "G", "removed": {"$exists": False}},
+    ),
+    QueryShape("group_summary", "GroupMonthlySummary", {"group": "G"}),
+    QueryShape(
+        "transaction_counter",
+        "Counters",
+        {"group": "G", "movement_type": "income"},
+    ),
+    QueryShape("data_version", "DataVersions", {"group": "G"}),
+]
+
+
+class CollectionScanError(RuntimeError):
+    pass
+
+
+async def ensure_indexes(db: AsyncDatabase) -> None:
+    """
+    Create every registered index, existing ones are left untouched
+    """
+    for collection, indexes in INDEXES.items():
+        names = await db[collection].create_indexes(indexes)
+        logger.info("Indexes on %s: %s", collection, ", ".join(names))
+
+
+def plan_stages(plan: dict[str, Any]) -> list[str]:
+    """
+    Every stage of an explain plan, children included
+    """
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    for shard in plan.get("shards", []):
+        stages += plan_stages(shard.get("winningPlan", {}))
+    return stages
+
+
+async def explain_shape(db: AsyncDatabase, shape: QueryShape) -> list[str]:
+    command: dict[str, Any] = {"find": shape.collection, "filter": shape.filter}
+    if shape.sort:
+        command["sort"] = shape.sort
+    explanation = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    return plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+
+async def verify_query_plans(db: AsyncDatabase) -> None:
+    """
+    Explain every registered query shape and raise CollectionScanError
+    listing the ones whose winning plan is a COLLSCAN
+    """
+    scans = []
+    for shape in QUERY_SHAPES:
+        stages = await explain_shape(db, shape)
+        logger.info("Plan for %s: %s", shape.name, " <- ".join(stages))
+        if "COLLSCAN" in stages:
+            scans.append(shape.name)
+    if scans:
+        raise CollectionScanError(
+            f"Query shapes without a usable index: {', '.join(scans)}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=["ensure", "verify"])
+    args = parser.parse_args()
+    if args.command == "ensure":
+        asyncio.run(run_connected(ensure_indexes, expenses_db))
+    else:
+        asyncio.run(run_connected(verify_query_plans, expenses_db))
@@ -0,0 +1,320 @@
+"""
+Prometheus metrics, rendered in the text exposition format on /metrics.
+
+- `MetricsMiddleware` times every request and counts its status by route
+  template (`/v1/transactions/{group_id}/...`, never the raw path).
+- `MongoCommandListener` attributes every Mongo command to the request
+  that issued it through a context variable: command count, server time
+  and documents returned, per request and per command.
+- `register_stats` exposes the `stats()` of the in-process caches and
+  pools as gauges.
+"""
+
+import bisect
+import time
+from collections.abc import Callable, Iterable, Mapping
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, TypeVar
+
+from pymongo import monitoring
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COMMAND_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+DOCUMENT_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+# label used for commands issued outside of a request (startup, background)
+NO_ROUTE = "none"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{escape(value)}"' for name, value in zip(names, values, strict=True)
+    )
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labels, labels)} {format_value(value)}"
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # per label values: observations per bucket (the last one is +Inf), sum
+        self.values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        counts, total = self.values.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        names = (*self.labels, "le")
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), counts, strict=True):
+                cumulative += count
+                bucket_labels = format_labels(names, (*labels, format_value(bound)))
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            label_text = format_labels(self.labels, labels)
+            yield f"{self.name}_sum{label_text} {format_value(total[0])}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+metrics: list[Counter | Histogram] = []
+stats_sources: dict[str, Callable[[], dict[str, int]]] = {}
+
+
+M = TypeVar("M", Counter, Histogram)
+
+
+def register(metric: M) -> M:
+    metrics.append(metric)
+    return metric
+
+
+def register_stats(prefix: str, source: Callable[[], dict[str, int]]) -> None:
+    """
+    Expose every key of `source()` as a `<prefix>_<key>` gauge
+    """
+    stats_sources[prefix] = source
+
+
+def render() -> str:
+    lines: list[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for prefix, source in stats_sources.items():
+        for key, value in source().items():
+            name = f"{prefix}_{key}"
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+request_count = register(
+    Counter(
+        "http_requests_total",
+        "Requests by method, route and status code",
+        ("method", "route", "status"),
+    )
+)
+request_latency = register(
+    Histogram(
+        "http_request_duration_seconds",
+        "Request latency by method and route, until the last body chunk is sent",
+        ("method", "route"),
+    )
+)
+request_mongo_commands = register(
+    Histogram(
+        "http_request_mongo_commands",
+        "Mongo commands issued per request",
+        ("route",),
+        COMMAND_BUCKETS,
+    )
+)
+request_mongo_seconds = register(
+    Histogram(
+        "http_request_mongo_seconds",
+        "Time spent in Mongo commands per request",
+        ("route",),
+    )
+)
+request_mongo_documents = register(
+    Histogram(
+        "http_request_mongo_documents",
+        "Documents returned by Mongo per request",
+        ("route",),
+        DOCUMENT_BUCKETS,
+    )
+)
+mongo_commands = register(
+    Counter(
+        "mongo_commands_total",
+        "Mongo commands by route, command name and outcome",
+        ("route", "command", "outcome"),
+    )
+)
+mongo_seconds = register(
+    Counter(
+        "mongo_command_seconds_total",
+        "Time spent in Mongo commands by route and command name",
+        ("route", "command"),
+    )
+)
+mongo_documents = register(
+    Counter(
+        "mongo_documents_returned_total",
+        "Documents returned by Mongo by route and command name",
+        ("route", "command"),
+    )
+)
+
+
+@dataclass
+class RequestCost:
+    """
+    Mongo cost of the current request, filled by `MongoCommandListener`
+    """
+
+    scope: Scope
+    commands: int = 0
+    seconds: float = 0.0
+    documents: int = 0
+    by_command: dict[str, int] = field(default_factory=dict)
+
+    label: str | None = None
+
+    @property
+    def route(self) -> str:
+        # the router fills in the route before dependencies and endpoint run
+        if self.label is None:
+            if "route" not in self.scope:
+                return route_label(self.scope)
+            self.label = route_label(self.scope)
+        return self.label
+
+
+request_cost: ContextVar[RequestCost | None] = ContextVar("request_cost", default=None)
+
+
+def returned_documents(reply: Mapping[str, Any]) -> int:
+    cursor = reply.get("cursor")
+    if isinstance(cursor, Mapping):
+        batch: list[Any] = cursor.get("firstBatch", cursor.get("nextBatch", []))
+        return len(batch)
+    if reply.get("value") is not None:
+        return 1
+    return 0
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def record(
+        self,
+        command: str,
+        duration_micros: int,
+        outcome: str,
+        documents: int = 0,
+    ) -> None:
+        cost = request_cost.get()
+        route = cost.route if cost is not None else NO_ROUTE
+        seconds = duration_micros / 1e6
+        mongo_commands.inc(route, command, outcome)
+        mongo_seconds.inc(route, command, amount=seconds)
+        mongo_documents.inc(route, command, amount=documents)
+        if cost is not None:
+            cost.commands += 1
+            cost.seconds += seconds
+            cost.documents += documents
+            cost.by_command[command] = cost.by_command.get(command, 0) + 1
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.record(
+            event.command_name,
+            event.duration_micros,
+            "success",
+            returned_documents(event.reply),
+        )
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.record(event.command_name, event.duration_micros, "failure")
+
+
+def route_label(scope: Scope) -> str:
+    """
+    Path template of the matched route, so path parameters do not create
+    a series each. Routers may keep their routes without the include
+    prefix, so the prefix is taken from the request path. Unmatched paths
+    share one label.
+    """
+    template = getattr(scope.get("route"), "path_format", None)
+    if not isinstance(template, str):
+        return "unmatched"
+    try:
+        rendered = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path: str = scope.get("path", "")
+    root_path: str = scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    if not path.endswith(rendered):
+        return template
+    return path[: len(path) - len(rendered)] + template
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cost = RequestCost(scope)
+        token = request_cost.set(cost)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_cost.reset(token)
+            elapsed = time.perf_counter() - start
+            route = cost.route
+            method = scope["method"]
+            request_count.inc(method, route, str(status))
+            request_latency.observe(elapsed, method, route)
+            request_mongo_commands.observe(cost.commands, route)
+            request_mongo_seconds.observe(cost.seconds, route)
+            request_mongo_documents.observe(cost.documents, route)
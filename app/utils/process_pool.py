@@ -0,0 +1,111 @@
+"""
+Bounded process pool for CPU-bound work called from async handlers.
+
+At most `workers` tasks run at once and `queue_size` more may wait; past
+that `acquire` raises PoolSaturatedError so the caller can answer 429 instead
+of piling up requests. The slot it returns must be released on every path.
+With no workers (or before `start`) tasks run inline.
+"""
+
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, TypeVar
+
+from app.utils.logger import logger
+
+T = TypeVar("T")
+
+
+class PoolSaturatedError(RuntimeError):
+    pass
+
+
+class PoolSlot:
+    """
+    A request's place in the pool. `release` is idempotent, so every path
+    that can end the request may call it; also a context manager.
+    """
+
+    def __init__(self, pool: "ProcessPool"):
+        self.pool = pool
+        self.released = False
+
+    def release(self) -> None:
+        if not self.released:
+            self.released = True
+            self.pool.in_flight -= 1
+
+    def __enter__(self) -> "PoolSlot":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.release()
+
+
+def _ready() -> None:
+    return None
+
+
+class ProcessPool:
+    def __init__(self, name: str):
+        self.name = name
+        self.executor: ProcessPoolExecutor | None = None
+        self.limit = 0
+        self.in_flight = 0
+        self.rejected = 0
+
+    def start(
+        self,
+        workers: int,
+        queue_size: int,
+        initializer: Callable[[], None] | None = None,
+    ) -> None:
+        """
+        Spawn the workers and wait until every one of them ran `initializer`
+        """
+        self.limit = workers + queue_size
+        if workers <= 0:
+            return
+        # spawn, forking a process with a running loop and Mongo threads is unsafe
+        self.executor = ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=initializer,
+        )
+        for future in [self.executor.submit(_ready) for _ in range(workers)]:
+            future.result()
+        logger.info("Started %s pool with %d workers", self.name, workers)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def acquire(self) -> PoolSlot:
+        """
+        Take a slot for one request, raising PoolSaturatedError when every
+        worker is busy and the queue is full. Release the returned slot.
+        """
+        if self.executor is not None and self.in_flight >= self.limit:
+            self.rejected += 1
+            raise PoolSaturatedError(f"{self.name} pool is saturated")
+        self.in_flight += 1
+        return PoolSlot(self)
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run `func(*args)` in a worker, `func` and its arguments must be picklable
+        """
+        if self.executor is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,247 @@
+"""
+On-demand profiling of single requests, installed only with PROFILING=true.
+
+A request sent with an admin token and `X-Profile: cpu,sample,memory` (any
+subset) is run under the requested profilers and answered with an
+`X-Profile-Id` header. The profile is kept in memory and served by the
+/v1/profiles routes:
+
+- `cpu`: cProfile, as a call tree (text) or a pstats dump for snakeviz etc.
+- `sample`: the event loop thread's stack every PROFILE_SAMPLE_INTERVAL
+  seconds, as collapsed stacks for flamegraph.pl / speedscope.
+- `memory`: tracemalloc, the largest allocations still alive at the end.
+
+Profilers see the whole process, so requests running concurrently show up
+too, and one profile runs at a time. PDF pages laid out in the PDF pool
+run in other processes and only show up as the wait for them.
+"""
+
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import FrameType
+from uuid import uuid4
+
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import settings
+from app.utils.cache import TTLCache
+from app.utils.logger import logger
+from app.utils.token import OwnerObject, TokenType, validate_access_token
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+MODES = ("cpu", "sample", "memory")
+# allocation sites listed in a memory profile
+MEMORY_TOP = 50
+
+
+@dataclass
+class Profile:
+    profile_id: str
+    token_owner: str
+    method: str
+    path: str
+    modes: list[str]
+    created_at: datetime = field(default_factory=datetime.now)
+    seconds: float = 0.0
+    status: int = 500
+    # pstats dump and its call tree
+    cpu: bytes | None = None
+    call_tree: str | None = None
+    stacks: Counter[str] | None = None
+    memory: list[str] | None = None
+
+
+profiles: TTLCache[str, Profile] = TTLCache(
+    maxsize=settings.PROFILE_STORE_SIZE, ttl=settings.PROFILE_TTL
+)
+# a profiler at a time, cProfile and tracemalloc are process wide
+active = threading.Lock()
+
+
+def requested_modes(value: str) -> list[str]:
+    modes = [mode.strip().lower() for mode in value.split(",")]
+    if "all" in modes:
+        return list(MODES)
+    return [mode for mode in MODES if mode in modes]
+
+
+async def profiling_owner(headers: Headers) -> OwnerObject | None:
+    """
+    The admin owner of the request's bearer token, None for anyone else
+    """
+    scheme, _, credentials = headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not credentials:
+        return None
+    try:
+        owner = await validate_access_token(
+            HTTPAuthorizationCredentials(scheme=scheme, credentials=credentials)
+        )
+    except HTTPException:
+        return None
+    return owner if owner.token_type == TokenType.admin else None
+
+
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class StackSampler(threading.Thread):
+    """
+    Counts the collapsed stacks of `thread_id`, sampled every `interval`
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(frame_label(frame).replace(";", ","))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+    def stop(self) -> Counter[str]:
+        self.stopped.set()
+        self.join()
+        return self.stacks
+
+
+def memory_report(snapshot: tracemalloc.Snapshot) -> list[str]:
+    """
+    Traced and peak memory, then the largest allocation sites still alive
+    """
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = snapshot.filter_traces(
+        [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+    )
+    return [
+        f"traced={current / 1024:.1f} KiB peak={peak / 1024:.1f} KiB",
+        *(str(stat) for stat in snapshot.statistics("lineno")[:MEMORY_TOP]),
+    ]
+
+
+class ProfilingMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        modes = requested_modes(headers.get(PROFILE_HEADER, ""))
+        owner = await profiling_owner(headers) if modes else None
+        if owner is None:
+            await self.app(scope, receive, send)
+            return
+        if not active.acquire(blocking=False):
+            logger.warning("Profile skipped, another one is running")
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.profile(scope, receive, send, owner, modes)
+        finally:
+            active.release()
+
+    async def profile(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        owner: OwnerObject,
+        modes: list[str],
+    ) -> None:
+        profile = Profile(
+            profile_id=uuid4().hex,
+            token_owner=owner.token_owner,
+            method=scope["method"],
+            path=scope["path"],
+            modes=modes,
+        )
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile.profile_id
+            await send(message)
+
+        profiler = cProfile.Profile() if "cpu" in modes else None
+        sampler = (
+            StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+            if "sample" in modes
+            else None
+        )
+        memory = "memory" in modes
+        start_tracing = memory and not tracemalloc.is_tracing()
+        if start_tracing:
+            tracemalloc.start()
+        if sampler is not None:
+            sampler.start()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            profile.seconds = time.perf_counter() - start
+            if sampler is not None:
+                profile.stacks = sampler.stop()
+            if memory:
+                profile.memory = memory_report(tracemalloc.take_snapshot())
+            if start_tracing:
+                tracemalloc.stop()
+            if profiler is not None:
+                profiler.create_stats()
+                profile.cpu = marshal.dumps(profiler.stats)  # type: ignore[attr-defined]
+                profile.call_tree = call_tree(profiler)
+            profiles.set(profile.profile_id, profile)
+            logger.info(
+                "Profile %s of %s %s stored (%s)",
+                profile.profile_id,
+                profile.method,
+                profile.path,
+                ",".join(modes),
+            )
+
+
+def call_tree(profiler: cProfile.Profile, limit: int = 60) -> str:
+    """
+    cProfile stats by cumulative time, with the callees of each function
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.strip_dirs().sort_stats(pstats.SortKey.CUMULATIVE)
+    stats.print_stats(limit)
+    stats.print_callees(limit)
+    return stream.getvalue()
+
+
+def collapsed_stacks(profile: Profile) -> str:
+    assert profile.stacks is not None
+    return "".join(f"{stack} {count}\n" for stack, count in profile.stacks.items())
@@ -0,0 +1,185 @@
+"""
+Cost guard for the Mongo filters clients send to the listing endpoints.
+
+- `check_filter` only lets through an allowlist of query operators, and
+  regexes only when anchored and case sensitive (so they can use an index).
+- Every listing cursor carries a maxTimeMS, a timeout answers 503.
+- With QUERY_PLAN_CHECK set to "reject" or "throttle", the plan of each
+  query shape is explained once and a COLLSCAN is refused with 422, or
+  limited to QUERY_COLLSCAN_LIMIT concurrent queries (503 past that).
+
+`blocked` counts every refused query by reason.
+"""
+
+import json
+import re
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from typing import Any
+
+from bson.regex import Regex
+from fastapi import HTTPException
+from pymongo.asynchronous.collection import AsyncCollection
+from pymongo.errors import ExecutionTimeout
+
+from app import settings
+from app.utils.cache import TTLCache
+from app.utils.indexes import QueryShape, explain_shape
+from app.utils.logger import logger
+
+ALLOWED_OPERATORS = frozenset(
+    {
+        "$eq",
+        "$ne",
+        "$gt",
+        "$gte",
+        "$lt",
+        "$lte",
+        "$in",
+        "$nin",
+        "$exists",
+        "$type",
+        "$and",
+        "$or",
+        "$nor",
+        "$not",
+        "$elemMatch",
+        "$size",
+        "$all",
+    }
+)
+
+blocked: Counter[str] = Counter()
+collection_scans_in_flight = 0
+# query shape -> whether its winning plan is a collection scan
+plan_cache: TTLCache[str, bool] = TTLCache(maxsize=512, ttl=300)
+
+
+def block(reason: str, status_code: int, detail: str) -> HTTPException:
+    blocked[reason] += 1
+    logger.warning("Query blocked (%s): %s", reason, detail)
+    return HTTPException(status_code=status_code, detail=detail)
+
+
+def check_regex(pattern: str, flags: int | str) -> None:
+    case_insensitive = (
+        "i" in flags if isinstance(flags, str) else bool(flags & re.IGNORECASE)
+    )
+    if not pattern.startswith("^") or case_insensitive:
+        raise block(
+            "operator",
+            422,
+            "Only anchored (^...) case sensitive regular expressions are allowed",
+        )
+
+
+def check_filter(value: Any) -> None:
+    """
+    Raise 422 when the filter uses an operator outside ALLOWED_OPERATORS
+    or a regex that cannot use an index
+    """
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if key.startswith("$") and key not in ALLOWED_OPERATORS:
+                raise block(
+                    "operator", 422, f"The {key} operator is not allowed in filters"
+                )
+            check_filter(item)
+    elif isinstance(value, list):
+        for item in value:
+            check_filter(item)
+    elif isinstance(value, Regex):
+        check_regex(value.pattern, value.flags)
+    elif isinstance(value, re.Pattern):
+        check_regex(value.pattern, value.flags)
+
+
+def query_shape(value: Any) -> Any:
+    """
+    The filter with every value replaced by its type, plans depend on that
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [query_shape(item) for item in value]
+    return type(value).__name__
+
+
+async def is_collection_scan(
+    collection: AsyncCollection,
+    query_filter: dict[str, Any],
+    sort: list[tuple[str, int]] | None,
+) -> bool:
+    key = json.dumps([collection.name, query_shape(query_filter), sort], sort_keys=True)
+    found, collection_scan = plan_cache.get(key)
+    if found and collection_scan is not None:
+        return collection_scan
+    shape = QueryShape(
+        "request", collection.name, query_filter, dict(sort) if sort else None
+    )
+    collection_scan = "COLLSCAN" in await explain_shape(collection.database, shape)
+    plan_cache.set(key, collection_scan)
+    return collection_scan
+
+
+async def admit_query(
+    collection: AsyncCollection,
+    query_filter: dict[str, Any],
+    sort: list[tuple[str, int]] | None,
+) -> bool:
+    """
+    Apply QUERY_PLAN_CHECK to the query. Returns whether a collection scan
+    slot was taken, hand it to `release_query` once the query is done.
+    """
+    global collection_scans_in_flight
+    mode = settings.QUERY_PLAN_CHECK
+    if mode == "off" or not await is_collection_scan(collection, query_filter, sort):
+        return False
+    if mode == "reject":
+        raise block(
+            "collection_scan",
+            422,
+            "This filter cannot use an index, include an indexed field such as group",
+        )
+    if collection_scans_in_flight >= settings.QUERY_COLLSCAN_LIMIT:
+        raise block(
+            "throttled",
+            503,
+            "Too many unindexed queries running, try again shortly",
+        )
+    collection_scans_in_flight += 1
+    return True
+
+
+def release_query(collection_scan_slot: bool) -> None:
+    global collection_scans_in_flight
+    if collection_scan_slot:
+        collection_scans_in_flight -= 1
+
+
+@asynccontextmanager
+async def guarded_query(
+    collection: AsyncCollection,
+    query_filter: dict[str, Any],
+    sort: list[tuple[str, int]] | None,
+) -> AsyncIterator[None]:
+    """
+    Admit the query and turn a maxTimeMS timeout into a 503
+    """
+    collection_scan_slot = await admit_query(collection, query_filter, sort)
+    try:
+        yield
+    except ExecutionTimeout as exc:
+        raise block(
+            "timeout", 503, "The query took too long, narrow the filter"
+        ) from exc
+    finally:
+        release_query(collection_scan_slot)
+
+
+def stats() -> dict[str, int]:
+    return {
+        **blocked,
+        "collection_scans_in_flight": collection_scans_in_flight,
+    }
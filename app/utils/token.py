@@ -5,6 +5,8 @@ from fastapi import HTTPException, Security, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import BaseModel
 
+from app import settings
+from app.utils.cache import TTLCache
 from app.utils.db import expenses_db
 from app.utils.logger import logger
 
@@ -24,13 +26,18 @@ class OwnerObject(BaseModel):
     token_type: TokenType
 
 
-def validate_access_token(
+token_cache: TTLCache[str, OwnerObject | None] = TTLCache(
+    maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL
+)
+
+
+async def validate_access_token(
     access_token: HTTPAuthorizationCredentials = Security(security),
 ) -> OwnerObject:
     """
     Validate Access Token
     """
-    token_details = find_user_from_token(access_token.credentials)
+    token_details = await find_user_from_token(access_token.credentials)
     if not token_details:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -40,11 +47,37 @@ def validate_access_token(
     return token_details
 
 
-def find_user_from_token(token: str) -> OwnerObject | None:
+async def find_user_from_token(token: str) -> OwnerObject | None:
     """
-    Find user from token
+    Find user from token, served from `token_cache` while the entry is fresh.
+    Unknown tokens are cached too, with a shorter TTL. Writers of Owners
+    call `invalidate_token` / `invalidate_owner`; the cache is per process,
+    so other workers only see the change once their entry expires.
     """
-    user = expenses_db.Owners.find_one({"access_token": token})
+    found, owner = token_cache.get(token)
+    if found:
+        return owner
+    user = await expenses_db.Owners.find_one({"access_token": token})
     if user is None:
+        token_cache.set(token, None, ttl=settings.TOKEN_CACHE_NEGATIVE_TTL)
         return None
-    return OwnerObject(**user)
+    owner = OwnerObject(**user)
+    token_cache.set(token, owner)
+    return owner
+
+
+def invalidate_token(token: str) -> None:
+    """
+    Drop a token from the cache, e.g. after creating or revoking it
+    """
+    token_cache.pop(token)
+
+
+def invalidate_owner(token_owner: str) -> None:
+    """
+    Drop every cached token of an Owner. Call it whenever an Owner's
+    scope or token_type changes so the next request reads it again.
+    """
+    for token, owner in token_cache.items():
+        if owner is not None and owner.token_owner == token_owner:
+            token_cache.pop(token)
@@ -0,0 +1,16 @@
+"""
+Run every benchmark: `uv run python -m benchmarks`
+"""
+
+from benchmarks import db_concurrency, parse_data, responses, suite, trusted_reads
+
+BENCHMARKS = [
+    parse_data.main,
+    trusted_reads.main,
+    responses.main,
+    suite.main,
+    db_concurrency.main,
+]
+
+for benchmark in BENCHMARKS:
+    benchmark()
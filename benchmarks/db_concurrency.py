@@ -0,0 +1,80 @@
+"""
+Throughput of concurrent Mongo reads, blocking client vs async client.
+
+Needs a reachable MongoDB through ATLAS_DB_URI / ATLAS_DB (a local mongod
+with some Movements is enough). Each of REQUESTS coroutines reads one page
+of Movements with CONCURRENCY of them in flight. The blocking run calls a
+`MongoClient` inside the coroutines, the way routes used to reach Mongo, so
+the event loop serialises them; the async run uses `AsyncMongoClient`.
+
+Run with `uv run python -m benchmarks.db_concurrency`.
+"""
+
+import asyncio
+import json
+import os
+import time
+
+from pymongo import AsyncMongoClient, MongoClient
+
+REQUESTS = 400
+CONCURRENCY = [1, 10, 50]
+PAGE_SIZE = 200
+
+
+async def run_blocking(uri: str, db_name: str, concurrency: int) -> float:
+    client: MongoClient = MongoClient(uri)
+    collection = client[db_name].Movements
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def read() -> None:
+        async with semaphore:
+            list(collection.find({}, {"_id": 0}, limit=PAGE_SIZE))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(read() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    return elapsed
+
+
+async def run_async(uri: str, db_name: str, concurrency: int) -> float:
+    client: AsyncMongoClient = AsyncMongoClient(uri)
+    collection = client[db_name].Movements
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def read() -> None:
+        async with semaphore:
+            await collection.find({}, {"_id": 0}, limit=PAGE_SIZE).to_list()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(read() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - start
+    await client.close()
+    return elapsed
+
+
+def main() -> None:
+    uri, db_name = os.getenv("ATLAS_DB_URI"), os.getenv("ATLAS_DB")
+    if not uri or not db_name:
+        print(json.dumps({"benchmark": "db_concurrency", "skipped": "no database"}))
+        return
+    for concurrency in CONCURRENCY:
+        for client, runner in (("blocking", run_blocking), ("async", run_async)):
+            elapsed = asyncio.run(runner(uri, db_name, concurrency))
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "db_concurrency",
+                        "client": client,
+                        "concurrency": concurrency,
+                        "requests": REQUESTS,
+                        "seconds": round(elapsed, 4),
+                        "requests_per_second": round(REQUESTS / elapsed, 1),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Synthetic groups shaped like production data.
+
+Every month each member gets an "APORTACION <month> <year>" receipt. Paid
+receipts are MONTHLY_INCOME with their own folio and the payment date as
+created_at; unpaid ones stay VENCIDO with the 9999 placeholder folio, the
+way create-receipt-batch leaves them. On top of that each month carries
+expenses across EXPENSE_CATEGORIES and, now and then, an extraordinary
+income. The same seed always gives the same group.
+
+`generate_incidents` adds the group's Incidents documents the same way.
+"""
+
+import random
+from datetime import datetime, timedelta
+from typing import Any
+
+from dateutil.relativedelta import relativedelta
+
+EXPENSE_CATEGORIES = ["LUZ", "AGUA", "MANTENIMIENTO", "LIMPIEZA", "JARDINERIA"]
+INCIDENT_TYPES = ["water_leak", "electrical_failure", "noise_complaint", "other"]
+INCIDENT_STATUSES = ["reported", "in_review", "in_progress", "resolved", "closed"]
+UNPAID_FOLIO = 9999
+
+
+def generate_group(
+    members: int,
+    years: int,
+    group: str = "BENCH",
+    paid_ratio: float = 0.85,
+    expenses_per_month: int = 6,
+    seed: int = 0,
+) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+    """
+    The Groups document and the Movements documents of a group with
+    `members` members created `years` years ago
+    """
+    rng = random.Random(f"{group}-{members}-{years}-{seed}")
+    created_at = datetime.now().replace(
+        day=1, hour=0, minute=0, second=0, microsecond=0
+    ) - relativedelta(years=years)
+    member_names = [f"DEPTO {number}" for number in range(1, members + 1)]
+    group_document = {
+        "group": group,
+        "created_at": created_at,
+        "size": members,
+        "group_members": member_names,
+    }
+
+    movements: list[dict[str, Any]] = []
+    folio = 0
+
+    def add(**movement: Any) -> None:
+        movements.append({"group": group, "comments": None, **movement})
+
+    for offset in range(years * 12):
+        month = created_at + relativedelta(months=offset)
+        for member in member_names:
+            name = f"APORTACION {month.month:02d} {month.year}"
+            if rng.random() < paid_ratio:
+                folio += 1
+                add(
+                    transaction_id=folio,
+                    user=member,
+                    name=name,
+                    amount=1200.0,
+                    movement_type="income",
+                    category="MONTHLY_INCOME",
+                    created_at=month + timedelta(days=rng.randrange(28)),
+                    date=month,
+                )
+            else:
+                add(
+                    transaction_id=UNPAID_FOLIO,
+                    user=member,
+                    name=name,
+                    amount=1200.0,
+                    movement_type="income",
+                    category="VENCIDO",
+                    created_at=month,
+                    date=month,
+                )
+        for _ in range(expenses_per_month):
+            folio += 1
+            day = month + timedelta(days=rng.randrange(28))
+            category = rng.choice(EXPENSE_CATEGORIES)
+            add(
+                transaction_id=folio,
+                user="ADMIN",
+                name=f"PAGO {category} {month.month:02d} {month.year}",
+                amount=round(rng.uniform(150, 9000), 2),
+                movement_type="expense",
+                category=category,
+                created_at=day,
+                date=day,
+            )
+        if rng.random() < 0.1:
+            folio += 1
+            add(
+                transaction_id=folio,
+                user=rng.choice(member_names),
+                name=f"APORTACION {month.month:02d} {month.year} EXTRAORDINARIA",
+                amount=500.0,
+                movement_type="income",
+                category="EXTRAORDINARY_INCOME",
+                created_at=month + timedelta(days=rng.randrange(28)),
+                date=month,
+            )
+    return group_document, movements
+
+
+def generate_incidents(
+    group_document: dict[str, Any], count: int, seed: int = 0
+) -> list[dict[str, Any]]:
+    """
+    `count` Incidents documents submitted by the members of `group_document`
+    since the group was created
+    """
+    group = group_document["group"]
+    rng = random.Random(f"{group}-incidents-{count}-{seed}")
+    span = (datetime.now() - group_document["created_at"]).total_seconds()
+    incidents = []
+    for number in range(count):
+        status = rng.choice(INCIDENT_STATUSES)
+        incidents.append(
+            {
+                "incident_id": f"{group}-{number:06d}",
+                "incident_type": rng.choice(INCIDENT_TYPES),
+                "incident_status": status,
+                "message": f"Incidente {number}",
+                "created_at": group_document["created_at"]
+                + timedelta(seconds=rng.uniform(0, span)),
+                "submitter": rng.choice(group_document["group_members"]),
+                "solved_by": "ADMIN" if status in ("resolved", "closed") else "",
+                "group_id": group,
+            }
+        )
+    return incidents
@@ -0,0 +1,302 @@
+"""
+Load test of app.main:app: throughput and latency percentiles per endpoint.
+
+By default the app runs in-process behind httpx's ASGI transport, with its
+lifespan (PDF pool included) and the Mongo reads served by the stand-in
+(`benchmarks.mongo`), seeded with a synthetic group (`benchmarks.generator`),
+its incidents and an admin token in Owners. `--uvicorn` serves the same app
+from a uvicorn server in a thread, so HTTP parsing and sockets are counted
+too. `--url` targets a server that is already running, with `--token` and
+`--group` for data it already has.
+
+Every endpoint is loaded on its own, after a warm-up, with `--concurrency`
+requests in flight until `--requests` are done. One JSON line per endpoint:
+requests per second, p50/p95/p99 latency and error rate (any status other
+than 200). Stand-in reads are mongomock's and block the event loop, so
+in-process numbers are an upper bound on the Python work per request, not
+a Mongo sizing. Downloads are served from the PDF cache after the first
+one; set PDF_CACHE_BYTES=0 to render every time.
+
+    uv run python -m benchmarks.load --concurrency 20 --requests 500
+    uv run python -m benchmarks.load --uvicorn --endpoints transactions
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+from collections import Counter
+from collections.abc import AsyncIterator
+from contextlib import AbstractAsyncContextManager, asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+
+import httpx
+import uvicorn
+from dateutil.relativedelta import relativedelta
+
+from app.main import app
+from app.utils.logger import logger
+from benchmarks.generator import generate_group, generate_incidents
+from benchmarks.mongo import StandInDatabase, install
+
+TOKEN = "load-test-token"
+PAGE_SIZE = 200
+RECEIPT_FOLIOS = 100
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    path: str
+    params: dict[str, Any] = field(default_factory=dict)
+    body: dict[str, Any] | None = None
+
+
+def endpoints(group: str) -> list[Endpoint]:
+    last_month = datetime.now().replace(day=1) - relativedelta(months=1)
+    return [
+        Endpoint(
+            "transactions",
+            "GET",
+            "/v1/transactions",
+            {"filter": json.dumps({"group": group}), "limit": PAGE_SIZE},
+        ),
+        Endpoint(
+            "parsed-data", "GET", "/v1/transactions/parsed-data", {"group_id": group}
+        ),
+        Endpoint(
+            "incidents",
+            "GET",
+            "/v1/incidents",
+            {"group_id": group, "limit": PAGE_SIZE},
+        ),
+        Endpoint(
+            "download-receipts",
+            "POST",
+            "/v1/report/download/receipts",
+            body={"start_at": 1, "end_at": RECEIPT_FOLIOS, "group": group},
+        ),
+        Endpoint(
+            "download-balance",
+            "POST",
+            "/v1/report/download/balance",
+            body={
+                "year": str(last_month.year),
+                "month": f"{last_month.month:02d}",
+                "group": group,
+            },
+        ),
+    ]
+
+
+async def seed(members: int, years: int, incidents: int) -> str:
+    """
+    Fill a stand-in database, install it in the app and return the group
+    """
+    group_document, movements = generate_group(members, years)
+    database = StandInDatabase("load")
+    await database.Groups.insert_many([dict(group_document)])
+    await database.Movements.insert_many(movements)
+    await database.Incidents.insert_many(generate_incidents(group_document, incidents))
+    await database.Owners.insert_many(
+        [
+            {
+                "token_owner": "load-test",
+                "access_token": TOKEN,
+                "scope": [group_document["group"]],
+                "token_type": "admin",
+            }
+        ]
+    )
+    install(database)
+    return str(group_document["group"])
+
+
+@asynccontextmanager
+async def in_process_client() -> AsyncIterator[httpx.AsyncClient]:
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://load.test"
+        ) as client:
+            yield client
+
+
+@asynccontextmanager
+async def uvicorn_client() -> AsyncIterator[httpx.AsyncClient]:
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    thread = threading.Thread(
+        target=server.run, kwargs={"sockets": [listener]}, daemon=True
+    )
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn did not start")
+        await asyncio.sleep(0.05)
+    try:
+        async with url_client(f"http://127.0.0.1:{port}") as client:
+            yield client
+    finally:
+        server.should_exit = True
+        thread.join()
+        listener.close()
+
+
+def url_client(url: str) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        base_url=url,
+        timeout=httpx.Timeout(60),
+        limits=httpx.Limits(max_connections=None, max_keepalive_connections=None),
+    )
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """
+    Nearest-rank percentile of an ascending list
+    """
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+async def load(
+    client: httpx.AsyncClient,
+    endpoint: Endpoint,
+    token: str,
+    concurrency: int,
+    requests: int,
+    warmup: int,
+) -> dict[str, Any]:
+    headers = {"Authorization": f"Bearer {token}"}
+    latencies: list[float] = []
+    statuses: Counter[str] = Counter()
+    remaining = requests
+
+    async def send() -> None:
+        start = time.perf_counter()
+        try:
+            response = await client.request(
+                endpoint.method,
+                endpoint.path,
+                params=endpoint.params,
+                json=endpoint.body,
+                headers=headers,
+            )
+            statuses[str(response.status_code)] += 1
+        except httpx.HTTPError as error:
+            statuses[type(error).__name__] += 1
+        latencies.append(time.perf_counter() - start)
+
+    async def worker() -> None:
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            await send()
+
+    for _ in range(warmup):
+        await send()
+    latencies.clear()
+    statuses.clear()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    errors = requests - statuses["200"]
+    return {
+        "endpoint": endpoint.name,
+        "concurrency": concurrency,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+        "errors": errors,
+        "error_rate": round(errors / requests, 4),
+        "statuses": dict(statuses),
+    }
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    client: AbstractAsyncContextManager[httpx.AsyncClient]
+    if args.url:
+        group, token = args.group, args.token
+        client = url_client(args.url)
+    else:
+        group, token = await seed(args.members, args.years, args.incidents), TOKEN
+        client = uvicorn_client() if args.uvicorn else in_process_client()
+    selected = [
+        endpoint
+        for endpoint in endpoints(group)
+        if not args.endpoints or endpoint.name in args.endpoints
+    ]
+    mode = "url" if args.url else "uvicorn" if args.uvicorn else "asgi"
+    results = []
+    async with client as connected:
+        for endpoint in selected:
+            result = await load(
+                connected,
+                endpoint,
+                token,
+                args.concurrency,
+                args.requests,
+                args.warmup,
+            )
+            result = {"mode": mode, **result}
+            print(json.dumps(result), flush=True)
+            results.append(result)
+    return results
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="per endpoint")
+    parser.add_argument("--warmup", type=int, default=5, help="per endpoint")
+    parser.add_argument(
+        "--endpoints",
+        type=lambda value: value.split(","),
+        help="comma separated, of: "
+        + ", ".join(endpoint.name for endpoint in endpoints("")),
+    )
+    parser.add_argument("--members", type=int, default=50)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--incidents", type=int, default=500)
+    parser.add_argument("--uvicorn", action="store_true", help="serve over HTTP")
+    parser.add_argument("--url", help="running server to load instead")
+    parser.add_argument("--token", help="admin token, with --url")
+    parser.add_argument("--group", help="group in the token's scope, with --url")
+    parser.add_argument("--output", help="write the results as a JSON document")
+    args = parser.parse_args(argv)
+    if args.url and not (args.token and args.group):
+        parser.error("--url needs --token and --group")
+
+    # a log line per request would be part of what is measured
+    logger.setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    results = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(
+                {
+                    "created_at": datetime.now().isoformat(timespec="seconds"),
+                    "results": results,
+                },
+                output,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
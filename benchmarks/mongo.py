@@ -0,0 +1,129 @@
+"""
+In-process stand-in for the async Mongo database, backed by mongomock.
+
+Cursors (`find`, `aggregate`) and `bulk_write` are wrapped explicitly, every other
+collection method is mongomock's behind a coroutine, as on the async
+client. Query times are mongomock's, only comparable between runs of this
+suite, not with a server. The tests serve the app from it too.
+"""
+
+from collections.abc import Awaitable, Callable, Iterator
+from typing import Any
+
+import mongomock
+
+from app.utils.db import bound_db
+
+# cursor options a real server applies that mongomock does not take
+SERVER_OPTIONS = ("batch_size", "max_time_ms")
+
+
+class StandInCursor:
+    def __init__(self, documents: Iterator[dict[str, Any]]):
+        self.documents = documents
+
+    def __aiter__(self) -> "StandInCursor":
+        return self
+
+    async def __anext__(self) -> dict[str, Any]:
+        try:
+            return next(self.documents)
+        except StopIteration:
+            raise StopAsyncIteration from None
+
+    async def to_list(self, length: int | None = None) -> list[dict[str, Any]]:
+        return list(self.documents)
+
+    async def close(self) -> None:
+        pass
+
+
+class StandInBulk:
+    """
+    Applies the operations of a bulk_write one by one, pymongo's operations
+    pass options mongomock's own bulk builder does not take
+    """
+
+    def __init__(self, collection: mongomock.Collection):
+        self.collection = collection
+
+    def add_insert(self, document: dict[str, Any]) -> None:
+        self.collection.insert_one(document)
+
+    def add_update(
+        self,
+        selector: dict[str, Any],
+        document: Any,
+        multi: bool,
+        upsert: bool,
+        **options: Any,
+    ) -> None:
+        update = self.collection.update_many if multi else self.collection.update_one
+        update(selector, document, upsert=upsert)
+
+    def add_replace(
+        self,
+        selector: dict[str, Any],
+        replacement: dict[str, Any],
+        upsert: bool,
+        **options: Any,
+    ) -> None:
+        self.collection.replace_one(selector, replacement, upsert=upsert)
+
+    def add_delete(self, selector: dict[str, Any], limit: int, **options: Any) -> None:
+        delete = self.collection.delete_one if limit else self.collection.delete_many
+        delete(selector)
+
+
+class StandInCollection:
+    def __init__(self, collection: mongomock.Collection):
+        self.collection = collection
+        self.name = collection.name
+
+    def find(self, *args: Any, **kwargs: Any) -> StandInCursor:
+        for option in SERVER_OPTIONS:
+            kwargs.pop(option, None)
+        return StandInCursor(iter(self.collection.find(*args, **kwargs)))
+
+    async def find_one(self, *args: Any, **kwargs: Any) -> dict[str, Any] | None:
+        for option in SERVER_OPTIONS:
+            kwargs.pop(option, None)
+        document: dict[str, Any] | None = self.collection.find_one(*args, **kwargs)
+        return document
+
+    async def aggregate(self, pipeline: list[dict[str, Any]]) -> StandInCursor:
+        return StandInCursor(iter(self.collection.aggregate(pipeline)))
+
+    async def bulk_write(self, requests: list[Any], ordered: bool = True) -> None:
+        bulk = StandInBulk(self.collection)
+        for request in requests:
+            request._add_to_bulk(bulk)
+
+    def __getattr__(self, name: str) -> Callable[..., Awaitable[Any]]:
+        method = getattr(self.collection, name)
+
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return method(*args, **kwargs)
+
+        return call
+
+
+class StandInDatabase:
+    def __init__(self, name: str = "bench"):
+        self.database: mongomock.Database = mongomock.MongoClient()[name]
+
+    def __getitem__(self, name: str) -> StandInCollection:
+        return StandInCollection(self.database[name])
+
+    async def command(self, name: str) -> dict[str, Any]:
+        return {"ok": 1.0}
+
+    def __getattr__(self, name: str) -> StandInCollection:
+        return self[name]
+
+
+def install(database: StandInDatabase) -> None:
+    """
+    Serve the app's `expenses_db` from `database`, the lifespan keeps it
+    """
+    bound_db.bind(database)
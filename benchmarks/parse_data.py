@@ -0,0 +1,78 @@
+"""
+Scaling benchmark for `parse_data`.
+
+Run with `uv run python -m benchmarks.parse_data`. Prints one JSON line per
+(rows, years) case; `us_per_row` should stay flat as rows and months grow.
+"""
+
+import json
+import random
+import time
+from datetime import datetime
+
+from dateutil.relativedelta import relativedelta
+
+from app.routers.transactions.enums import MovementType
+from app.routers.transactions.models import GroupDetails, TransactionData
+from app.routers.transactions.operations import parse_data
+
+ROWS = [1_000, 10_000, 100_000]
+YEARS = [1, 5, 10]
+CATEGORIES = ["MONTHLY_INCOME", "EXTRAORDINARY_INCOME", "VENCIDO", "LUZ", "AGUA"]
+
+
+def build_case(rows: int, years: int) -> tuple[list[TransactionData], GroupDetails]:
+    rng = random.Random(rows * years)
+    created_at = datetime.now().replace(day=1) - relativedelta(years=years)
+    group = GroupDetails(
+        created_at=created_at,
+        size=20,
+        group="BENCH",
+        group_members=[f"DEPTO {i}" for i in range(20)],
+    )
+    data = []
+    for i in range(rows):
+        date = created_at + relativedelta(months=rng.randrange(years * 12))
+        category = rng.choice(CATEGORIES)
+        data.append(
+            TransactionData(
+                transaction_id=i,
+                user=f"DEPTO {i % 20}",
+                group="BENCH",
+                movement_type=(
+                    MovementType.expense
+                    if category in ("LUZ", "AGUA")
+                    else MovementType.income
+                ),
+                amount=120,
+                created_at=date,
+                date=date,
+                name=f"APORTACION {date.month} {date.year}",
+                category=category,
+            )
+        )
+    return data, group
+
+
+def main() -> None:
+    for years in YEARS:
+        for rows in ROWS:
+            data, group = build_case(rows, years)
+            start = time.perf_counter()
+            parse_data(data, group)
+            elapsed = time.perf_counter() - start
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "parse_data",
+                        "rows": rows,
+                        "years": years,
+                        "seconds": round(elapsed, 4),
+                        "us_per_row": round(elapsed / rows * 1e6, 3),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
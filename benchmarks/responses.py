@@ -0,0 +1,109 @@
+"""
+Serialization time and bytes on the wire of a /parsed-data response.
+
+The payload is the python engine's answer for a group with ROWS movements
+over YEARS years. Serializers:
+
+- `stdlib`: `json.dumps` of the JSON-mode dump, what `JSONResponse` does
+- `orjson`: the same dump rendered by orjson, what `ORJSONResponse` does
+- `pydantic`: straight to bytes, FastAPI's path for routes with a response
+  model on versions that have it
+
+Each serialized body is then sent as it is, gzip'ed, and brotli'ed when the
+`brotli` package is installed, at the app's GZIP_LEVEL / BROTLI_QUALITY. Run with
+`uv run python -m benchmarks.responses`.
+"""
+
+import gzip
+import json
+import time
+from collections.abc import Callable
+from typing import Any
+
+import orjson as orjson_lib
+from pydantic import TypeAdapter
+
+from app import settings
+from app.routers.transactions.operations import parse_data, parse_group_details
+from app.utils.compression import brotli
+from benchmarks.parse_data import build_case
+
+ROWS = 50_000
+YEARS = 10
+REPEAT = 5
+
+payload_adapter = TypeAdapter(Any)
+
+
+def stdlib(payload: dict[str, Any]) -> bytes:
+    content = payload_adapter.dump_python(payload, mode="json")
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def orjson(payload: dict[str, Any]) -> bytes:
+    content = payload_adapter.dump_python(payload, mode="json")
+    return orjson_lib.dumps(content, option=orjson_lib.OPT_NON_STR_KEYS)
+
+
+def pydantic(payload: dict[str, Any]) -> bytes:
+    return payload_adapter.dump_json(payload)
+
+
+SERIALIZERS: dict[str, Callable[[dict[str, Any]], bytes]] = {
+    "stdlib": stdlib,
+    "orjson": orjson,
+    "pydantic": pydantic,
+}
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "gzip":
+        return gzip.compress(body, settings.GZIP_LEVEL)
+    if encoding == "br":
+        compressed: bytes = brotli.compress(body, quality=settings.BROTLI_QUALITY)
+        return compressed
+    return body
+
+
+def best_of(function: Callable[..., bytes], *args: Any) -> tuple[float, bytes]:
+    best = float("inf")
+    result = b""
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main() -> None:
+    data, group = build_case(ROWS, YEARS)
+    parsed_data = parse_data(data, group)
+    payload = {
+        "group_details": parse_group_details(group, parsed_data),
+        "parsed_data": parsed_data,
+    }
+    encodings = ["identity", "gzip"] + (["br"] if brotli is not None else [])
+    for name, serializer in SERIALIZERS.items():
+        serialize_seconds, body = best_of(serializer, payload)
+        for encoding in encodings:
+            compress_seconds, wire = best_of(compress, body, encoding)
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "responses",
+                        "serializer": name,
+                        "encoding": encoding,
+                        "rows": ROWS,
+                        "years": YEARS,
+                        "serialize_seconds": round(serialize_seconds, 4),
+                        "compress_seconds": round(compress_seconds, 4),
+                        "bytes": len(wire),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
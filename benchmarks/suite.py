@@ -0,0 +1,245 @@
+"""
+Benchmark suite over synthetic groups (see `benchmarks.generator`), with the
+Mongo reads served by the in-process stand-in (`benchmarks.mongo`).
+
+Covers parse_data, parse_group_details, get_records, render_receipts,
+create_pdf_file and create_pdf_balance for every (members, years) case.
+Prints one JSON line per result; `--output` also writes the whole run
+(app version, commit, python) as one JSON document, and `--baseline`
+compares the medians with such a file and exits with 1 when any of them is
+slower than `--threshold` times the baseline.
+
+    uv run python -m benchmarks.suite --output bench-1.0.3.json
+    uv run python -m benchmarks.suite --baseline bench-1.0.3.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime
+from typing import Any
+
+from app import settings
+from app.routers.report import report
+from app.routers.report.balance import compute_balance
+from app.routers.report.rendering import (
+    BALANCE,
+    create_pdf_balance,
+    create_pdf_file,
+)
+from app.routers.transactions.models import GroupDetails
+from app.routers.transactions.operations import (
+    parse_data,
+    parse_group_details,
+)
+from app.utils.get_common import CommonMongoGetQueryParams, get_records
+from benchmarks.generator import generate_group
+from benchmarks.mongo import StandInDatabase, install
+
+# (members, years)
+CASES = [(20, 2), (50, 5), (100, 10)]
+QUICK_CASES = CASES[:1]
+# folios per receipts download and listing page size
+RECEIPT_FOLIOS = 300
+PAGE_SIZE = 200
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(name: str, case: dict[str, Any], timings: list[float]) -> dict[str, Any]:
+    return {
+        "benchmark": name,
+        **case,
+        "runs": len(timings),
+        "min_seconds": round(min(timings), 6),
+        "median_seconds": round(statistics.median(timings), 6),
+    }
+
+
+def measure(function: Callable[[], Any], runs: int) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def measure_async(
+    function: Callable[[], Awaitable[Any]], runs: int
+) -> list[float]:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def listing_params(group: str) -> CommonMongoGetQueryParams:
+    return CommonMongoGetQueryParams(
+        filter=json.dumps({"group": group}),
+        projection=None,
+        limit=PAGE_SIZE,
+        skip=0,
+        sort_key="transaction_id",
+        sort_ascending=False,
+        cursor=None,
+    )
+
+
+async def run_case(members: int, years: int, runs: int) -> list[dict[str, Any]]:
+    group_document, movements = generate_group(members, years)
+    group = group_document["group"]
+    case = {"members": members, "years": years, "rows": len(movements)}
+    database = StandInDatabase()
+    await database.Movements.insert_many([dict(row) for row in movements])
+    install(database)
+
+    def group_details() -> GroupDetails:
+        return GroupDetails.model_validate(group_document)
+
+    parsed_data = parse_data(movements, group_details())
+    receipts = await report.render_receipts(1, RECEIPT_FOLIOS, group)
+    last_month = datetime.now().replace(day=1)
+    balance = compute_balance(
+        movements, group_details(), str(last_month.year), f"{last_month.month:02d}"
+    )
+    balance_content = BALANCE.render(dict(balance))
+
+    results = [
+        summarize(
+            "parse_data",
+            case,
+            measure(lambda: parse_data(movements, group_details()), runs),
+        ),
+        summarize(
+            "parse_group_details",
+            case,
+            measure(lambda: parse_group_details(group_details(), parsed_data), runs),
+        ),
+        summarize(
+            "get_records",
+            {**case, "limit": PAGE_SIZE},
+            await measure_async(
+                lambda: get_records(
+                    database,  # type: ignore[arg-type]
+                    "Movements",
+                    listing_params(group),
+                ),
+                runs,
+            ),
+        ),
+        summarize(
+            "render_receipts",
+            {**case, "folios": RECEIPT_FOLIOS},
+            await measure_async(
+                lambda: report.render_receipts(1, RECEIPT_FOLIOS, group), runs
+            ),
+        ),
+        summarize(
+            "create_pdf_file",
+            {**case, "receipts": len(receipts)},
+            measure(lambda: create_pdf_file(receipts), runs),
+        ),
+        summarize(
+            "create_pdf_balance",
+            case,
+            measure(lambda: create_pdf_balance(balance_content), runs),
+        ),
+    ]
+    return results
+
+
+def result_key(result: dict[str, Any]) -> str:
+    return json.dumps(
+        {
+            key: value
+            for key, value in result.items()
+            if key not in ("runs", "min_seconds", "median_seconds")
+        },
+        sort_keys=True,
+    )
+
+
+def compare(
+    results: list[dict[str, Any]], baseline_path: str, threshold: float
+) -> bool:
+    """
+    Print the median of every result against the baseline run, returns
+    whether none of them regressed past `threshold`
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = {
+            result_key(result): result for result in json.load(baseline_file)["results"]
+        }
+    passed = True
+    for result in results:
+        previous = baseline.get(result_key(result))
+        if previous is None:
+            continue
+        ratio = result["median_seconds"] / max(previous["median_seconds"], 1e-9)
+        regressed = ratio > threshold
+        passed = passed and not regressed
+        print(
+            json.dumps(
+                {
+                    **json.loads(result_key(result)),
+                    "baseline_seconds": previous["median_seconds"],
+                    "median_seconds": result["median_seconds"],
+                    "ratio": round(ratio, 3),
+                    "regressed": regressed,
+                }
+            )
+        )
+    return passed
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="smallest case only")
+    parser.add_argument("--output", help="write the run as a JSON document")
+    parser.add_argument("--baseline", help="JSON document of a previous run")
+    parser.add_argument("--threshold", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    results: list[dict[str, Any]] = []
+    for members, years in QUICK_CASES if args.quick else CASES:
+        for result in asyncio.run(run_case(members, years, args.runs)):
+            print(json.dumps(result))
+            results.append(result)
+
+    if args.output:
+        document = {
+            "version": settings.VERSION,
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "results": results,
+        }
+        with open(args.output, "w") as output:
+            json.dump(document, output, indent=2)
+    if args.baseline and not compare(results, args.baseline, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Per-row cost of reading Movements documents into `parse_data`.
+
+Compares validating every row into `TransactionData` with a fresh
+`TypeAdapter` per call (the previous behaviour), with the cached adapter,
+and the trusted read that parses the raw documents. Run with
+`uv run python -m benchmarks.trusted_reads`.
+"""
+
+import gc
+import json
+import time
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from dateutil.relativedelta import relativedelta
+from pydantic import TypeAdapter
+
+from app.routers.transactions.models import GroupDetails, TransactionData
+from app.routers.transactions.operations import parse_data
+from app.utils.get_common import read_models
+
+ROWS = [10_000, 100_000]
+
+
+def build_documents(rows: int, created_at: datetime) -> list[dict[str, Any]]:
+    documents = []
+    for i in range(rows):
+        date = created_at + relativedelta(months=i % 24)
+        documents.append(
+            {
+                "transaction_id": i,
+                "user": f"DEPTO {i % 20}",
+                "group": "BENCH",
+                "movement_type": "income",
+                "amount": 120,
+                "created_at": date,
+                "date": date,
+                "name": f"APORTACION {date.month} {date.year}",
+                "category": "VENCIDO" if i % 5 == 0 else "MONTHLY_INCOME",
+                "comments": None,
+            }
+        )
+    return documents
+
+
+def fresh_adapter(documents: list[dict[str, Any]], group: GroupDetails) -> None:
+    data = TypeAdapter(list[TransactionData]).validate_python(documents)
+    parse_data(data, group)
+
+
+def cached_adapter(documents: list[dict[str, Any]], group: GroupDetails) -> None:
+    parse_data(read_models(TransactionData, documents), group)
+
+
+def trusted(documents: list[dict[str, Any]], group: GroupDetails) -> None:
+    parse_data(documents, group)
+
+
+MODES: dict[str, Callable[[list[dict[str, Any]], GroupDetails], None]] = {
+    "validate_fresh_adapter": fresh_adapter,
+    "validate_cached_adapter": cached_adapter,
+    "trusted": trusted,
+}
+
+
+def main() -> None:
+    created_at = datetime.now().replace(day=1) - relativedelta(years=2)
+    group = GroupDetails(
+        created_at=created_at, size=20, group="BENCH", group_members=[]
+    )
+    for rows in ROWS:
+        documents = build_documents(rows, created_at)
+        for mode, read in MODES.items():
+            gc.collect()
+            start = time.perf_counter()
+            read(documents, group)
+            elapsed = time.perf_counter() - start
+            print(
+                json.dumps(
+                    {
+                        "benchmark": "trusted_reads",
+                        "mode": mode,
+                        "rows": rows,
+                        "seconds": round(elapsed, 4),
+                        "us_per_row": round(elapsed / rows * 1e6, 3),
+                    }
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,23 @@ elif [ "$1" == "test" ]; then
     uv run coverage xml
     uv run coverage html
     echo "✅ Tests completed. Coverage reports generated."
+elif [ "$1" == "bench" ]; then
+    echo "Running benchmarks..."
+    uv run python -m benchmarks
+    echo "✅ Benchmarks completed."
+elif [ "$1" == "rebuild-summary" ]; then
+    echo "Rebuilding monthly group summaries..."
+    uv run python -m app.routers.transactions.summary rebuild ${2:+--group "$2"}
+    echo "✅ Summaries rebuilt."
+elif [ "$1" == "seed-counters" ]; then
+    echo "Seeding transaction counters..."
+    uv run python -m app.routers.transactions.counters seed
+    echo "✅ Counters seeded."
+elif [ "$1" == "indexes" ]; then
+    echo "Ensuring indexes and verifying query plans..."
+    uv run python -m app.utils.indexes ensure
+    uv run python -m app.utils.indexes verify
+    echo "✅ Indexes in place, no collection scans."
 elif [ "$1" == "start" ]; then
     echo "Starting FastAPI development server..."
     uv run uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
@@ -61,6 +78,10 @@ else
     echo "  format        - Format code with ruff"
     echo "  qa [file]     - Run quality assurance checks (ruff + mypy). Optionally specify a single file."
     echo "  test          - Run tests with coverage reporting"
+    echo "  bench         - Run benchmarks (JSON lines on stdout)"
+    echo "  rebuild-summary [group] - Backfill GroupMonthlySummary from Movements"
+    echo "  seed-counters - Seed transaction_id counters from Movements maxima"
+    echo "  indexes       - Create indexes and fail on COLLSCAN query shapes"
     echo "  start         - Start FastAPI development server"
     echo "  tag-deploy    - Create and deploy a new version tag"
     exit 1
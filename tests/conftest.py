@@ -0,0 +1,63 @@
+from collections.abc import AsyncIterator, Iterator
+from typing import Any
+
+import httpx
+import pytest
+
+from app.main import app
+from app.utils.db import bound_db
+from benchmarks.generator import generate_group, generate_incidents
+from benchmarks.mongo import StandInDatabase, install
+
+TOKEN = "test-token"
+GROUP = "TEST"
+
+
+@pytest.fixture
+def anyio_backend() -> str:
+    return "asyncio"
+
+
+@pytest.fixture
+def database() -> Iterator[StandInDatabase]:
+    """
+    An empty mongomock stand-in serving the app's `expenses_db`
+    """
+    database = StandInDatabase("test")
+    install(database)
+    yield database
+    bound_db.bind(None)
+
+
+@pytest.fixture
+def group(database: StandInDatabase) -> dict[str, Any]:
+    """
+    A synthetic group with two years of movements, its incidents and an
+    admin token for it. Returns the Groups document.
+    """
+    group_document, movements = generate_group(5, 2, group=GROUP)
+    database.database.Groups.insert_one(dict(group_document))
+    database.database.Movements.insert_many(movements)
+    database.database.Incidents.insert_many(generate_incidents(group_document, 30))
+    database.database.Owners.insert_one(
+        {
+            "token_owner": "tests",
+            "access_token": TOKEN,
+            "scope": [GROUP],
+            "token_type": "admin",
+        }
+    )
+    return group_document
+
+
+@pytest.fixture
+async def client() -> AsyncIterator[httpx.AsyncClient]:
+    """
+    The app over httpx's ASGI transport, authenticated with the admin token
+    """
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app),
+        base_url="http://test",
+        headers={"Authorization": f"Bearer {TOKEN}"},
+    ) as client:
+        yield client
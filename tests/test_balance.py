@@ -0,0 +1,87 @@
+"""
+The balance PDF content agrees with /parsed-data and does not depend on
+where the cumulative totals are read from.
+"""
+
+from typing import Any
+
+import httpx
+import pytest
+
+from app import settings
+from app.routers.report.balance import compute_balance
+from app.routers.report.models import BalanceRequest
+from app.routers.report.report import render_balance
+from app.routers.transactions.models import GroupDetails
+from app.routers.transactions.summary import rebuild_group_summary
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def movements(group: dict[str, Any], database: Any) -> list[dict[str, Any]]:
+    """
+    The group's movements, some of them without created_at or with a
+    null one
+    """
+    collection = database.database.Movements
+    for position, movement in enumerate(collection.find({"group": group["group"]})):
+        if position % 7 == 0:
+            collection.update_one(
+                {"_id": movement["_id"]}, {"$unset": {"created_at": ""}}
+            )
+        elif position % 7 == 1:
+            collection.update_one(
+                {"_id": movement["_id"]}, {"$set": {"created_at": None}}
+            )
+    return list(collection.find({"group": group["group"]}, {"_id": 0}))
+
+
+def last_expense_month(movements: list[dict[str, Any]]) -> tuple[str, str]:
+    date = max(
+        movement["date"]
+        for movement in movements
+        if movement["movement_type"] == "expense" and movement.get("date")
+    )
+    return str(date.year), f"{date.month:02d}"
+
+
+async def test_totals_match_parsed_data(
+    client: httpx.AsyncClient, group: dict[str, Any], movements: list[dict[str, Any]]
+) -> None:
+    response = await client.get(
+        "/v1/transactions/parsed-data",
+        params={"group_id": group["group"], "engine": "python", "detail": "none"},
+    )
+    year, month = last_expense_month(movements)
+    balance = compute_balance(
+        movements, GroupDetails.model_validate(group), year, month
+    )
+    assert (
+        balance.group_details.model_dump(mode="json")
+        == response.json()["group_details"]
+    )
+    assert balance.users_with_debt == balance.group_details.users_with_debt
+    assert balance.monthly_expense == pytest.approx(
+        sum(
+            expense.amount
+            for category in balance.categories
+            for expense in category.expenses
+        )
+    )
+    assert balance.monthly_expense > 0
+
+
+async def test_summary_reads_render_the_same_balance(
+    group: dict[str, Any],
+    movements: list[dict[str, Any]],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    year, month = last_expense_month(movements)
+    request = BalanceRequest(year=year, month=month, group=group["group"])
+    monkeypatch.setattr(settings, "GROUP_SUMMARY_READS", False)
+    from_movements = await render_balance(request)
+
+    await rebuild_group_summary(group["group"])
+    monkeypatch.setattr(settings, "GROUP_SUMMARY_READS", True)
+    assert await render_balance(request) == from_movements
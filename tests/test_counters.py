@@ -0,0 +1,202 @@
+"""
+transaction_id allocation from the Counters collection.
+"""
+
+import asyncio
+from typing import Any
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from app.routers.transactions import counters
+from app.routers.transactions.common_functions import add_movements
+from app.routers.transactions.counters import (
+    COUNTERS_COLLECTION,
+    MANAGEMENT_USER,
+    PENDING_TRANSACTION_ID,
+    next_transaction_id,
+    reserve_transaction_ids,
+    seed_all_counters,
+    seed_counter,
+)
+from app.routers.transactions.enums import MovementType
+from app.routers.transactions.models import TransactionData
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    # every test gets an empty database, the index has to be created again
+    monkeypatch.setattr(counters, "counter_index_ready", False)
+
+
+def counter(database: Any, movement_type: str = "income") -> dict[str, Any]:
+    document: dict[str, Any] = database.database[COUNTERS_COLLECTION].find_one(
+        {"group": "G", "movement_type": movement_type}, {"_id": 0}
+    )
+    return document
+
+
+async def test_first_folios_of_a_new_group(database: Any) -> None:
+    assert await next_transaction_id("DEPTO 1", "G", "income") == 1
+    assert await next_transaction_id("DEPTO 2", "G", "income") == 2
+    assert await next_transaction_id("ADMIN", "G", "expense") == 10001
+    assert counter(database) == {
+        "group": "G",
+        "movement_type": "income",
+        "value": 2,
+        "last_user": "DEPTO 2",
+    }
+
+
+async def test_seeded_from_the_highest_folio(database: Any) -> None:
+    database.database.Movements.insert_many(
+        [
+            {"group": "G", "transaction_id": 41, "user": "DEPTO 3"},
+            {"group": "G", "transaction_id": 7, "user": "DEPTO 1"},
+            # pending receipts and expenses are outside the income range
+            {"group": "G", "transaction_id": 9999, "user": "DEPTO 2"},
+            {"group": "G", "transaction_id": 10020, "user": "ADMIN"},
+            {"group": "OTHER", "transaction_id": 500, "user": "DEPTO 1"},
+        ]
+    )
+    assert await next_transaction_id("DEPTO 1", "G", "income") == 42
+    assert await next_transaction_id(MANAGEMENT_USER, "G", "expense") == 10021
+    # the seed remembers who got the last folio
+    assert await next_transaction_id("DEPTO 3", "G", "income") == 43
+
+
+async def test_consecutive_movements_of_a_user_share_the_folio(
+    database: Any,
+) -> None:
+    folios = [
+        await next_transaction_id(user, "G", "income")
+        for user in ["DEPTO 1", "DEPTO 1", "DEPTO 2", "DEPTO 1"]
+    ]
+    assert folios == [1, 1, 2, 3]
+
+
+async def test_management_never_shares_a_folio(database: Any) -> None:
+    folios = [
+        await next_transaction_id(MANAGEMENT_USER, "G", "income") for _ in range(3)
+    ]
+    assert folios == [1, 2, 3]
+
+
+async def test_concurrent_allocations_are_unique(database: Any) -> None:
+    users = [f"DEPTO {number}" for number in range(50)]
+    folios = await asyncio.gather(
+        *(next_transaction_id(user, "G", "income") for user in users)
+    )
+    assert sorted(folios) == list(range(1, 51))
+
+
+async def test_full_income_range_does_not_advance(database: Any) -> None:
+    database.database.Movements.insert_one(
+        {"group": "G", "transaction_id": 9997, "user": "DEPTO 1"}
+    )
+    assert await next_transaction_id("DEPTO 2", "G", "income") == 9998
+    with pytest.raises(ValueError, match="9999"):
+        await next_transaction_id("DEPTO 3", "G", "income")
+    with pytest.raises(ValueError):
+        await next_transaction_id(MANAGEMENT_USER, "G", "income")
+    assert counter(database) == {
+        "group": "G",
+        "movement_type": "income",
+        "value": 9998,
+        "last_user": "DEPTO 2",
+    }
+    # the last user keeps its folio
+    assert await next_transaction_id("DEPTO 2", "G", "income") == 9998
+
+
+async def test_seeding_creates_the_unique_index(database: Any) -> None:
+    await seed_counter("G", "income")
+    await seed_counter("G", "income")
+    collection = database.database[COUNTERS_COLLECTION]
+    assert collection.count_documents({}) == 1
+    with pytest.raises(DuplicateKeyError):
+        collection.insert_one({"group": "G", "movement_type": "income", "value": 0})
+
+
+async def test_seeding_never_moves_a_counter_back(database: Any) -> None:
+    for _ in range(3):
+        await next_transaction_id(MANAGEMENT_USER, "G", "income")
+    await seed_counter("G", "income")
+    assert counter(database)["value"] == 3
+
+
+async def test_seed_all_counters(database: Any) -> None:
+    database.database.Movements.insert_many(
+        [
+            {"group": "G", "transaction_id": 12, "user": "DEPTO 1"},
+            {"group": "H", "transaction_id": 10005, "user": "ADMIN"},
+        ]
+    )
+    assert await seed_all_counters() == 4
+    assert counter(database)["value"] == 12
+    assert counter(database, "expense")["value"] == 10000
+
+
+async def test_reserve_a_block(database: Any) -> None:
+    assert await next_transaction_id("DEPTO 1", "G", "income") == 1
+    assert await reserve_transaction_ids("G", "income", 5) == range(2, 7)
+    # a block is never shared with the user of the last single folio
+    assert await next_transaction_id("DEPTO 1", "G", "income") == 7
+    assert await reserve_transaction_ids("G", "expense", 3) == range(10001, 10004)
+    assert await reserve_transaction_ids("G", "income", 0) == range(0)
+
+
+async def test_block_crossing_the_income_range_does_not_advance(
+    database: Any,
+) -> None:
+    database.database.Movements.insert_one(
+        {"group": "G", "transaction_id": 9990, "user": "DEPTO 1"}
+    )
+    with pytest.raises(ValueError, match="9999"):
+        await reserve_transaction_ids("G", "income", 9)
+    assert counter(database)["value"] == 9990
+    # the block that ends on the last folio fits
+    assert await reserve_transaction_ids("G", "income", 8) == range(9991, 9999)
+    with pytest.raises(ValueError):
+        await reserve_transaction_ids("G", "income", 1)
+
+
+async def test_batch_writes_take_one_block(
+    database: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    updates = 0
+    increment_counter = counters.increment_counter
+
+    async def counted(*args: Any) -> int | None:
+        nonlocal updates
+        updates += 1
+        return await increment_counter(*args)
+
+    def movement(user: str, transaction_id: int) -> TransactionData:
+        return TransactionData(
+            transaction_id=transaction_id,
+            user=user,
+            group="G",
+            movement_type=MovementType.income,
+            amount=100.0,
+            name="APORTACION",
+            category="MONTHLY_INCOME",
+        )
+
+    await next_transaction_id("DEPTO 1", "G", "income")
+    monkeypatch.setattr(counters, "increment_counter", counted)
+    movements = [movement(f"DEPTO {number}", 0) for number in range(1, 5)]
+    movements.append(movement("DEPTO 5", PENDING_TRANSACTION_ID))
+    assert await add_movements(movements) == {}
+    assert updates == 1
+    stored = database.database.Movements.find({}, {"_id": 0, "transaction_id": 1})
+    assert sorted(document["transaction_id"] for document in stored) == [
+        2,
+        3,
+        4,
+        5,
+        PENDING_TRANSACTION_ID,
+    ]
+    assert [movement.transaction_id for movement in movements[:4]] == [2, 3, 4, 5]
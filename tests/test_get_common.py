@@ -0,0 +1,108 @@
+"""
+Keyset pagination of the listing endpoints: following X-Next-Cursor walks
+the same records as a single page, in the same order.
+"""
+
+import json
+from typing import Any
+
+import httpx
+import pytest
+
+from app.utils.get_common import NEXT_CURSOR_HEADER, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+
+async def walk(
+    client: httpx.AsyncClient, params: dict[str, Any]
+) -> list[dict[str, Any]]:
+    records: list[dict[str, Any]] = []
+    cursor = None
+    while True:
+        page_params = {**params, "cursor": cursor} if cursor else params
+        response = await client.get("/v1/transactions", params=page_params)
+        if response.status_code == 404:
+            return records
+        assert response.status_code == 200
+        records += response.json()
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if cursor is None:
+            return records
+
+
+@pytest.mark.parametrize(
+    "sort",
+    [
+        {},
+        {"sort_key": "transaction_id", "sort_ascending": "true"},
+        {"sort_key": "transaction_id"},
+        # set, null or missing: nulls sort before every value
+        {"sort_key": "comments", "sort_ascending": "true"},
+        {"sort_key": "comments"},
+    ],
+)
+async def test_cursor_pages_match_a_single_page(
+    client: httpx.AsyncClient,
+    group: dict[str, Any],
+    database: Any,
+    sort: dict[str, str],
+) -> None:
+    movements = database.database.Movements
+    for position, movement in enumerate(movements.find()):
+        if position % 3 == 0:
+            update = {"$set": {"comments": f"PAGO {position % 4}"}}
+        elif position % 3 == 1:
+            update = {"$unset": {"comments": ""}}
+        else:
+            continue
+        movements.update_one({"_id": movement["_id"]}, update)
+    params = {"filter": json.dumps({"group": group["group"]}), **sort}
+    single = await client.get("/v1/transactions", params={**params, "limit": 2000})
+    assert NEXT_CURSOR_HEADER not in single.headers
+    expected = single.json()
+    assert len(expected) > 100
+
+    paged = await walk(client, {**params, "limit": 37})
+    assert paged == expected
+
+
+async def test_default_order_is_insertion_order(
+    client: httpx.AsyncClient, group: dict[str, Any], database: Any
+) -> None:
+    response = await client.get(
+        "/v1/transactions",
+        params={"filter": json.dumps({"group": group["group"]}), "limit": 2000},
+    )
+    inserted = list(
+        database.database.Movements.find({"group": group["group"]}, {"_id": 0})
+    )
+    assert [record["name"] for record in response.json()] == [
+        movement["name"] for movement in inserted
+    ]
+
+
+async def test_skip_with_cursor_is_rejected(
+    client: httpx.AsyncClient, group: dict[str, Any]
+) -> None:
+    cursor = encode_cursor("_id", True, None, None)
+    response = await client.get(
+        "/v1/transactions", params={"cursor": cursor, "skip": 10}
+    )
+    assert response.status_code == 422
+    assert "skip" in response.json()["detail"]
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    ["not-a-cursor", encode_cursor("transaction_id", True, 1, None)],
+    ids=["invalid", "other-sort"],
+)
+async def test_foreign_cursors_are_rejected(
+    client: httpx.AsyncClient, group: dict[str, Any], cursor: str
+) -> None:
+    response = await client.get(
+        "/v1/transactions",
+        params={"filter": json.dumps({"group": group["group"]}), "cursor": cursor},
+    )
+    assert response.status_code == 422
@@ -0,0 +1,36 @@
+"""
+/health reports Mongo availability without exposing the error.
+"""
+
+from typing import Any
+
+import httpx
+import pytest
+from pymongo.errors import ServerSelectionTimeoutError
+
+from app.utils import db
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_healthy(client: httpx.AsyncClient, database: Any) -> None:
+    response = await client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+async def test_failed_ping_hides_the_error(
+    client: httpx.AsyncClient,
+    database: Any,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+) -> None:
+    async def ping() -> float:
+        raise ServerSelectionTimeoutError("mongo-0.internal:27017: timed out")
+
+    monkeypatch.setattr(db, "ping", ping)
+    response = await client.get("/health")
+    assert response.status_code == 503
+    assert response.json()["status"] == "unavailable"
+    assert "mongo-0.internal" not in response.text
+    assert "mongo-0.internal" in caplog.text
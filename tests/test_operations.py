@@ -0,0 +1,296 @@
+"""
+parse_data / parse_totals / parse_group_details against the implementation
+they replaced (the `baseline_*` functions below, the same logic with the
+repeated detail dicts folded into helpers), on models and on raw documents
+(trusted reads).
+"""
+
+from datetime import datetime
+from typing import Any
+
+import pytest
+from dateutil.relativedelta import relativedelta
+from pydantic import TypeAdapter
+
+from app.routers.transactions.models import (
+    DebtDataMonth,
+    ExpenseDataMonth,
+    GroupDetails,
+    IncomeDataMonth,
+    ParsedData,
+    TransactionData,
+)
+from app.routers.transactions.operations import (
+    parse_data,
+    parse_group_details,
+    parse_totals,
+)
+
+
+def baseline_get_months(initial_date: datetime) -> list[str]:
+    now = datetime.now()
+    months = []
+    month = initial_date
+    while month <= now:
+        months.append(month.strftime("%Y-%m"))
+        month += relativedelta(months=1)
+    return months
+
+
+def baseline_month_rows(
+    group_details: GroupDetails, total: str, count: str, detail: str
+) -> list[dict[str, Any]]:
+    return [
+        {"datetime": month, total: 0.0, count: 0, detail: []}
+        for month in baseline_get_months(group_details.created_at)
+    ]
+
+
+def baseline_detail(transaction: TransactionData) -> dict[str, Any]:
+    return {
+        "transaction_id": transaction.transaction_id,
+        "user": transaction.user,
+        "name": transaction.name,
+        "amount": transaction.amount,
+        "comments": transaction.comments,
+        "category": transaction.category,
+    }
+
+
+def baseline_parse_income_data(
+    data: list[TransactionData], group_details: GroupDetails
+) -> list[IncomeDataMonth]:
+    result_list = baseline_month_rows(
+        group_details, "total_income", "total_contributions", "income_source"
+    )
+    for transaction in data:
+        if transaction.category in ["MONTHLY_INCOME", "EXTRAORDINARY_INCOME"]:
+            transaction_date = transaction.created_at.strftime("%Y-%m")
+            for result in result_list:
+                if result["datetime"] == transaction_date:
+                    result["total_income"] = (
+                        float(result["total_income"]) + transaction.amount
+                    )
+                    result["income_source"].append(baseline_detail(transaction))
+                    result["total_contributions"] = len(result["income_source"])
+    return TypeAdapter(list[IncomeDataMonth]).validate_python(result_list)
+
+
+def baseline_parse_expense_data(
+    data: list[TransactionData], group_details: GroupDetails
+) -> list[ExpenseDataMonth]:
+    result_list = baseline_month_rows(
+        group_details, "total_expense", "total_expenses", "expense_detail"
+    )
+    for transaction in data:
+        if transaction.movement_type in ["expense"]:
+            transaction_date = transaction.created_at.strftime("%Y-%m")
+            for result in result_list:
+                if result["datetime"] == transaction_date:
+                    result["total_expense"] = (
+                        float(result["total_expense"]) + transaction.amount
+                    )
+                    result["expense_detail"].append(baseline_detail(transaction))
+                    result["total_expenses"] = len(result["expense_detail"])
+    return TypeAdapter(list[ExpenseDataMonth]).validate_python(result_list)
+
+
+def baseline_parse_debt_data(
+    data: list[TransactionData], group_details: GroupDetails
+) -> list[DebtDataMonth]:
+    result_list = baseline_month_rows(
+        group_details, "total_debt", "total_contributions_in_debt", "debt_detail"
+    )
+    for transaction in data:
+        if transaction.category in ["VENCIDO"] and transaction.date is not None:
+            transaction_date = transaction.date.strftime("%Y-%m")
+            for result in result_list:
+                if result["datetime"] == transaction_date:
+                    result["total_debt"] = (
+                        float(result["total_debt"]) + transaction.amount
+                    )
+                    result["debt_detail"].append(baseline_detail(transaction))
+                    result["total_contributions_in_debt"] = len(result["debt_detail"])
+    return TypeAdapter(list[DebtDataMonth]).validate_python(result_list)
+
+
+def baseline_parse_data(
+    data: list[TransactionData], group_details: GroupDetails
+) -> ParsedData:
+    return ParsedData(
+        income=baseline_parse_income_data(data, group_details),
+        expense=baseline_parse_expense_data(data, group_details),
+        debt=baseline_parse_debt_data(data, group_details),
+    )
+
+
+def baseline_parse_group_details(
+    group_details: GroupDetails, parsed_data: ParsedData
+) -> GroupDetails:
+    group_details.total_income = sum(month.total_income for month in parsed_data.income)
+    group_details.total_expense = sum(
+        month.total_expense for month in parsed_data.expense
+    )
+    group_details.total_debt = sum(month.total_debt for month in parsed_data.debt)
+    group_details.total_contributions = sum(
+        month.total_contributions for month in parsed_data.income
+    )
+    group_details.total_pending_receipts = sum(
+        month.total_contributions_in_debt for month in parsed_data.debt
+    )
+    group_details.balance = (
+        group_details.total_income
+        + group_details.total_debt
+        - group_details.total_expense
+    )
+    group_details.total_available = (
+        group_details.total_income - group_details.total_expense
+    )
+    user_with_debt = []
+    for month in parsed_data.debt:
+        for debt in month.debt_detail:
+            if debt.user not in user_with_debt:
+                user_with_debt.append(debt.user)
+    group_details.users_with_debt = sorted(user_with_debt)
+    return TypeAdapter(GroupDetails).validate_python(group_details)
+
+
+CREATED_AT = datetime(2024, 1, 1)
+
+
+def group() -> GroupDetails:
+    return GroupDetails(
+        created_at=CREATED_AT,
+        size=3,
+        group="G",
+        group_members=["DEPTO 1", "DEPTO 2", "DEPTO 3"],
+    )
+
+
+def movement(transaction_id: int, **fields: Any) -> dict[str, Any]:
+    return {
+        "transaction_id": transaction_id,
+        "user": "DEPTO 1",
+        "group": "G",
+        "movement_type": "income",
+        "amount": 100.0,
+        "name": f"MOVEMENT {transaction_id}",
+        "category": "MONTHLY_INCOME",
+        "comments": None,
+        **fields,
+    }
+
+
+DOCUMENTS = [
+    movement(1, created_at=datetime(2024, 1, 10), date=datetime(2024, 1, 1)),
+    movement(2, user="DEPTO 2", created_at=datetime(2024, 1, 20), comments="late"),
+    movement(
+        3,
+        category="EXTRAORDINARY_INCOME",
+        amount=55.5,
+        created_at=datetime(2024, 3, 2),
+    ),
+    movement(
+        10001,
+        user="ADMIN",
+        movement_type="expense",
+        category="LUZ",
+        amount=320.25,
+        created_at=datetime(2024, 1, 15),
+    ),
+    movement(
+        10002,
+        user="ADMIN",
+        movement_type="expense",
+        category="AGUA",
+        amount=80.0,
+        created_at=datetime(2024, 2, 15),
+    ),
+    # debts are bucketed by date, created_at does not matter
+    movement(
+        9999,
+        user="DEPTO 3",
+        category="VENCIDO",
+        created_at=datetime(2024, 5, 1),
+        date=datetime(2024, 2, 1),
+    ),
+    movement(
+        9999,
+        user="DEPTO 2",
+        category="VENCIDO",
+        created_at=datetime(2024, 5, 1),
+        date=datetime(2024, 2, 1),
+    ),
+    movement(9999, user="DEPTO 1", category="VENCIDO", created_at=datetime(2024, 5, 1)),
+    # before the group existed, ignored
+    movement(4, created_at=datetime(2023, 12, 31)),
+    movement(
+        9999,
+        user="DEPTO 1",
+        category="VENCIDO",
+        created_at=datetime(2024, 5, 1),
+        date=datetime(2023, 6, 1),
+    ),
+    # neither income, expense nor debt
+    movement(5, movement_type="investment", category="FONDO", created_at=CREATED_AT),
+    # stored without created_at, models give it the field default
+    movement(6, user="DEPTO 3"),
+    movement(10003, user="ADMIN", movement_type="expense", category="LUZ", amount=12.0),
+]
+
+
+def models() -> list[TransactionData]:
+    return [TransactionData.model_validate(document) for document in DOCUMENTS]
+
+
+def documents() -> list[dict[str, Any]]:
+    return [dict(document) for document in DOCUMENTS]
+
+
+@pytest.mark.parametrize("rows", [models, documents], ids=["models", "documents"])
+def test_parse_data_matches_baseline(rows: Any) -> None:
+    expected = baseline_parse_data(models(), group())
+    assert parse_data(rows(), group()).model_dump() == expected.model_dump()
+
+
+def test_missing_created_at_counts_in_both_reads() -> None:
+    from_models = parse_data(models(), group())
+    from_documents = parse_data(documents(), group())
+    model_ids = {
+        detail.transaction_id
+        for month in from_models.income
+        for detail in month.income_source
+    }
+    assert 6 in model_ids
+    assert from_documents.model_dump() == from_models.model_dump()
+
+
+@pytest.mark.parametrize("rows", [models, documents], ids=["models", "documents"])
+def test_parse_group_details_matches_baseline(rows: Any) -> None:
+    expected = baseline_parse_group_details(
+        group(), baseline_parse_data(models(), group())
+    )
+    parsed = parse_group_details(group(), parse_data(rows(), group()))
+    assert parsed.model_dump() == expected.model_dump()
+    assert parsed.users_with_debt == ["DEPTO 2", "DEPTO 3"]
+
+
+@pytest.mark.parametrize("rows", [models, documents], ids=["models", "documents"])
+def test_parse_totals_matches_baseline_totals(rows: Any) -> None:
+    expected = baseline_parse_data(models(), group())
+    parsed, users_with_debt = parse_totals(rows(), group())
+    for kind, detail in (
+        ("income", "income_source"),
+        ("expense", "expense_detail"),
+        ("debt", "debt_detail"),
+    ):
+        expected_months = [
+            {key: value for key, value in month.items() if key != detail}
+            for month in expected.model_dump()[kind]
+        ]
+        months = parsed.model_dump()[kind]
+        assert [month.pop(detail) for month in months] == [[]] * len(months)
+        assert months == expected_months
+    expected_details = baseline_parse_group_details(group(), expected)
+    details = parse_group_details(group(), parsed, users_with_debt)
+    assert details.model_dump() == expected_details.model_dump()
@@ -0,0 +1,88 @@
+"""
+/parsed-data answers the same whichever engine computes it.
+"""
+
+from typing import Any
+
+import httpx
+import pytest
+
+from app.routers.transactions.summary import rebuild_group_summary
+
+pytestmark = pytest.mark.anyio
+
+
+async def parsed_data(
+    client: httpx.AsyncClient, engine: str, **params: str
+) -> dict[str, Any]:
+    response = await client.get(
+        "/v1/transactions/parsed-data", params={"engine": engine, **params}
+    )
+    assert response.status_code == 200
+    result: dict[str, Any] = response.json()
+    return result
+
+
+@pytest.mark.parametrize("detail", ["full", "months", "none"])
+async def test_aggregation_matches_python(
+    client: httpx.AsyncClient, group: dict[str, Any], detail: str
+) -> None:
+    params = {"group_id": group["group"], "detail": detail}
+    expected = await parsed_data(client, "python", **params)
+    assert expected["group_details"]
+    assert await parsed_data(client, "aggregation", **params) == expected
+
+
+@pytest.mark.parametrize("filter_key", ["user_id", "date"])
+async def test_aggregation_matches_python_filtered(
+    client: httpx.AsyncClient, group: dict[str, Any], database: Any, filter_key: str
+) -> None:
+    movement = database.database.Movements.find_one(
+        {"group": group["group"], "date": {"$ne": None}}
+    )
+    value = movement["user"] if filter_key == "user_id" else f"{movement['date']:%Y-%m}"
+    params = {"group_id": group["group"], "detail": "months", filter_key: value}
+    expected = await parsed_data(client, "python", **params)
+    assert await parsed_data(client, "aggregation", **params) == expected
+
+
+@pytest.mark.parametrize("detail", ["full", "months", "none"])
+async def test_summary_matches_python(
+    client: httpx.AsyncClient, group: dict[str, Any], detail: str
+) -> None:
+    await rebuild_group_summary(group["group"])
+    params = {"group_id": group["group"], "detail": detail}
+    expected = await parsed_data(client, "python", **params)
+    assert await parsed_data(client, "summary", **params) == expected
+
+
+async def test_engines_agree_on_missing_data(
+    client: httpx.AsyncClient, group: dict[str, Any]
+) -> None:
+    params = {"group_id": group["group"], "user_id": "NOBODY", "detail": "none"}
+    for engine in ["python", "aggregation"]:
+        response = await client.get(
+            "/v1/transactions/parsed-data", params={"engine": engine, **params}
+        )
+        assert response.status_code == 404
+
+
+async def test_engines_bucket_missing_created_at_alike(
+    client: httpx.AsyncClient, group: dict[str, Any], database: Any
+) -> None:
+    movements = database.database.Movements
+    for position, movement in enumerate(movements.find({"group": group["group"]})):
+        if position % 5 == 0:
+            movements.update_one(
+                {"_id": movement["_id"]}, {"$unset": {"created_at": ""}}
+            )
+        elif position % 5 == 1:
+            movements.update_one(
+                {"_id": movement["_id"]}, {"$set": {"created_at": None}}
+            )
+    await rebuild_group_summary(group["group"])
+    params = {"group_id": group["group"], "detail": "months"}
+    expected = await parsed_data(client, "python", **params)
+    assert expected["group_details"]["total_income"]
+    for engine in ["aggregation", "summary"]:
+        assert await parsed_data(client, engine, **params) == expected
@@ -0,0 +1,102 @@
+"""
+ReceiptsPDFStream output read back with pypdf: the document parses, has
+the expected pages and the receipts' text extracts as written.
+"""
+
+import io
+
+import pytest
+from pypdf import PdfReader
+
+from app.routers.report.pdf_stream import (
+    TEXT_WIDTH,
+    ReceiptsPDFStream,
+    string_width,
+    wrap_text,
+)
+from app.routers.report.rendering import create_pdf_file
+
+
+def receipt(folio: int, text: str = "APORTACION 03 2024") -> str:
+    return f"Folio: {folio}\nDEPTO {folio}\n{text}\nMonto: $ 1,200.00"
+
+
+def read(document: bytes) -> PdfReader:
+    assert document.startswith(b"%PDF-")
+    assert document.rstrip().endswith(b"%%EOF")
+    return PdfReader(io.BytesIO(document), strict=True)
+
+
+def text_of(reader: PdfReader) -> str:
+    return "\n".join(page.extract_text() for page in reader.pages)
+
+
+def squeezed(text: str) -> str:
+    return "".join(text.split())
+
+
+def test_no_receipts_is_one_blank_page() -> None:
+    reader = read(create_pdf_file([]))
+    assert len(reader.pages) == 1
+    assert text_of(reader).strip() == ""
+
+
+def test_one_receipt() -> None:
+    reader = read(create_pdf_file([receipt(1)]))
+    assert len(reader.pages) == 1
+    text = text_of(reader)
+    for line in receipt(1).split("\n"):
+        assert line in text
+
+
+def test_many_receipts_three_per_page_in_order() -> None:
+    receipts = [receipt(folio) for folio in range(1, 11)]
+    reader = read(create_pdf_file(receipts))
+    assert len(reader.pages) == 4
+    text = text_of(reader)
+    positions = [text.index(f"Folio: {folio}\n") for folio in range(1, 11)]
+    assert positions == sorted(positions)
+    assert "Folio: 10" in reader.pages[3].extract_text()
+
+
+def test_streamed_chunks_are_the_document() -> None:
+    receipts = [receipt(folio) for folio in range(1, 8)]
+    pdf = ReceiptsPDFStream()
+    chunks = [pdf.start(), *(pdf.add(text) for text in receipts), pdf.finish()]
+    assert b"".join(chunks) == create_pdf_file(receipts)
+    # full pages are sent before the last receipt is added
+    assert sum(1 for chunk in chunks[1:-1] if chunk) == 2
+
+
+def test_long_text_wraps_and_spills_over_pages() -> None:
+    comment = " ".join(f"palabra{index}" for index in range(400))
+    reader = read(create_pdf_file([receipt(1, comment), receipt(2)]))
+    assert len(reader.pages) > 1
+    assert squeezed(comment) in squeezed(text_of(reader))
+    assert "Folio: 2" in text_of(reader)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Aportación extraordinaria — reparación de la bomba",
+        "Cuota de mantenimiento: 1.200 € – pagada",
+        "“Pagado” por el señor Muñoz, ‘Depto’ Ñ",
+        "paréntesis (abiertos) y \\ barra",
+    ],
+)
+def test_accented_and_windows_1252_text(text: str) -> None:
+    reader = read(create_pdf_file([receipt(1, text)]))
+    assert text in text_of(reader)
+
+
+def test_characters_outside_cp1252_are_replaced() -> None:
+    reader = read(create_pdf_file([receipt(1, "Depto ✓ 日本")]))
+    assert "Depto ? ??" in text_of(reader)
+
+
+def test_wrapped_lines_fit_the_cell() -> None:
+    text = "—" * 200 + " " + "€ " * 200
+    lines = wrap_text(text)
+    assert len(lines) > 2
+    assert all(string_width(line) <= TEXT_WIDTH for line in lines)
@@ -0,0 +1,76 @@
+"""
+Operator allowlist of the filters clients send to the listing endpoints.
+"""
+
+import re
+from typing import Any
+
+import httpx
+import pytest
+from bson.regex import Regex
+from fastapi import HTTPException
+
+from app.utils import query_guard
+from app.utils.query_guard import check_filter
+
+
+@pytest.mark.parametrize(
+    "query_filter",
+    [
+        {"group": "G"},
+        {"group": "G", "amount": {"$gte": 10, "$lt": 100}},
+        {"$or": [{"user": {"$in": ["DEPTO 1", "DEPTO 2"]}}, {"comments": None}]},
+        {"$and": [{"date": {"$exists": True}}, {"date": {"$type": "date"}}]},
+        {"tags": {"$elemMatch": {"$eq": "x"}, "$size": 2}},
+        {"name": {"$not": {"$in": ["A"]}}},
+        {"name": Regex("^APORTACION")},
+        {"name": re.compile("^APORTACION")},
+    ],
+)
+def test_allowed_filters(query_filter: dict[str, Any]) -> None:
+    check_filter(query_filter)
+
+
+@pytest.mark.parametrize(
+    "query_filter",
+    [
+        {"$where": "this.amount > 0"},
+        {"$expr": {"$gt": ["$amount", 0]}},
+        {"group": "G", "$or": [{"$where": "true"}]},
+        {"amount": {"$mod": [2, 0]}},
+        {"name": {"$regex": "^A"}},
+        {"name": Regex("APORTACION")},
+        {"name": Regex("^aportacion", "i")},
+        {"name": re.compile("^aportacion", re.IGNORECASE)},
+        {"$and": [{"group": "G"}, {"name": {"$not": Regex("x")}}]},
+    ],
+)
+def test_refused_filters(query_filter: dict[str, Any]) -> None:
+    with pytest.raises(HTTPException) as refused:
+        check_filter(query_filter)
+    assert refused.value.status_code == 422
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    ("query_filter", "status_code", "blocked"),
+    [
+        ('{"group": "TEST", "$where": "sleep(100)"}', 422, 1),
+        ('{"group": "TEST", "name": {"$regex": "APORT", "$options": "i"}}', 422, 1),
+        ('{"group": "TEST", "name": {"$regex": "^APORTACION"}}', 200, 0),
+        ("{not json", 422, 0),
+    ],
+)
+async def test_listing_applies_the_allowlist(
+    client: httpx.AsyncClient,
+    group: dict[str, Any],
+    query_filter: str,
+    status_code: int,
+    blocked: int,
+) -> None:
+    before = query_guard.blocked["operator"]
+    response = await client.get("/v1/transactions", params={"filter": query_filter})
+    assert response.status_code == status_code
+    assert query_guard.blocked["operator"] == before + blocked
+    if status_code == 200:
+        assert {record["group"] for record in response.json()} == {group["group"]}
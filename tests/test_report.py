@@ -0,0 +1,66 @@
+"""
+PDF pool slots of the report downloads are released on every path.
+"""
+
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from starlette.requests import ClientDisconnect
+from starlette.types import Message
+
+from app.routers.report.report import pdf_pool, pdf_response
+from app.utils.process_pool import ProcessPool
+
+
+async def pages(slot: Any) -> AsyncIterator[bytes]:
+    try:
+        yield b"%PDF-"
+    finally:
+        slot.release()
+
+
+async def receive() -> Message:
+    return {"type": "http.disconnect"}
+
+
+SCOPE = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+
+def test_slot_release_is_idempotent() -> None:
+    pool = ProcessPool("test")
+    slot = pool.acquire()
+    slot.release()
+    slot.release()
+    assert pool.in_flight == 0
+    with pool.acquire():
+        assert pool.in_flight == 1
+    assert pool.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_slot_released_when_the_body_is_never_iterated() -> None:
+    slot = pdf_pool.acquire()
+    response = pdf_response(pages(slot), slot)
+
+    async def send(message: Message) -> None:
+        raise OSError("client went away")
+
+    with pytest.raises(ClientDisconnect):
+        await response(SCOPE, receive, send)
+    assert slot.released
+    assert pdf_pool.in_flight == 0
+
+
+@pytest.mark.anyio
+async def test_slot_released_once_the_body_is_sent() -> None:
+    slot = pdf_pool.acquire()
+    response = pdf_response(pages(slot), slot)
+    sent: list[Message] = []
+
+    async def send(message: Message) -> None:
+        sent.append(message)
+
+    await response(SCOPE, receive, send)
+    assert sent[-1] == {"type": "http.response.body", "body": b"", "more_body": False}
+    assert pdf_pool.in_flight == 0
@@ -0,0 +1,103 @@
+"""
+JSON serialization and compression of the app's responses.
+"""
+
+import json
+from typing import Any
+
+import httpx
+import pytest
+
+from app.utils.compression import accepts_brotli
+
+pytestmark = pytest.mark.anyio
+
+JSON_ROUTES = [
+    ("/v1/transactions", "filter"),
+    ("/v1/transactions/parsed-data", "group_id"),
+    ("/v1/incidents", "group_id"),
+]
+
+
+def refuse(*args: Any, **kwargs: Any) -> Any:
+    raise AssertionError("jsonable_encoder called")
+
+
+@pytest.mark.parametrize(("path", "param"), JSON_ROUTES)
+async def test_json_routes_skip_jsonable_encoder(
+    client: httpx.AsyncClient,
+    group: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+    path: str,
+    param: str,
+) -> None:
+    monkeypatch.setattr("fastapi.routing.jsonable_encoder", refuse)
+    value = group["group"]
+    if param == "filter":
+        value = json.dumps({"group": value})
+    response = await client.get(path, params={param: value})
+    assert response.status_code == 200
+    assert response.json()
+
+
+async def test_large_json_is_gzipped(
+    client: httpx.AsyncClient, group: dict[str, Any]
+) -> None:
+    response = await client.get(
+        "/v1/transactions/parsed-data",
+        params={"group_id": group["group"]},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert response.json()["parsed_data"]["income"]
+
+
+async def test_small_responses_are_not_compressed(
+    client: httpx.AsyncClient, database: Any
+) -> None:
+    response = await client.get("/health", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+async def test_pdfs_are_not_compressed(
+    client: httpx.AsyncClient, group: dict[str, Any]
+) -> None:
+    response = await client.post(
+        "/v1/report/download/receipts",
+        json={"start_at": 1, "end_at": 30, "group": group["group"]},
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert "content-encoding" not in response.headers
+    assert response.content.startswith(b"%PDF-")
+
+
+async def test_brotli_when_accepted(
+    client: httpx.AsyncClient, group: dict[str, Any]
+) -> None:
+    pytest.importorskip("brotli")
+    response = await client.get(
+        "/v1/transactions/parsed-data",
+        params={"group_id": group["group"]},
+        headers={"Accept-Encoding": "br, gzip"},
+    )
+    assert response.headers["content-encoding"] == "br"
+    assert response.json()["parsed_data"]["income"]
+
+
+@pytest.mark.parametrize(
+    ("header", "accepted"),
+    [
+        ("gzip, deflate, br", True),
+        ("br;q=0.5", True),
+        ("br;q=0", False),
+        ("gzip", False),
+        ("brotli", False),
+        ("", False),
+    ],
+)
+def test_accepts_brotli(header: str, accepted: bool) -> None:
+    assert accepts_brotli(header) is accepted
@@ -0,0 +1,131 @@
+"""
+GroupMonthlySummary kept up to date by `$inc` deltas on every Movements
+write ends up equal to a rebuild from Movements.
+"""
+
+from datetime import datetime
+from typing import Any
+
+import pytest
+
+from app.routers.transactions import counters
+from app.routers.transactions.common_functions import (
+    add_movement,
+    add_movements,
+    delete_db,
+    update_db,
+    update_movement,
+)
+from app.routers.transactions.data_version import get_data_version
+from app.routers.transactions.models import TransactionData
+from app.routers.transactions.summary import (
+    SUMMARY_COLLECTION,
+    get_group_summary,
+    rebuild_group_summary,
+    summary_deltas,
+    user_from_key,
+    user_key,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def movement(**fields: Any) -> TransactionData:
+    return TransactionData.model_validate(
+        {
+            "transaction_id": 9999,
+            "user": "DEPTO 1",
+            "group": "G",
+            "movement_type": "income",
+            "amount": 100.0,
+            "name": "APORTACION",
+            "category": "VENCIDO",
+            "created_at": datetime(2024, 3, 5),
+            "date": datetime(2024, 3, 1),
+            **fields,
+        }
+    )
+
+
+def by_month(summaries: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """
+    Summaries by month, without the zeroed counters deltas leave behind
+    """
+    result = {}
+    for summary in summaries:
+        summary = {key: value for key, value in summary.items() if key != "_id"}
+        summary["debt_users"] = {
+            user: count
+            for user, count in (summary.get("debt_users") or {}).items()
+            if count
+        }
+        result[summary["month"]] = summary
+    return result
+
+
+async def test_deltas_match_a_rebuild(
+    database: Any, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(counters, "counter_index_ready", False)
+    # receipts of three members, one of them with dots and a leading $
+    await add_movements(
+        [movement(user=user) for user in ["DEPTO 1", "DEPTO 2", "$DEPTO.3", "DEPTO.4"]]
+    )
+    await add_movement(
+        movement(
+            transaction_id=10001,
+            user="DEPTO 0",
+            movement_type="expense",
+            category="LUZ",
+            amount=320.5,
+            created_at=datetime(2024, 4, 2),
+            date=None,
+        )
+    )
+    await add_movement(
+        movement(
+            transaction_id=1,
+            category="EXTRAORDINARY_INCOME",
+            amount=50.0,
+            created_at=datetime(2024, 2, 10),
+        )
+    )
+    # a receipt paid: VENCIDO becomes MONTHLY_INCOME and leaves the debt
+    await update_movement({"group": "G", "user": "DEPTO 2", "transaction_id": 9999})
+    # moved to another month and amount
+    await update_db(
+        {"group": "G", "user": "$DEPTO.3", "transaction_id": 9999},
+        {"$set": {"date": datetime(2024, 5, 1), "amount": 75.0}},
+    )
+    await delete_db({"group": "G", "user": "DEPTO.4", "transaction_id": 9999})
+    # no match: nothing changes
+    await update_db({"group": "G", "user": "NOBODY"}, {"$set": {"amount": 1.0}})
+
+    incremental = by_month(await get_group_summary("G"))
+    await rebuild_group_summary("G")
+    rebuilt = by_month(await get_group_summary("G"))
+    assert incremental == rebuilt
+
+    assert rebuilt["2024-03"]["debt_users"] == {"DEPTO 1": 1}
+    assert rebuilt["2024-05"]["debt_users"] == {"$DEPTO.3": 1}
+    assert rebuilt["2024-05"]["debt"] == {"total": 75.0, "count": 1}
+    assert rebuilt["2024-04"]["expense"] == {"total": 320.5, "count": 1}
+    assert await get_data_version("G") == 6
+
+
+async def test_user_keys_are_escaped(database: Any) -> None:
+    for user in ["DEPTO 1", "a.b", "$x", "50%", "%2E", "x.$y%"]:
+        key = user_key(user)
+        assert "." not in key and not key.startswith("$")
+        assert user_from_key(key) == user
+
+    deltas = summary_deltas(movement(user="$A.B").model_dump())
+    (month,) = deltas.values()
+    assert "debt_users.%24A%2EB" in month
+    stored = database.database[SUMMARY_COLLECTION]
+    assert stored.count_documents({}) == 0
+
+
+async def test_update_db_only_takes_set(database: Any) -> None:
+    with pytest.raises(ValueError):
+        await update_db({"group": "G"}, {"$inc": {"amount": 1}})
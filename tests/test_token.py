@@ -0,0 +1,95 @@
+"""
+Access token resolution through the per-process token cache.
+"""
+
+from collections.abc import Iterator
+from typing import Any
+
+import httpx
+import pytest
+
+from app.utils.token import (
+    find_user_from_token,
+    invalidate_owner,
+    invalidate_token,
+    token_cache,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_cache() -> Iterator[None]:
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+
+def add_owner(database: Any, token: str, token_owner: str = "owner") -> None:
+    database.database.Owners.insert_one(
+        {
+            "token_owner": token_owner,
+            "access_token": token,
+            "scope": ["G"],
+            "token_type": "admin",
+        }
+    )
+
+
+async def test_cached_until_invalidated(database: Any) -> None:
+    add_owner(database, "a")
+    owner = await find_user_from_token("a")
+    assert owner is not None and owner.token_type == "admin"
+
+    database.database.Owners.update_one(
+        {"access_token": "a"}, {"$set": {"token_type": "user"}}
+    )
+    owner = await find_user_from_token("a")
+    assert owner is not None and owner.token_type == "admin"
+
+    invalidate_token("a")
+    owner = await find_user_from_token("a")
+    assert owner is not None and owner.token_type == "user"
+
+
+async def test_revoked_token_after_invalidation(database: Any) -> None:
+    add_owner(database, "a")
+    assert await find_user_from_token("a") is not None
+    database.database.Owners.delete_one({"access_token": "a"})
+    invalidate_token("a")
+    assert await find_user_from_token("a") is None
+
+
+async def test_new_token_after_invalidation(database: Any) -> None:
+    # unknown tokens are cached as well
+    assert await find_user_from_token("a") is None
+    add_owner(database, "a")
+    assert await find_user_from_token("a") is None
+    invalidate_token("a")
+    assert await find_user_from_token("a") is not None
+
+
+async def test_invalidate_owner_drops_every_token(database: Any) -> None:
+    for token in ["a", "b"]:
+        add_owner(database, token)
+    add_owner(database, "c", token_owner="other")
+    for token in ["a", "b", "c"]:
+        await find_user_from_token(token)
+    await find_user_from_token("unknown")
+    database.database.Owners.update_many({}, {"$set": {"scope": ["H"]}})
+
+    invalidate_owner("owner")
+    cached = {token for token, _ in token_cache.items()}
+    assert cached == {"c", "unknown"}
+    for token in ["a", "b"]:
+        owner = await find_user_from_token(token)
+        assert owner is not None and owner.scope == ["H"]
+
+
+async def test_downgraded_admin_is_refused_after_invalidation(
+    client: httpx.AsyncClient, group: dict[str, Any], database: Any
+) -> None:
+    assert (await client.get("/v1/report/cache")).status_code == 200
+    database.database.Owners.update_one({}, {"$set": {"token_type": "user"}})
+    invalidate_owner("tests")
+    assert (await client.get("/v1/report/cache")).status_code == 403